@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# ==================== ALOCAÇÃO EM COTAS INTEIRAS ====================
+
+# "equilibrio": segue os pesos-alvo gastando o máximo do aporte.
+# "renda": alvo vem do máximo de dividendos (com teto por ativo) e depois é arredondado do mesmo jeito.
+OBJETIVOS = ("equilibrio", "renda")
+# Teto de trabalho de cada passada da programação dinâmica (quantidades testadas x estados do orçamento).
+# Problemas maiores são resolvidos de grosso para fino: no máximo MAX_OPCOES quantidades por ativo e
+# uma grade de orçamento mais larga, refinadas em volta da escolha anterior por até MAX_PASSADAS passadas.
+MAX_CELULAS = 5_000_000
+MAX_OPCOES = 24
+MAX_PASSADAS = 4
+
+
+def _alvo_renda(precos_validos, pesos, dy, orcamento, limite):
+    # Ótimo contínuo: enche os ativos de maior DY até o teto de cada um (mochila fracionária)
+    teto = limite * pesos * orcamento
+    ordem = np.argsort(-dy, kind="stable")
+    antes = np.cumsum(teto[ordem]) - teto[ordem]
+    alvo = np.zeros(len(teto))
+    alvo[ordem] = np.clip(orcamento - antes, 0, teto[ordem])
+    return alvo
+
+
+def _programar(p, alvo, baixo, opcoes, orcamento, penalidade, max_estados):
+    # Programação dinâmica sobre o orçamento restante: cada ativo compra baixo + uma das `opcoes` e a
+    # combinação que minimiza sobra + penalidade * desvio do alvo vence.
+    # A grade é em centavos inteiros (divisão em ponto flutuante tornaria o orçamento exato inalcançável).
+    # Preços são arredondados para cima na grade, então a resposta nunca estoura o orçamento.
+    resto = orcamento - (baixo * p).sum()
+    resto_c = int(np.floor(round(resto * 100, 6)))
+    passo = max(1, -(-resto_c // max_estados))
+    estados = resto_c // passo + 1
+    unidades = lambda i, extra: int(np.ceil(round(extra * p[i] * 100, 6) / passo))
+
+    custo = np.full(estados, np.inf)
+    custo[0] = 0.0
+    escolha = np.zeros((len(p), estados), dtype=np.int32)
+    for i in range(len(p)):
+        novo = np.full(estados, np.inf)
+        melhor = np.zeros(estados, dtype=np.int32)
+        for k, extra in enumerate(opcoes[i]):
+            u = unidades(i, extra)
+            if u >= estados:
+                break
+            q = baixo[i] + extra
+            # Gastar reduz a sobra; afastar-se do alvo custa `penalidade` por real
+            c = penalidade * abs(q * p[i] - alvo[i]) - q * p[i]
+            candidato = np.full(estados, np.inf)
+            candidato[u:] = custo[:estados - u] + c
+            troca = candidato < novo
+            melhor[troca] = k
+            novo[troca] = candidato[troca]
+        custo, escolha[i] = novo, melhor
+
+    # Reconstrói as escolhas de trás para frente a partir do melhor estado final
+    s = int(np.argmin(custo))
+    resultado = baixo.copy()
+    for i in range(len(p) - 1, -1, -1):
+        extra = opcoes[i][escolha[i, s]]
+        resultado[i] += extra
+        s -= unidades(i, extra)
+    return resultado, passo
+
+
+def alocar(precos, orcamento, pesos=None, dy=None, objetivo="equilibrio", limite=2.0, folga=2, penalidade=0.5, max_estados=50000):
+    # precos, pesos e dy indexados por ativo. Devolve uma Series de cotas inteiras com o mesmo índice.
+    # Cada ativo escolhe numa janela em torno de floor(alvo/preço). Se a passada exata (toda a janela,
+    # grade de 1 centavo) couber em MAX_CELULAS, é a única; senão as janelas são amostradas de `salto`
+    # em `salto` cotas e as passadas seguintes refinam em volta da escolha.
+    precos = pd.Series(precos, dtype=float)
+    cotas = pd.Series(0, index=precos.index, dtype=int)
+    validos = precos.notna() & (precos > 0)
+    if orcamento <= 0 or not validos.any():
+        return cotas
+
+    p = precos[validos].to_numpy()
+    w = np.ones(len(p)) if pesos is None else pd.Series(pesos, dtype=float).reindex(precos.index[validos]).fillna(0.0).to_numpy()
+    w = w / w.sum() if w.sum() > 0 else np.full(len(p), 1 / len(p))
+    if objetivo == "renda" and dy is not None:
+        dy_v = pd.Series(dy, dtype=float).reindex(precos.index[validos]).fillna(0.0).to_numpy()
+        alvo = _alvo_renda(p, w, dy_v, orcamento, limite)
+    else:
+        alvo = w * orcamento
+
+    base = np.floor(alvo / p)
+    # Cada ativo pode se afastar do alvo, para cima ou para baixo, até o valor da cota mais cara:
+    # é o que permite trocar cotas baratas por uma cara para zerar a sobra
+    margem = folga + np.ceil(p.max() / p)
+    alto = np.minimum(base + margem + 1, np.floor(orcamento / p))
+    baixo = np.minimum(np.maximum(base - margem, 0), alto)
+    for _ in range(MAX_PASSADAS):
+        janela = alto - baixo + 1
+        resto_c = int(np.floor(round((orcamento - (baixo * p).sum()) * 100, 6)))
+        if janela.sum() * min(max_estados, resto_c + 1) <= MAX_CELULAS:
+            salto = np.ones(len(p))
+        else:
+            salto = np.maximum(1, np.ceil(janela / MAX_OPCOES))
+        opcoes = [np.arange(0, a - b + 1, g) for a, b, g in zip(alto, baixo, salto)]
+        estados = max(1, min(max_estados, MAX_CELULAS // sum(len(o) for o in opcoes)))
+        resultado, passo = _programar(p, alvo, baixo, opcoes, orcamento, penalidade, estados)
+        if passo == 1 and (salto == 1).all():
+            break
+        # Próxima passada: só o intervalo até as amostras vizinhas da escolha
+        novo_baixo, novo_alto = np.maximum(baixo, resultado - salto), np.minimum(alto, resultado + salto)
+        if np.array_equal(novo_baixo, baixo) and np.array_equal(novo_alto, alto):
+            break
+        baixo, alto = novo_baixo, novo_alto
+    cotas[validos] = resultado.astype(int)
+    return cotas
+
+
+def resumo(precos, cotas, orcamento, dy=None):
+    # Capital investido, sobra e renda mensal estimada (DY anual / 12) de uma alocação
+    investido = float((pd.Series(precos, dtype=float) * cotas).sum())
+    renda = 0.0 if dy is None else float((pd.Series(precos, dtype=float) * cotas * pd.Series(dy, dtype=float).fillna(0.0) / 12).sum())
+    return {"investido": investido, "sobra": orcamento - investido, "renda": renda}
@@ -0,0 +1,162 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+import diagnostico
+
+# ==================== ARMAZÉM LOCAL DE PREÇOS (OHLCV) ====================
+
+# Uma pasta por ticker e um arquivo binário por coluna; novas barras são apenas anexadas ao final
+PASTA_PRECOS = "dados_precos"
+COLUNAS = ["Open", "High", "Low", "Close", "Volume"]
+# Diferença relativa a partir da qual um fechamento já gravado é considerado rebaseado pelo Yahoo
+# (preços ajustados: todo desdobramento ou provento reescreve as barras anteriores)
+TOLERANCIA_AJUSTE = 1e-4
+
+
+def _dia(data):
+    # Data -> dias desde 1970-01-01, o formato gravado na coluna "Data"
+    data = pd.Timestamp(data)
+    if data.tz is not None:
+        data = data.tz_localize(None)
+    return int(np.datetime64(data.normalize(), "D").astype(np.int64))
+
+
+def _normalizar(barras):
+    # Índice diário sem fuso, sem datas repetidas e só com barras que têm fechamento
+    barras = barras.copy()
+    indice = pd.DatetimeIndex(barras.index)
+    if indice.tz is not None:
+        indice = indice.tz_localize(None)
+    barras.index = indice.normalize()
+    barras = barras[~barras.index.duplicated(keep="last")].sort_index()
+    return barras.reindex(columns=COLUNAS).dropna(subset=["Close"])
+
+
+class ArmazemPrecos:
+
+    def __init__(self, pasta=PASTA_PRECOS):
+        self.pasta = pasta
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def _dir(self, ticker):
+        return os.path.join(self.pasta, re.sub(r"[^A-Za-z0-9]", "_", ticker))
+
+    def _arq(self, ticker, coluna):
+        return os.path.join(self._dir(ticker), f"{coluna}.bin")
+
+    def _linhas(self, ticker):
+        # Número de barras íntegras: o menor comprimento entre as colunas (protege contra gravação interrompida)
+        tamanhos = []
+        for coluna in ["Data"] + COLUNAS:
+            caminho = self._arq(ticker, coluna)
+            tamanhos.append(os.path.getsize(caminho) // 8 if os.path.exists(caminho) else 0)
+        return min(tamanhos)
+
+    def _mapa(self, ticker, coluna, linhas):
+        dtype = np.int64 if coluna == "Data" else np.float64
+        if linhas == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._arq(ticker, coluna), dtype=dtype, mode="r", shape=(linhas,))
+
+    def ultima_data(self, ticker):
+        linhas = self._linhas(ticker)
+        if linhas == 0:
+            return None
+        return pd.Timestamp(int(self._mapa(ticker, "Data", linhas)[-1]), unit="D")
+
+    def _referencia(self, ticker):
+        # Início do delta: a penúltima barra, já fechada, volta junto para conferir se o histórico foi rebaseado
+        linhas = self._linhas(ticker)
+        if linhas == 0:
+            return None
+        return pd.Timestamp(int(self._mapa(ticker, "Data", linhas)[max(linhas - 2, 0)]), unit="D")
+
+    def rebaseado(self, ticker, barras):
+        # As barras fechadas que vieram de novo (antes da última gravada) batem com as gravadas?
+        ultima = self.ultima_data(ticker)
+        if ultima is None or barras is None or barras.empty:
+            return False
+        barras = _normalizar(barras)
+        gravadas = self.ler(ticker, inicio=barras.index.min(), fim=ultima)["Close"]
+        gravadas = gravadas[gravadas.index < ultima]
+        novas = barras["Close"].reindex(gravadas.index)
+        comuns = novas.notna() & (gravadas != 0)
+        return bool((np.abs(novas[comuns] / gravadas[comuns] - 1) > TOLERANCIA_AJUSTE).any())
+
+    def substituir(self, ticker, barras):
+        # Regrava o histórico inteiro de um ticker (depois de um rebaseamento)
+        for coluna in ["Data"] + COLUNAS:
+            caminho = self._arq(ticker, coluna)
+            if os.path.exists(caminho):
+                os.remove(caminho)
+        return self.anexar(ticker, barras)
+
+    def anexar(self, ticker, barras):
+        # Anexa só as barras novas; a última barra guardada (possivelmente parcial do pregão) é regravada
+        if barras is None or barras.empty:
+            return 0
+        barras = _normalizar(barras)
+
+        os.makedirs(self._dir(ticker), exist_ok=True)
+        linhas = self._linhas(ticker)
+        ultima = self.ultima_data(ticker)
+        if ultima is not None:
+            barras = barras[barras.index >= ultima]
+            if not barras.empty and barras.index[0] == ultima:
+                linhas -= 1
+        if barras.empty:
+            return 0
+
+        dias = barras.index.values.astype("datetime64[D]").astype(np.int64)
+        for coluna in ["Data"] + COLUNAS:
+            caminho = self._arq(ticker, coluna)
+            with open(caminho, "ab") as f:
+                f.truncate(linhas * 8)
+                valores = dias if coluna == "Data" else barras[coluna].to_numpy(dtype=np.float64)
+                f.write(valores.tobytes())
+        return len(barras)
+
+    def ler(self, ticker, inicio=None, fim=None, colunas=("Close",)):
+        # Lê apenas o intervalo pedido, via memory-map das colunas necessárias
+        linhas = self._linhas(ticker)
+        datas = self._mapa(ticker, "Data", linhas)
+        a = 0 if inicio is None else int(np.searchsorted(datas, _dia(inicio), side="left"))
+        b = linhas if fim is None else int(np.searchsorted(datas, _dia(fim), side="right"))
+        indice = pd.DatetimeIndex(np.asarray(datas[a:b]).astype("datetime64[D]").astype("datetime64[ns]"))
+        return pd.DataFrame({c: np.array(self._mapa(ticker, c, linhas)[a:b]) for c in colunas}, index=indice)
+
+    @diagnostico.cronometrado("armazem.fechamentos")
+    def fechamentos(self, tickers, inicio=None, fim=None):
+        # Matriz larga (datas x tickers) de fechamentos lida do armazém
+        tickers = list(dict.fromkeys(tickers))
+        series = {t: self.ler(t, inicio, fim)["Close"] for t in tickers}
+        return pd.DataFrame(series).reindex(columns=tickers).sort_index()
+
+    @diagnostico.cronometrado("armazem.atualizar")
+    def atualizar(self, tickers, baixar):
+        # baixar(lote, inicio) -> {ticker: DataFrame OHLCV}; inicio=None pede o histórico completo.
+        # Tickers com a mesma data de referência vão juntos numa única requisição de delta.
+        # Se o delta mostra o passado rebaseado (desdobramento, provento), o histórico do ticker é baixado de novo.
+        grupos = {}
+        for t in dict.fromkeys(tickers):
+            grupos.setdefault(self._referencia(t), []).append(t)
+        anexadas = {}
+        for referencia, lote in grupos.items():
+            novos = baixar(lote, referencia)
+            rebaseados = []
+            for t in lote:
+                barras = novos.get(t)
+                # None sinaliza falha na busca (o delta sempre traz ao menos a última barra)
+                if barras is None or barras.empty:
+                    anexadas[t] = None
+                elif self.rebaseado(t, barras):
+                    rebaseados.append(t)
+                else:
+                    anexadas[t] = self.anexar(t, barras)
+            if rebaseados:
+                completos = baixar(rebaseados, None)
+                for t in rebaseados:
+                    barras = completos.get(t)
+                    anexadas[t] = self.substituir(t, barras) if barras is not None and not barras.empty else None
+        return anexadas
@@ -0,0 +1,96 @@
+import os
+import sys
+import argparse
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import universo
+import conversao
+import provedores
+import replay
+
+# ==================== GRAVAÇÃO DAS FIXTURES DOS BENCHMARKS ====================
+
+# Uso:
+#   python benchmarks/gravar_fixtures.py               -> grava do Yahoo os ativos de universo.csv (+ pares de câmbio)
+#   python benchmarks/gravar_fixtures.py --sintetico   -> sem rede: séries aleatórias com semente fixa
+# As fixtures ficam em benchmarks/fixtures e são reaproveitadas por todas as execuções de benchmarks/rodar.py.
+
+PERIODO_PADRAO = "2y"
+
+
+def tickers_do_universo(caminho):
+    df = universo.carregar_universo(caminho)
+    pares = [conversao.par(m) for m in df["moeda"].unique() if m != conversao.MOEDA_BASE]
+    return list(dict.fromkeys([*df["ticker"], *pares]))
+
+
+def gravar_do_yahoo(tickers, periodo):
+    # Mesmo caminho de coleta do app (lotes, pool, retentativas), rodando numa pasta temporária
+    # para não deixar cache nem armazém de preços dentro do repositório
+    os.chdir(tempfile.mkdtemp(prefix="fixtures_"))
+    import mercado
+    historicos = {t: c.dados for t, c in mercado.baixar_ohlcv(tickers, period=periodo, orcamento=120).items() if c.status == "ok"}
+    acoes = [t for t in tickers if not t.endswith("=X")]
+    fundamentos = {
+        t: {k: v for k, v in (c.dados or {}).items() if k in mercado.CAMPOS_FUNDAMENTOS}
+        for t, c in mercado.baixar_fundamentos(acoes, orcamento=300).items() if c.status == "ok"
+    }
+    return historicos, fundamentos
+
+
+def gerar_sinteticos(tickers, periodo, semente):
+    # Passeio aleatório geométrico por ticker; câmbio em torno de 5,40 com volatilidade menor
+    rng = np.random.default_rng(semente)
+    dias = provedores.PERIODOS.get(periodo) or 3652
+    datas = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=int(dias * 252 / 365))
+    historicos, fundamentos = {}, {}
+    for t in tickers:
+        cambio = t.endswith("=X")
+        inicio = 5.4 if cambio else rng.uniform(5, 150)
+        vol = 0.006 if cambio else rng.uniform(0.01, 0.03)
+        fechamento = inicio * np.exp(np.cumsum(rng.normal(0.0002, vol, len(datas))))
+        amplitude = np.abs(rng.normal(0, vol, len(datas)))
+        historicos[t] = pd.DataFrame({
+            "Open": fechamento * (1 + rng.normal(0, vol / 2, len(datas))),
+            "High": fechamento * (1 + amplitude), "Low": fechamento * (1 - amplitude),
+            "Close": fechamento, "Volume": rng.integers(1e4, 1e7, len(datas)).astype(float),
+        }, index=datas)
+        if not cambio:
+            fundamentos[t] = {
+                "trailingEps": round(float(fechamento[-1] / rng.uniform(4, 25)), 4),
+                "bookValue": round(float(fechamento[-1] / rng.uniform(0.5, 3)), 4),
+                "dividendYield": round(float(rng.uniform(0, 0.12)), 4),
+            }
+    return historicos, fundamentos
+
+
+def main():
+    p = argparse.ArgumentParser(description="Grava as fixtures de mercado usadas pelos benchmarks")
+    p.add_argument("--universo", default=os.path.join(RAIZ, universo.ARQ_UNIVERSO))
+    p.add_argument("--periodo", default=PERIODO_PADRAO, choices=[k for k in provedores.PERIODOS if k != "max"])
+    p.add_argument("--saida", default=replay.PASTA_FIXTURES)
+    p.add_argument("--sintetico", action="store_true", help="gera séries aleatórias em vez de baixar do Yahoo")
+    p.add_argument("--semente", type=int, default=42)
+    args = p.parse_args()
+    saida = os.path.abspath(args.saida)
+
+    tickers = tickers_do_universo(args.universo)
+    meta = {"gravado_em": datetime.now().isoformat(timespec="seconds"), "periodo": args.periodo}
+    if args.sintetico:
+        historicos, fundamentos = gerar_sinteticos(tickers, args.periodo, args.semente)
+        meta.update(fonte="sintetico", semente=args.semente)
+    else:
+        historicos, fundamentos = gravar_do_yahoo(tickers, args.periodo)
+        meta.update(fonte="yahoo", faltando=sorted(set(tickers) - set(historicos)))
+    provedores.ProvedorArquivos.gravar(saida, historicos, fundamentos, meta)
+    print(f"{len(historicos)}/{len(tickers)} tickers gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import threading
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import provedores
+
+# ==================== REPLAY DAS FIXTURES DOS BENCHMARKS ====================
+
+# Provedor de arquivos lendo benchmarks/fixtures, com duas extensões só dos benchmarks:
+# tickers sintéticos que reaproveitam séries gravadas (universos de 500 e 2.000 ativos)
+# e uma espera opcional por requisição, para aproximar a latência da rede.
+
+PASTA_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class ProvedorReplay(provedores.ProvedorArquivos):
+
+    def __init__(self, pasta=PASTA_FIXTURES, apelidos=None, latencia=0.0):
+        super().__init__(pasta)
+        # Ticker pedido -> ticker gravado
+        self.apelidos = dict(apelidos or {})
+        self.latencia = latencia
+        self.chamadas = {"historico": 0, "fundamentos": 0}
+        self._trava = threading.Lock()
+
+    def _contar(self, tipo):
+        with self._trava:
+            self.chamadas[tipo] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _fator(self, ticker):
+        # Séries emprestadas ganham uma escala própria, para não serem cópias idênticas da original
+        return 0.5 + (zlib.crc32(ticker.encode()) % 100) / 50
+
+    def historico_lote(self, tickers, inicio=None, periodo="max", timeout=None):
+        self._contar("historico")
+        origens = {t: self.apelidos.get(t, t) for t in tickers}
+        gravados = super().historico_lote(set(origens.values()), inicio, periodo)
+        barras = {}
+        for t, origem in origens.items():
+            if origem not in gravados:
+                continue
+            barras[t] = gravados[origem]
+            if t in self.apelidos:
+                barras[t] = barras[t].copy()
+                barras[t][["Open", "High", "Low", "Close"]] *= self._fator(t)
+        return barras
+
+    def fundamentos(self, ticker):
+        self._contar("fundamentos")
+        return super().fundamentos(self.apelidos.get(ticker, ticker))
@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, PASTA)
+
+# ==================== BENCHMARKS DO RADAR ====================
+
+# Uso:
+#   python benchmarks/gravar_fixtures.py [--sintetico]   (uma vez: grava os dados de mercado)
+#   python benchmarks/rodar.py                           -> 35, 500 e 2.000 tickers
+#   python benchmarks/rodar.py --tamanhos 35 --comparar  -> compara com o resultado anterior
+# Cada tamanho roda num processo próprio, numa pasta temporária (cache, armazém e livro vazios),
+# com o provedor de mercado trocado pelo replay das fixtures: os números não dependem da rede.
+
+TAMANHOS = (35, 500, 2000)
+REPETICOES = 5
+PASTA_RESULTADOS = os.path.join(PASTA, "resultados")
+ARQ_MAIN = os.path.join(RAIZ, "main.py")
+ARQ_UNIVERSO_BASE = os.path.join(RAIZ, "universo.csv")
+
+
+def cronometrar(funcao, repeticoes=REPETICOES, preparar=None):
+    # Segundos de cada repetição; preparar() roda antes de cada uma, fora da medição
+    amostras = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        amostras.append(time.perf_counter() - inicio)
+    return resumo(amostras)
+
+
+def resumo(amostras):
+    a = np.asarray(amostras, dtype=float)
+    return {"mediana": float(np.median(a)), "min": float(a.min()), "max": float(a.max()), "amostras": [round(x, 6) for x in a]}
+
+
+def montar_universo(tamanho, destino, gravados):
+    # Os ativos reais de universo.csv e, acima disso, ativos sintéticos (grupo "estrategico")
+    # que reaproveitam as séries gravadas de um ativo em reais. Devolve {ticker sintético: ticker gravado}.
+    import universo
+    base = universo.carregar_universo(ARQ_UNIVERSO_BASE)
+    radar = universo.do_radar(base)
+    if tamanho <= len(radar):
+        df = pd.concat([radar.head(tamanho), base[base["grupos"] == "sinal"]])
+        apelidos = {}
+    else:
+        fontes = [t for t, m in zip(base["ticker"], base["moeda"]) if m == "BRL" and t in gravados]
+        extras = [f"SINT{i:04d}" for i in range(1, tamanho - len(radar) + 1)]
+        apelidos = {f"{a}.SA": fontes[i % len(fontes)] for i, a in enumerate(extras)}
+        sinteticos = pd.DataFrame({
+            "ativo": extras, "ticker": list(apelidos), "empresa": extras, "classe": "Ação",
+            "moeda": "BRL", "unidade": "", "segmento": "", "grupos": "estrategico",
+        })
+        df = pd.concat([base.astype(str), sinteticos])
+    df[universo.COLUNAS].to_csv(destino, index=False)
+    return apelidos
+
+
+def medir_tamanho(tamanho, repeticoes, latencia=0.0):
+    # Roda no processo filho: o estado global dos módulos (snapshot, caches) começa vazio
+    os.chdir(tempfile.mkdtemp(prefix=f"bench_{tamanho}_"))
+    import replay
+    provedor = replay.ProvedorReplay(latencia=latencia)
+    os.environ["RADAR_UNIVERSO"] = os.path.abspath("universo_bench.csv")
+    provedor.apelidos.update(montar_universo(tamanho, os.environ["RADAR_UNIVERSO"], provedor.historicos))
+    # Nada vai para a rede: mercado nasce com o provedor em memória, trocado em seguida pelo replay
+    os.environ["RADAR_PROVEDOR"] = "memoria"
+
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    import mercado
+    mercado.provedor = provedor
+    import diagnostico
+    import indicadores
+    import livro_aportes
+    import tabelas
+    import universo
+
+    resultado = {"tamanho": tamanho, "fixtures": provedor.meta, "erros": []}
+    app = AppTest.from_file(ARQ_MAIN, default_timeout=1800)
+
+    def rodar_app():
+        app.run()
+        resultado["erros"].extend(e.value for e in app.exception)
+
+    # Primeira abertura: sem snapshot salvo, a página sai vazia e a coleta (replay) roda em segundo plano
+    inicio = time.perf_counter()
+    rodar_app()
+    resultado["rerun_frio"] = time.perf_counter() - inicio
+    while mercado.atualizando():
+        time.sleep(0.05)
+    resultado["carga_snapshot"] = time.perf_counter() - inicio
+
+    # Primeiro rerun com dados: calcula o radar e monta as tabelas
+    diagnostico.zerar()
+    resultado["rerun_primeiro"] = cronometrar(rodar_app, 1)["mediana"]
+    # Reruns comuns (mexer num widget): tudo em cache
+    resultado["rerun_quente"] = cronometrar(rodar_app, repeticoes)
+
+    # Reruns com o radar e as tabelas descartados: mede calcular_dados e a montagem do HTML dentro do app
+    def limpar_caches():
+        st.cache_data.clear()
+        mercado.snapshot_atual().derivados.clear()
+        tabelas._cache.clear()
+    diagnostico.zerar()
+    resultado["rerun_recalculo"] = cronometrar(rodar_app, repeticoes, limpar_caches)
+    etapas = diagnostico.etapas().set_index("Etapa")
+    resultado["calcular_dados"] = {
+        "media": float(etapas.at["calcular_dados", "Média (s)"]) if "calcular_dados" in etapas.index else None,
+        "max": float(etapas.at["calcular_dados", "Máx (s)"]) if "calcular_dados" in etapas.index else None,
+    }
+    resultado["diagnostico"] = diagnostico.relatorio()
+
+    # Indicadores (MA50, MA200, RSI) sobre a matriz de fechamentos do radar
+    snapshot = mercado.snapshot_atual()
+    radar = universo.do_radar(universo.carregar_universo())
+    precos = snapshot.fechamentos(radar["ticker"].unique())
+    resultado["indicadores_matriz"] = list(precos.shape)
+    resultado["indicadores_completo"] = cronometrar(lambda: indicadores.MotorIndicadores().calcular(precos), repeticoes)
+    motor = indicadores.MotorIndicadores()
+    resultado["indicadores_barra_nova"] = cronometrar(
+        lambda: motor.sincronizar(precos), repeticoes, preparar=lambda: motor.calcular(precos.iloc[:-1])
+    )
+
+    # Livro de aportes: um aporte com uma linha por ativo, depois as leituras usadas pelo app
+    livro = livro_aportes.LivroAportes("aportes_bench.db", csv_legado=None)
+    ultimo = precos.ffill().iloc[-1].fillna(10.0)
+    registros = [
+        {"ativo": t, "preco": float(p), "cotas": 10, "valor": float(p) * 10, "dy": "6,0%", "status": "COMPRA"}
+        for t, p in ultimo.items()
+    ]
+    resultado["livro_gravar"] = cronometrar(lambda: livro.registrar(registros), repeticoes)
+    resultado["livro_linhas"] = livro.versao()[1]
+    resultado["livro_consultar"] = cronometrar(livro.consultar, repeticoes)
+    resultado["livro_posicoes"] = cronometrar(livro.posicoes, repeticoes)
+
+    # HTML das tabelas: montagem direta, renderização sem cache e com cache
+    celulas = pd.DataFrame({
+        "Ativo": radar["ativo"].to_numpy(), "Preço": ultimo.reindex(radar["ticker"]).map("R$ {:,.2f}".format).to_numpy(),
+        "DY": "6,0%", "Status": "🟢 BARATO", "Ação": "COMPRAR",
+    })
+    resultado["html_montar"] = cronometrar(lambda: tabelas.montar(celulas), repeticoes)
+    formatar = lambda df: df
+    resultado["html_sem_cache"] = cronometrar(lambda: tabelas.renderizar(celulas, formatar), repeticoes, tabelas._cache.clear)
+    resultado["html_com_cache"] = cronometrar(lambda: tabelas.renderizar(celulas, formatar), repeticoes)
+    resultado["chamadas_provedor"] = dict(provedor.chamadas)
+    return resultado
+
+
+def mediana(valor):
+    return valor["mediana"] if isinstance(valor, dict) and "mediana" in valor else valor
+
+
+# Métricas mostradas no resumo e na comparação (valores em segundos)
+METRICAS = [
+    "rerun_frio", "carga_snapshot", "rerun_primeiro", "rerun_quente", "rerun_recalculo", "calcular_dados",
+    "indicadores_completo", "indicadores_barra_nova", "livro_gravar", "livro_consultar", "livro_posicoes",
+    "html_montar", "html_sem_cache", "html_com_cache",
+]
+
+
+def tabela(resultados):
+    linhas = []
+    for r in resultados:
+        for m in METRICAS:
+            valor = r.get(m)
+            valor = valor.get("media") if m == "calcular_dados" and isinstance(valor, dict) else mediana(valor)
+            linhas.append({"Tamanho": r["tamanho"], "Métrica": m, "Segundos": valor})
+    return pd.DataFrame(linhas)
+
+
+def comparar(atual, anterior):
+    a = tabela(anterior["resultados"]).rename(columns={"Segundos": "Antes"})
+    b = tabela(atual["resultados"]).rename(columns={"Segundos": "Agora"})
+    df = a.merge(b, on=["Tamanho", "Métrica"], how="outer")
+    df["Métrica"] = pd.Categorical(df["Métrica"], METRICAS, ordered=True)
+    df = df.sort_values(["Tamanho", "Métrica"])
+    df["Variação"] = (df["Agora"] / df["Antes"] - 1).map(lambda v: f"{v:+.1%}" if pd.notna(v) else "")
+    return df
+
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def ultimo_resultado():
+    arquivos = sorted(f for f in os.listdir(PASTA_RESULTADOS) if f.endswith(".json")) if os.path.isdir(PASTA_RESULTADOS) else []
+    return os.path.join(PASTA_RESULTADOS, arquivos[-1]) if arquivos else None
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmarks do radar com dados de mercado gravados")
+    p.add_argument("--tamanhos", type=int, nargs="+", default=list(TAMANHOS))
+    p.add_argument("--repeticoes", type=int, default=REPETICOES)
+    p.add_argument("--latencia", type=float, default=0.0, help="espera simulada por requisição ao provedor (s)")
+    p.add_argument("--comparar", nargs="?", const="ultimo", help="arquivo de resultado anterior (padrão: o mais recente)")
+    p.add_argument("--filho", type=int, help=argparse.SUPPRESS)
+    p.add_argument("--saida-filho", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.filho:
+        with open(args.saida_filho, "w", encoding="utf-8") as f:
+            json.dump(medir_tamanho(args.filho, args.repeticoes, args.latencia), f, ensure_ascii=False, default=str)
+        return
+
+    anterior = ultimo_resultado() if args.comparar == "ultimo" else args.comparar
+    resultados = []
+    for tamanho in args.tamanhos:
+        print(f"⏱️  {tamanho} tickers...", flush=True)
+        descritor, saida = tempfile.mkstemp(suffix=".json")
+        os.close(descritor)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--filho", str(tamanho), "--saida-filho", saida,
+             "--repeticoes", str(args.repeticoes), "--latencia", str(args.latencia)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            sys.exit(f"falhou em {tamanho} tickers:\n{proc.stderr[-4000:]}")
+        with open(saida, "r", encoding="utf-8") as f:
+            resultados.append(json.load(f))
+        os.remove(saida)
+
+    import streamlit
+    registro = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_atual(),
+        "ambiente": {
+            "python": platform.python_version(), "pandas": pd.__version__, "streamlit": streamlit.__version__,
+            "sistema": platform.platform(), "cpus": os.cpu_count(),
+        },
+        "repeticoes": args.repeticoes, "latencia": args.latencia,
+        "resultados": resultados,
+    }
+    os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+    destino = os.path.join(PASTA_RESULTADOS, f"{datetime.now():%Y%m%d-%H%M%S}-{registro['commit'] or 'sem-commit'}.json")
+    with open(destino, "w", encoding="utf-8") as f:
+        json.dump(registro, f, ensure_ascii=False, indent=1, default=str)
+
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.float_format", "{:.4f}".format):
+        if anterior and os.path.exists(anterior):
+            with open(anterior, "r", encoding="utf-8") as f:
+                print(f"\nComparado com {os.path.basename(anterior)}:")
+                print(comparar(registro, json.load(f)).to_string(index=False))
+        else:
+            print(tabela(resultados).pivot(index="Métrica", columns="Tamanho", values="Segundos").reindex(METRICAS).to_string())
+    for r in resultados:
+        if r["erros"]:
+            print(f"⚠️ {r['tamanho']} tickers: {len(r['erros'])} exceção(ões) no app: {r['erros'][0][:200]}")
+    print(f"\nResultado salvo em {destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+import re
+import glob
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import diagnostico
+
+# ==================== CACHE DE DADOS DE MERCADO ====================
+
+PASTA_CACHE = ".cache_mercado"
+
+# Validade por classe de dado: preços do dia em minutos, fundamentos por dia.
+# Históricos não têm camada aqui: vivem no armazém de preços (armazem_precos.py), que baixa só as barras
+# novas de cada ticker; a sincronização dele é que fica limitada pela camada "intradiario".
+VALIDADES = {
+    "intradiario": timedelta(minutes=15),
+    "fundamentos": timedelta(days=1),
+}
+
+
+def vazio(valor):
+    if valor is None:
+        return True
+    if hasattr(valor, "empty"):
+        return valor.empty
+    return len(valor) == 0 if hasattr(valor, "__len__") else False
+
+
+class CacheMercado:
+    # LRU limitado em memória, espelhado em disco (um arquivo por entrada) para sobreviver a reinícios
+
+    def __init__(self, pasta=PASTA_CACHE, max_itens=2000, validades=None):
+        self.pasta = pasta
+        self.max_itens = max_itens
+        self.validades = {**VALIDADES, **(validades or {})}
+        self._lock = threading.RLock()
+        self._itens = OrderedDict()
+        os.makedirs(self.pasta, exist_ok=True)
+        # Reconstrói a ordem LRU a partir do disco; o conteúdo só é lido quando pedido
+        arquivos = sorted(glob.glob(os.path.join(self.pasta, "*.pkl")), key=os.path.getmtime)
+        for caminho in arquivos:
+            self._itens[os.path.basename(caminho)] = None
+        self._aparar()
+
+    def _arquivo(self, camada, ticker, partes):
+        seguro = re.sub(r"[^A-Za-z0-9]", "_", ticker)
+        chave = repr((camada, ticker) + tuple(partes)).encode()
+        return f"{seguro}-{camada}-{hashlib.sha1(chave).hexdigest()[:12]}.pkl"
+
+    def _valido(self, camada, salvo_em, agora):
+        return agora - salvo_em < self.validades[camada]
+
+    def _ler(self, nome):
+        with self._lock:
+            if nome not in self._itens:
+                return None
+            entrada = self._itens[nome]
+            self._itens.move_to_end(nome)
+        if entrada is None:
+            try:
+                with open(os.path.join(self.pasta, nome), "rb") as f:
+                    entrada = pickle.load(f)
+            except Exception:
+                self._remover(nome)
+                return None
+            with self._lock:
+                if nome in self._itens:
+                    self._itens[nome] = entrada
+        return entrada
+
+    def _gravar(self, nome, valor):
+        entrada = (datetime.now(), valor)
+        with self._lock:
+            self._itens[nome] = entrada
+            self._itens.move_to_end(nome)
+            self._aparar()
+        try:
+            with open(os.path.join(self.pasta, nome), "wb") as f:
+                pickle.dump(entrada, f)
+        except Exception:
+            pass
+
+    def _remover(self, nome):
+        with self._lock:
+            self._itens.pop(nome, None)
+        try:
+            os.remove(os.path.join(self.pasta, nome))
+        except OSError:
+            pass
+
+    def _aparar(self):
+        while len(self._itens) > self.max_itens:
+            nome, _ = self._itens.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.pasta, nome))
+            except OSError:
+                pass
+
+    def obter_varios(self, camada, tickers, buscar_lote, *partes):
+        # Devolve {ticker: valor}; só os ausentes ou vencidos são buscados, todos de uma vez
+        agora = datetime.now()
+        resultado, faltando = {}, []
+        for t in dict.fromkeys(tickers):
+            entrada = self._ler(self._arquivo(camada, t, partes))
+            if entrada is not None and self._valido(camada, entrada[0], agora):
+                resultado[t] = entrada[1]
+            else:
+                faltando.append(t)
+        diagnostico.cache(f"mercado/{camada}", acertos=len(resultado), faltas=len(faltando))
+        if faltando:
+            novos = buscar_lote(faltando)
+            for t in faltando:
+                valor = novos.get(t)
+                resultado[t] = valor
+                # Falhas de rede não ficam presas no cache
+                if not vazio(valor):
+                    self._gravar(self._arquivo(camada, t, partes), valor)
+        return resultado
+
+    def invalidar(self, ticker):
+        # Força nova busca de todas as camadas de um único ticker
+        seguro = re.sub(r"[^A-Za-z0-9]", "_", ticker)
+        with self._lock:
+            nomes = [n for n in self._itens if n.startswith(seguro + "-")]
+        for nome in nomes:
+            self._remover(nome)
@@ -0,0 +1,91 @@
+import os
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+import diagnostico
+
+# ==================== CARTEIRAS POR USUÁRIO (SQLITE) ====================
+
+ARQ_CARTEIRAS = "carteiras.db"
+JSON_LEGADO = "carteira_salva.json"
+USUARIO_PADRAO = "padrao"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS campos (
+    usuario TEXT NOT NULL,
+    campo TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    versao INTEGER NOT NULL,
+    atualizado_em TEXT NOT NULL,
+    PRIMARY KEY (usuario, campo)
+);
+"""
+
+
+class ConflitoVersao(Exception):
+    # Outra sessão gravou algum dos campos depois que esta os leu
+    def __init__(self, campos):
+        super().__init__(f"Campos alterados por outra sessão: {', '.join(sorted(campos))}")
+        self.campos = campos
+
+
+class CarteirasUsuarios:
+    # Uma linha por (usuário, campo), com versão própria: salvar grava só os campos alterados,
+    # e só falha se algum deles mudou desde a leitura (concorrência otimista, campo a campo).
+
+    def __init__(self, caminho=ARQ_CARTEIRAS, json_legado=JSON_LEGADO):
+        self.caminho = caminho
+        with closing(self._conectar()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(ESQUEMA)
+        self._migrar(json_legado)
+
+    def _conectar(self):
+        con = sqlite3.connect(self.caminho, timeout=30)
+        con.execute("PRAGMA busy_timeout = 30000")
+        return con
+
+    def _migrar(self, json_legado):
+        # O antigo carteira_salva.json (global) vira a carteira do usuário padrão, uma única vez
+        if not json_legado or not os.path.exists(json_legado):
+            return
+        with closing(self._conectar()) as con:
+            if con.execute("SELECT EXISTS (SELECT 1 FROM campos)").fetchone()[0]:
+                return
+        with open(json_legado, "r") as f:
+            self.salvar(USUARIO_PADRAO, json.load(f), {})
+
+    @diagnostico.cronometrado("carteiras.carregar")
+    def carregar(self, usuario):
+        # (valores, versões) de um usuário, pela chave primária: não depende de quantos usuários existem
+        with closing(self._conectar()) as con:
+            linhas = con.execute("SELECT campo, valor, versao FROM campos WHERE usuario = ?", (usuario,)).fetchall()
+        return {c: json.loads(v) for c, v, _ in linhas}, {c: n for c, _, n in linhas}
+
+    @diagnostico.cronometrado("carteiras.salvar")
+    def salvar(self, usuario, alterados, versoes):
+        # alterados: só os campos que mudaram. versoes: as versões lidas por esta sessão (ausente = campo novo).
+        # Tudo numa transação; em conflito nada é gravado. Devolve as versões novas dos campos gravados.
+        if not alterados:
+            return {}
+        agora = datetime.now().isoformat(timespec="seconds")
+        with closing(self._conectar()) as con, con:
+            con.execute("BEGIN IMMEDIATE")
+            marcas = ", ".join("?" * len(alterados))
+            linhas = con.execute(
+                f"SELECT campo, versao, valor FROM campos WHERE usuario = ? AND campo IN ({marcas})", (usuario, *alterados)
+            ).fetchall()
+            atuais = {c: n for c, n, _ in linhas}
+            # Outra sessão ter gravado o mesmo valor não é conflito
+            conflitos = [c for c, n, v in linhas if n != versoes.get(c, 0) and json.loads(v) != alterados[c]]
+            if conflitos:
+                raise ConflitoVersao(conflitos)
+            novas = {c: atuais.get(c, 0) + 1 for c in alterados}
+            con.executemany(
+                "INSERT INTO campos (usuario, campo, valor, versao, atualizado_em) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (usuario, campo) DO UPDATE SET valor = excluded.valor, versao = excluded.versao, "
+                "atualizado_em = excluded.atualizado_em",
+                [(usuario, c, json.dumps(v), novas[c], agora) for c, v in alterados.items()],
+            )
+        return novas
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# ==================== CONVERSÃO DE MOEDAS E UNIDADES ====================
+
+MOEDA_BASE = "BRL"
+
+# Unidade em que o ativo é cotado -> fator para a unidade exibida (ouro: onça troy -> grama)
+UNIDADES = {"": 1.0, "onca_troy": 1 / 31.1035}
+
+
+def par(moeda):
+    # Ticker do Yahoo com o valor de 1 unidade da moeda em reais (USD -> USDBRL=X)
+    return f"{moeda}{MOEDA_BASE}=X"
+
+
+def _por_ticker(valores, tickers, padrao):
+    serie = pd.Series(valores, dtype=object).reindex(tickers)
+    return serie.where(serie.notna() & (serie != ""), padrao)
+
+
+def cotacoes_por_data(indice, moedas, series):
+    # DataFrame datas x moedas: cotação em reais vigente em cada data (último fechamento conhecido até ela).
+    # series: {moeda: Series datada ou valor fixo}; moeda sem cotação alguma fica NaN.
+    tabela = pd.DataFrame(index=indice)
+    for moeda in dict.fromkeys(moedas):
+        serie = 1.0 if moeda == MOEDA_BASE else series.get(moeda)
+        if isinstance(serie, pd.Series):
+            serie = serie.dropna().sort_index()
+            if serie.empty:
+                tabela[moeda] = np.nan
+            else:
+                # Antes da primeira cotação disponível vale a primeira (início da série)
+                tabela[moeda] = serie.reindex(serie.index.union(indice)).ffill().reindex(indice).fillna(serie.iloc[0])
+        else:
+            tabela[moeda] = np.nan if serie is None else float(serie)
+    return tabela
+
+
+def converter(precos, moedas, unidades, series):
+    # precos: matriz datas x tickers na moeda e unidade de cotação; moedas e unidades: por ticker.
+    # Uma multiplicação pela matriz de fatores (câmbio de cada data x unidade): o custo é por moeda, não por ativo.
+    if precos.empty:
+        return precos
+    moeda = _por_ticker(moedas, precos.columns, MOEDA_BASE)
+    unidade = _por_ticker(unidades, precos.columns, "").map(UNIDADES).fillna(1.0).to_numpy(dtype=float)
+    cotacoes = cotacoes_por_data(precos.index, moeda, series)
+    fatores = cotacoes[moeda.to_numpy()].to_numpy(dtype=float) * unidade
+    return pd.DataFrame(precos.to_numpy(dtype=float) * fatores, index=precos.index, columns=precos.columns)
+
+
+def fator_atual(tickers, moedas, series):
+    # Câmbio mais recente por ticker: converte valores sem data (LPA, VPA) para reais
+    moeda = _por_ticker(moedas, tickers, MOEDA_BASE)
+    ultima = {}
+    for m in dict.fromkeys(moeda):
+        serie = 1.0 if m == MOEDA_BASE else series.get(m)
+        if isinstance(serie, pd.Series):
+            serie = serie.dropna()
+            ultima[m] = float(serie.iloc[-1]) if not serie.empty else np.nan
+        else:
+            ultima[m] = np.nan if serie is None else float(serie)
+    return moeda.map(ultima).astype(float)
@@ -0,0 +1,103 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+import pandas as pd
+
+# ==================== DIAGNÓSTICO DE DESEMPENHO ====================
+
+# Um registro por processo, somado entre reruns, sessões e a thread de atualização.
+# Etapas: chamadas, tempo total/máximo/último. Contadores: bytes baixados, acertos e faltas de cache.
+_trava = threading.Lock()
+_etapas = {}
+_contadores = {}
+_desde = datetime.now()
+
+
+def registrar(etapa, segundos):
+    with _trava:
+        e = _etapas.setdefault(etapa, {"chamadas": 0, "total": 0.0, "max": 0.0, "ultimo": 0.0})
+        e["chamadas"] += 1
+        e["total"] += segundos
+        e["max"] = max(e["max"], segundos)
+        e["ultimo"] = segundos
+
+
+def contar(nome, valor=1):
+    with _trava:
+        _contadores[nome] = _contadores.get(nome, 0) + valor
+
+
+def cache(camada, acertos=0, faltas=0):
+    # Acertos e faltas de uma camada de cache (mercado, tabelas, derivados do snapshot...)
+    if acertos:
+        contar(f"cache.{camada}.acertos", acertos)
+    if faltas:
+        contar(f"cache.{camada}.faltas", faltas)
+
+
+@contextmanager
+def medir(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(etapa, time.perf_counter() - inicio)
+
+
+def cronometrado(etapa):
+    # Decorador: cada chamada da função conta como uma execução da etapa
+    def decorar(funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            with medir(etapa):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorar
+
+
+def etapas():
+    with _trava:
+        linhas = [{"Etapa": nome, **valores} for nome, valores in _etapas.items()]
+    df = pd.DataFrame(linhas, columns=["Etapa", "chamadas", "total", "max", "ultimo"])
+    df["media"] = df["total"] / df["chamadas"]
+    return df.rename(columns={
+        "chamadas": "Chamadas", "total": "Total (s)", "max": "Máx (s)", "ultimo": "Última (s)", "media": "Média (s)"
+    }).sort_values("Total (s)", ascending=False).reset_index(drop=True)
+
+
+def caches():
+    with _trava:
+        contadores = dict(_contadores)
+    camadas = sorted({n.split(".")[1] for n in contadores if n.startswith("cache.")})
+    linhas = []
+    for c in camadas:
+        acertos, faltas = contadores.get(f"cache.{c}.acertos", 0), contadores.get(f"cache.{c}.faltas", 0)
+        linhas.append({"Cache": c, "Acertos": acertos, "Faltas": faltas, "Taxa de acerto": acertos / (acertos + faltas) if acertos + faltas else None})
+    return pd.DataFrame(linhas, columns=["Cache", "Acertos", "Faltas", "Taxa de acerto"])
+
+
+def relatorio():
+    with _trava:
+        contadores = {n: v for n, v in _contadores.items() if not n.startswith("cache.")}
+    return {
+        "desde": _desde.isoformat(timespec="seconds"),
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "etapas": etapas().to_dict("records"),
+        "caches": caches().to_dict("records"),
+        "contadores": contadores,
+    }
+
+
+def exportar_json():
+    return json.dumps(relatorio(), ensure_ascii=False, indent=2, default=str)
+
+
+def zerar():
+    global _desde
+    with _trava:
+        _etapas.clear()
+        _contadores.clear()
+        _desde = datetime.now()
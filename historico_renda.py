@@ -0,0 +1,116 @@
+import os
+import json
+import threading
+import pandas as pd
+import diagnostico
+
+# ==================== HISTÓRICO DE RENDA (LOG + BALDES MENSAIS) ====================
+
+ARQ_LOG = "historico_dividendos.jsonl"
+ARQ_MESES = "historico_dividendos_mensal.json"
+JSON_LEGADO = "historico_dividendos.json"
+CAMPOS = ["data", "ativo", "cotas", "valor_investido", "renda_mensal"]
+# Sobe quando muda a forma de somar os baldes: arquivos de outra versão são refeitos a partir do log
+VERSAO_MESES = 2
+
+
+def mes_de(data):
+    # "AAAA-MM" do registro; o JSON legado gravava as datas como dd/mm/aaaa, os registros novos em ISO
+    texto = str(data)
+    momento = pd.to_datetime(texto, dayfirst="/" in texto, errors="coerce")
+    return None if pd.isna(momento) else momento.strftime("%Y-%m")
+
+
+class HistoricoRenda:
+    # Uma linha JSON por registro, só anexada. Ao lado, os totais por mês e até que byte do log eles valem:
+    # quem lê só processa as linhas novas desde esse ponto, nunca o histórico inteiro.
+
+    def __init__(self, caminho=ARQ_LOG, caminho_meses=ARQ_MESES, legado=JSON_LEGADO):
+        self.caminho = caminho
+        self.caminho_meses = caminho_meses
+        self._trava = threading.Lock()
+        if legado and os.path.exists(legado) and not os.path.exists(caminho):
+            with open(legado, "r") as f:
+                self.anexar(json.load(f))
+
+    def tamanho(self):
+        return os.path.getsize(self.caminho) if os.path.exists(self.caminho) else 0
+
+    @diagnostico.cronometrado("historico_renda.anexar")
+    def anexar(self, registros):
+        # Cada registro numa linha; um único write em modo append não se mistura com outras sessões
+        linhas = "".join(json.dumps({c: r.get(c) for c in CAMPOS}, ensure_ascii=False, default=str) + "\n" for r in registros)
+        if linhas:
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write(linhas)
+        return self.meses()
+
+    def _carregar_meses(self):
+        try:
+            with open(self.caminho_meses, "r") as f:
+                return json.load(f)
+        except Exception:
+            return self._vazio()
+
+    def _vazio(self):
+        return {"versao": VERSAO_MESES, "ate_byte": 0, "meses": {}}
+
+    @diagnostico.cronometrado("historico_renda.meses")
+    def meses(self):
+        # Atualiza os baldes mensais com as linhas anexadas desde a última vez e os persiste
+        with self._trava:
+            estado = self._carregar_meses()
+            tamanho = self.tamanho()
+            if tamanho < estado["ate_byte"] or estado.get("versao") != VERSAO_MESES:
+                estado = self._vazio()
+            if tamanho > estado["ate_byte"]:
+                with open(self.caminho, "rb") as f:
+                    f.seek(estado["ate_byte"])
+                    novo = f.read(tamanho - estado["ate_byte"])
+                # Linha ainda sendo gravada por outra sessão fica para a próxima leitura
+                completo = novo[:novo.rfind(b"\n") + 1]
+                for linha in completo.decode("utf-8").splitlines():
+                    if not linha.strip():
+                        continue
+                    r = json.loads(linha)
+                    mes = mes_de(r.get("data"))
+                    if mes is None:
+                        continue
+                    balde = estado["meses"].setdefault(mes, {"renda_mensal": 0.0, "valor_investido": 0.0, "registros": 0})
+                    balde["renda_mensal"] += float(r.get("renda_mensal") or 0)
+                    balde["valor_investido"] += float(r.get("valor_investido") or 0)
+                    balde["registros"] += 1
+                estado["ate_byte"] += len(completo)
+                temporario = self.caminho_meses + ".tmp"
+                with open(temporario, "w") as f:
+                    json.dump(estado, f)
+                os.replace(temporario, self.caminho_meses)
+            return estado
+
+    def mensal(self):
+        meses = self.meses()["meses"]
+        df = pd.DataFrame.from_dict(meses, orient="index", columns=["renda_mensal", "valor_investido", "registros"])
+        return df.rename_axis("Mes").sort_index().reset_index()
+
+    @diagnostico.cronometrado("historico_renda.ultimos")
+    def ultimos(self, n=50):
+        # Última página de registros, lida do fim do arquivo em blocos
+        tamanho = self.tamanho()
+        if tamanho == 0:
+            return pd.DataFrame(columns=CAMPOS)
+        bloco, pos, dados = 64 * 1024, tamanho, b""
+        with open(self.caminho, "rb") as f:
+            while pos > 0 and dados.count(b"\n") <= n:
+                pos = max(0, pos - bloco)
+                f.seek(pos)
+                dados = f.read(tamanho - pos)
+        linhas = [l for l in dados.decode("utf-8", errors="ignore").splitlines() if l.strip()]
+        if pos > 0:
+            linhas = linhas[1:]
+        registros = []
+        for linha in linhas[-n:]:
+            try:
+                registros.append(json.loads(linha))
+            except ValueError:
+                continue
+        return pd.DataFrame(registros, columns=CAMPOS)
@@ -0,0 +1,221 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# ==================== MOTOR DE INDICADORES TÉCNICOS ====================
+
+# Todas as funções trabalham sobre matrizes (datas x tickers) e calculam todos os tickers de uma vez.
+
+
+def alinhar_pelo_fim(m):
+    # Empurra os valores válidos de cada coluna para o fim: cada ticker passa a ter a própria sequência
+    # de pregões contígua (buracos de calendário, como fins de semana do cripto, viram NaN no topo)
+    valido = ~np.isnan(m)
+    ordem = np.argsort(valido, axis=0, kind="stable")
+    return np.take_along_axis(m, ordem, axis=0)
+
+
+def media_movel(m, janela):
+    # Média simples; NaN enquanto a janela não tiver `janela` valores válidos
+    linhas, colunas = m.shape
+    soma = np.vstack([np.zeros((1, colunas)), np.cumsum(np.nan_to_num(m), axis=0)])
+    cont = np.vstack([np.zeros((1, colunas)), np.cumsum(~np.isnan(m), axis=0)])
+    res = np.full((linhas, colunas), np.nan)
+    if linhas >= janela:
+        s = soma[janela:] - soma[:-janela]
+        c = cont[janela:] - cont[:-janela]
+        res[janela - 1:] = np.where(c == janela, s / janela, np.nan)
+    return res
+
+
+def media_exponencial(m, janela=None, alpha=None, min_periodos=None):
+    alpha = alpha if alpha is not None else 2.0 / (janela + 1)
+    return pd.DataFrame(m).ewm(alpha=alpha, adjust=False, min_periods=min_periodos or 0).mean().to_numpy()
+
+
+def rsi(m, periodo=14, wilder=False):
+    # Simples: médias móveis de ganhos e perdas. Wilder: suavização exponencial com alpha = 1/periodo.
+    delta = np.diff(m, axis=0, prepend=np.nan)
+    ganho, perda = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+    if wilder:
+        media_g = media_exponencial(ganho, alpha=1.0 / periodo, min_periodos=periodo)
+        media_p = media_exponencial(perda, alpha=1.0 / periodo, min_periodos=periodo)
+    else:
+        media_g, media_p = media_movel(ganho, periodo), media_movel(perda, periodo)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = media_g / np.where(media_p == 0, np.nan, media_p)
+        return 100 - (100 / (1 + rs))
+
+
+class _Janela:
+    # Buffer circular por ticker com soma corrente: atualizar uma média custa O(tickers), não O(janela)
+
+    def __init__(self, historico, janela):
+        self.janela = janela
+        linhas, colunas = historico.shape
+        self.buf = np.full((janela, colunas), np.nan)
+        n = min(janela, linhas)
+        if n:
+            self.buf[janela - n:] = historico[linhas - n:]
+        self.pos = np.zeros(colunas, dtype=int)
+        self.soma = np.nansum(self.buf, axis=0)
+        self.cont = (~np.isnan(self.buf)).sum(axis=0)
+
+    def empurrar(self, x):
+        j = np.flatnonzero(~np.isnan(x))
+        antigo = self.buf[self.pos[j], j]
+        vazio = np.isnan(antigo)
+        self.soma[j] += x[j] - np.where(vazio, 0.0, antigo)
+        self.cont[j] += vazio
+        self.buf[self.pos[j], j] = x[j]
+        self.pos[j] = (self.pos[j] + 1) % self.janela
+
+    def media(self):
+        with np.errstate(invalid="ignore"):
+            return np.where(self.cont == self.janela, self.soma / self.janela, np.nan)
+
+    def copia(self):
+        nova = object.__new__(_Janela)
+        nova.janela = self.janela
+        nova.buf, nova.pos, nova.soma, nova.cont = self.buf.copy(), self.pos.copy(), self.soma.copy(), self.cont.copy()
+        return nova
+
+
+class _Exponencial:
+    # Estado de uma média exponencial (adjust=False): último valor e quantas observações já entraram
+
+    def __init__(self, historico, alpha, min_periodos):
+        self.alpha, self.min_periodos = alpha, min_periodos
+        self.valor = media_exponencial(historico, alpha=alpha)[-1].copy() if len(historico) else np.full(historico.shape[1], np.nan)
+        self.n = (~np.isnan(historico)).sum(axis=0)
+
+    def empurrar(self, x):
+        j = np.flatnonzero(~np.isnan(x))
+        primeiro = self.n[j] == 0
+        self.valor[j] = np.where(primeiro, x[j], (1 - self.alpha) * self.valor[j] + self.alpha * x[j])
+        self.n[j] += 1
+
+    def media(self):
+        return np.where(self.n >= self.min_periodos, self.valor, np.nan)
+
+    def copia(self):
+        nova = object.__new__(_Exponencial)
+        nova.alpha, nova.min_periodos = self.alpha, self.min_periodos
+        nova.valor, nova.n = self.valor.copy(), self.n.copy()
+        return nova
+
+
+class MotorIndicadores:
+    # MA, EMA e RSI para todos os tickers de uma vez. Depois do cálculo completo, cada barra nova
+    # só empurra valores nos estados acumulados; a última barra fica provisória, pois o pregão
+    # corrente ainda pode ser revisado pelas próximas atualizações.
+
+    def __init__(self, medias=(50, 200), exponenciais=(), periodo_rsi=14, wilder=False):
+        self.medias, self.exponenciais = tuple(medias), tuple(exponenciais)
+        self.periodo_rsi, self.wilder = periodo_rsi, wilder
+        self.tickers = None
+        self.data_provisoria = None
+        self._trava = threading.Lock()
+
+    def calcular(self, precos):
+        # Cálculo completo; devolve as séries de cada indicador alinhadas às datas da matriz
+        m = precos.to_numpy(dtype=float)
+        alinhada = alinhar_pelo_fim(m)
+        resultado = {f"MA{j}": media_movel(alinhada, j) for j in self.medias}
+        resultado.update({f"EMA{j}": media_exponencial(alinhada, j, min_periodos=j) for j in self.exponenciais})
+        resultado["RSI"] = rsi(alinhada, self.periodo_rsi, self.wilder)
+
+        # Estado consolidado até a penúltima data; a última data entra como barra provisória
+        tem_ultima = ~np.isnan(m[-1]) if len(m) else np.zeros(m.shape[1], dtype=bool)
+        consolidada = alinhada.copy()
+        if len(m):
+            consolidada[:, tem_ultima] = np.vstack([np.full((1, tem_ultima.sum()), np.nan), alinhada[:-1, tem_ultima]])
+        self._iniciar_estado(list(precos.columns), consolidada)
+        self._datas, self._valores = precos.index[:-1], m[:-1].copy()
+        self.data_provisoria = precos.index[-1] if len(precos) else None
+        self._provisoria = m[-1].copy() if len(m) else np.full(m.shape[1], np.nan)
+
+        # Volta do alinhamento por ticker para as datas originais
+        ordem = np.argsort(~np.isnan(m), axis=0, kind="stable")
+        series = {}
+        for nome, valores in resultado.items():
+            por_data = np.full(m.shape, np.nan)
+            np.put_along_axis(por_data, ordem, valores, axis=0)
+            por_data[np.isnan(m)] = np.nan
+            series[nome] = pd.DataFrame(por_data, index=precos.index, columns=precos.columns)
+        return series
+
+    def _iniciar_estado(self, tickers, historico):
+        self.tickers = tickers
+        self._medias = {j: _Janela(historico, j) for j in self.medias}
+        self._exps = {j: _Exponencial(historico, 2.0 / (j + 1), j) for j in self.exponenciais}
+        delta = np.diff(historico, axis=0, prepend=np.nan)
+        ganho, perda = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+        if self.wilder:
+            a = 1.0 / self.periodo_rsi
+            self._ganho, self._perda = _Exponencial(ganho, a, self.periodo_rsi), _Exponencial(perda, a, self.periodo_rsi)
+        else:
+            self._ganho, self._perda = _Janela(ganho, self.periodo_rsi), _Janela(perda, self.periodo_rsi)
+        self._ultimo = pd.DataFrame(historico).ffill().to_numpy()[-1] if len(historico) else np.full(len(tickers), np.nan)
+
+    def _empurrar(self, estados, ultimo, x):
+        medias, exps, ganho, perda = estados
+        for e in (*medias.values(), *exps.values()):
+            e.empurrar(x)
+        delta = x - ultimo
+        ganho.empurrar(np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None)))
+        perda.empurrar(np.where(np.isnan(delta), np.nan, np.clip(-delta, 0, None)))
+        return np.where(np.isnan(x), ultimo, x)
+
+    def atualizar(self, data, barra):
+        # Uma barra nova (ou a revisão da barra provisória) sem recalcular a janela inteira
+        x = pd.Series(barra, dtype=float).reindex(self.tickers).to_numpy()
+        if self.data_provisoria is not None and data > self.data_provisoria:
+            estados = (self._medias, self._exps, self._ganho, self._perda)
+            self._ultimo = self._empurrar(estados, self._ultimo, self._provisoria)
+            self._datas = self._datas.append(pd.DatetimeIndex([self.data_provisoria]))
+            self._valores = np.vstack([self._valores, self._provisoria])
+        self.data_provisoria, self._provisoria = data, x
+        return self.ultimos()
+
+    def ultimos(self):
+        # Valores mais recentes de cada indicador por ticker (estado consolidado + barra provisória)
+        medias = {j: e.copia() for j, e in self._medias.items()}
+        exps = {j: e.copia() for j, e in self._exps.items()}
+        ganho, perda = self._ganho.copia(), self._perda.copia()
+        fechamento = self._empurrar((medias, exps, ganho, perda), self._ultimo.copy(), self._provisoria)
+        colunas = {"Close": fechamento}
+        colunas.update({f"MA{j}": e.media() for j, e in medias.items()})
+        colunas.update({f"EMA{j}": e.media() for j, e in exps.items()})
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media_p = perda.media()
+            rs = ganho.media() / np.where(media_p == 0, np.nan, media_p)
+            colunas["RSI"] = 100 - (100 / (1 + rs))
+        return pd.DataFrame(colunas, index=self.tickers)
+
+    def _passado_igual(self, precos):
+        # O trecho já consolidado (antes da barra provisória) é o fim do que alimentou o estado?
+        # A janela móvel do app perde barras no início: só a sobreposição é conferida, e o estado
+        # segue carregando as barras que saíram. Um ticker que chegou vazio e depois ganhou o
+        # histórico, ou um passado revisado, muda os valores e força o cálculo completo.
+        anterior = precos[precos.index < self.data_provisoria]
+        n = len(anterior)
+        if n == 0 or n > len(self._datas):
+            return n == len(self._datas)
+        return (self._datas[len(self._datas) - n:].equals(anterior.index)
+                and np.allclose(anterior.to_numpy(dtype=float), self._valores[len(self._valores) - n:], equal_nan=True))
+
+    def sincronizar(self, precos):
+        # Reaproveita o estado se a matriz só ganhou barras novas (ou revisou a provisória),
+        # mesmo que tenha perdido barras do início; caso contrário refaz o cálculo completo
+        with self._trava:
+            if (self.tickers == list(precos.columns) and self.data_provisoria is not None
+                    and self.data_provisoria in precos.index and self._passado_igual(precos)):
+                # Esquece as barras que já saíram da janela
+                n = int((precos.index < self.data_provisoria).sum())
+                self._datas, self._valores = self._datas[len(self._datas) - n:], self._valores[len(self._valores) - n:]
+                for data, barra in precos.loc[self.data_provisoria:].iterrows():
+                    self.atualizar(data, barra)
+            else:
+                self.calcular(precos)
+            return self.ultimos()
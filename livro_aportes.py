@@ -0,0 +1,157 @@
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+import diagnostico
+
+# ==================== LIVRO DE APORTES (SQLITE, SÓ ANEXA) ====================
+
+ARQ_LIVRO = "aportes.db"
+CSV_LEGADO = "historico_aportes.csv"
+
+# Nomes exibidos nas tabelas (os mesmos do antigo historico_aportes.csv)
+COLUNAS = {
+    "data": "Data", "ativo": "Ativo", "preco": "Preço", "cotas": "Cotas",
+    "valor": "Valor Investido", "dy": "DY", "status": "Status no Aporte",
+}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS aportes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL,
+    ativo TEXT NOT NULL,
+    preco REAL NOT NULL,
+    cotas INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    dy TEXT,
+    status TEXT,
+    registrado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_aportes_data ON aportes (data);
+CREATE INDEX IF NOT EXISTS idx_aportes_ativo_data ON aportes (ativo, data);
+
+-- Posição consolidada por ativo, mantida pelo gatilho na mesma transação de cada aporte
+CREATE TABLE IF NOT EXISTS posicoes (
+    ativo TEXT PRIMARY KEY,
+    cotas INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    renda_compra REAL NOT NULL,
+    aportes INTEGER NOT NULL,
+    ultimo_aporte TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_aportes_posicoes AFTER INSERT ON aportes
+BEGIN
+    INSERT INTO posicoes (ativo, cotas, valor, renda_compra, aportes, ultimo_aporte)
+    VALUES (NEW.ativo, NEW.cotas, NEW.valor, NEW.valor * {dy_novo} / 12, 1, NEW.data)
+    ON CONFLICT (ativo) DO UPDATE SET
+        cotas = cotas + excluded.cotas,
+        valor = valor + excluded.valor,
+        renda_compra = renda_compra + excluded.renda_compra,
+        aportes = aportes + 1,
+        ultimo_aporte = MAX(ultimo_aporte, excluded.ultimo_aporte);
+END;
+"""
+
+# DY texto ("9,5%") -> fração, em SQL
+_DY_SQL = "COALESCE(CAST(REPLACE(REPLACE({col}, '%', ''), ',', '.') AS REAL), 0) / 100"
+ESQUEMA = ESQUEMA.replace("{dy_novo}", _DY_SQL.format(col="NEW.dy"))
+
+COLUNAS_POSICAO = {
+    "ativo": "Ativo", "cotas": "Cotas", "valor": "Valor Investido", "preco_medio": "Preço Médio",
+    "renda_compra": "Renda (DY na compra)", "aportes": "Aportes", "ultimo_aporte": "Último Aporte",
+}
+
+
+def _iso(data):
+    return pd.Timestamp(data).strftime("%Y-%m-%d")
+
+
+class LivroAportes:
+    # Cada aporte confirmado vira linhas novas numa transação; nada é reescrito.
+    # WAL deixa várias sessões lendo enquanto outra grava, sem uma sobrescrever a outra.
+
+    def __init__(self, caminho=ARQ_LIVRO, csv_legado=CSV_LEGADO):
+        self.caminho = caminho
+        with closing(self._conectar()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(ESQUEMA)
+            # Livros anteriores ao consolidado: reconstrói as posições uma única vez a partir do histórico
+            con.execute("BEGIN IMMEDIATE")
+            if con.execute("SELECT NOT EXISTS (SELECT 1 FROM posicoes) AND EXISTS (SELECT 1 FROM aportes)").fetchone()[0]:
+                con.execute(f"""
+                    INSERT INTO posicoes (ativo, cotas, valor, renda_compra, aportes, ultimo_aporte)
+                    SELECT ativo, SUM(cotas), SUM(valor), SUM(valor * {_DY_SQL.format(col="dy")} / 12), COUNT(*), MAX(data)
+                    FROM aportes GROUP BY ativo
+                """)
+        self._migrar(csv_legado)
+
+    def _conectar(self):
+        # Uma conexão por operação: sqlite3 não compartilha conexões entre as threads do Streamlit
+        con = sqlite3.connect(self.caminho, timeout=30)
+        con.execute("PRAGMA busy_timeout = 30000")
+        return con
+
+    def _migrar(self, csv_legado):
+        # Importa o CSV antigo uma única vez, quando o livro ainda está vazio
+        if not csv_legado or not os.path.exists(csv_legado) or self.versao() != (0, 0):
+            return
+        antigo = pd.read_csv(csv_legado)
+        if antigo.empty:
+            return
+        antigo["Data"] = pd.to_datetime(antigo["Data"], format="%d/%m/%Y", errors="coerce").fillna(pd.Timestamp.today())
+        self.registrar(antigo.rename(columns={v: k for k, v in COLUNAS.items()}).to_dict("records"))
+
+    @diagnostico.cronometrado("livro.registrar")
+    def registrar(self, registros):
+        # registros: dicts com data, ativo, preco, cotas, valor, dy e status. Uma transação por aporte.
+        agora = datetime.now().isoformat(timespec="seconds")
+        linhas = [
+            (_iso(r.get("data") or datetime.now()), r["ativo"], float(r["preco"]), int(r["cotas"]),
+             float(r["valor"]), r.get("dy"), r.get("status"), agora)
+            for r in registros
+        ]
+        with closing(self._conectar()) as con, con:
+            con.executemany(
+                "INSERT INTO aportes (data, ativo, preco, cotas, valor, dy, status, registrado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas,
+            )
+        return len(linhas)
+
+    def versao(self):
+        # (último id, total de linhas): muda a cada gravação, serve de chave de cache para as leituras
+        with closing(self._conectar()) as con:
+            return tuple(con.execute("SELECT COALESCE(MAX(id), 0), COUNT(*) FROM aportes").fetchone())
+
+    @diagnostico.cronometrado("livro.consultar")
+    def consultar(self, inicio=None, fim=None, ativos=None):
+        # Só as linhas do intervalo pedido, via índices de data e de ativo
+        filtros, parametros = [], []
+        if inicio is not None:
+            filtros.append("data >= ?")
+            parametros.append(_iso(inicio))
+        if fim is not None:
+            filtros.append("data <= ?")
+            parametros.append(_iso(fim))
+        if ativos:
+            ativos = list(ativos)
+            filtros.append(f"ativo IN ({', '.join('?' * len(ativos))})")
+            parametros.extend(ativos)
+        onde = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        with closing(self._conectar()) as con:
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(COLUNAS)} FROM aportes {onde} ORDER BY data, id", con, params=parametros
+            )
+        df["data"] = pd.to_datetime(df["data"]).dt.strftime("%d/%m/%Y")
+        return df.rename(columns=COLUNAS)
+
+    @diagnostico.cronometrado("livro.posicoes")
+    def posicoes(self):
+        # Uma linha por ativo, lida da tabela consolidada: o custo depende do número de ativos, não do histórico
+        with closing(self._conectar()) as con:
+            df = pd.read_sql_query(
+                "SELECT ativo, cotas, valor, valor / NULLIF(cotas, 0) AS preco_medio, renda_compra, aportes, ultimo_aporte "
+                "FROM posicoes ORDER BY ativo", con
+            )
+        df["ultimo_aporte"] = pd.to_datetime(df["ultimo_aporte"]).dt.strftime("%d/%m/%Y")
+        return df.rename(columns=COLUNAS_POSICAO)
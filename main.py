@@ -1,33 +1,63 @@
+import time
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import json
-import os
+import mercado
+import motor_radar
+import indicadores
+import motor_backtest
+import otimizador
+import simulador_renda
+import alocacao
+import livro_aportes
+import historico_renda
+import carteiras
+import tabelas
+import universo
+import conversao
+import diagnostico
 
 # ==================== HISTÓRICO DE APORTES ====================
 
-HIST_DIV = "historico_dividendos.json"
+# Histórico de renda: log de linhas só anexado + totais mensais persistidos ao lado
+@st.cache_resource
+def abrir_historico_renda():
+    # Uma instância por processo: a trava dos baldes mensais passa a valer entre sessões
+    return historico_renda.HistoricoRenda()
 
-def carregar_historico():
-    if os.path.exists(HIST_DIV):
-        with open(HIST_DIV, "r") as f:
-            return json.load(f)
-    return []
+historico_div = abrir_historico_renda()
 
-# Funções para Persistência de Dados
-def salvar_dados_usuario(dados):
-    with open("carteira_salva.json", "w") as f:
-        json.dump(dados, f)
+@st.cache_data
+def ler_historico_renda(tamanho, pagina=50):
+    # Chaveado no tamanho do log: só a série mensal e a última página de registros são lidas
+    return historico_div.mensal(), historico_div.ultimos(pagina)
 
-def carregar_dados_usuario():
-    if os.path.exists("carteira_salva.json"):
-        with open("carteira_salva.json", "r") as f:
-            return json.load(f)
-    return {}
+# Livro de aportes: cada confirmação só anexa linhas (SQLite); leituras em cache até a próxima gravação
+@st.cache_resource
+def abrir_livro():
+    # Uma instância por processo: o esquema (BEGIN IMMEDIATE) é preparado uma vez, não a cada rerun
+    return livro_aportes.LivroAportes()
 
-# Carrega os dados salvos ao iniciar
-dados_salvos = carregar_dados_usuario()
+livro = abrir_livro()
+
+@st.cache_data
+def ler_aportes(versao, inicio=None, fim=None):
+    return livro.consultar(inicio, fim)
+
+@st.cache_data
+def ler_posicoes(versao):
+    return livro.posicoes()
+
+# Carteiras salvas: uma por usuário, gravadas campo a campo (SQLite)
+@st.cache_resource
+def abrir_carteiras():
+    # Uma instância por processo: o esquema e a migração do JSON legado rodam uma vez, não a cada rerun
+    return carteiras.CarteirasUsuarios()
+
+carteiras_usuarios = abrir_carteiras()
+
+# Tempo do rerun inteiro, registrado no fim do script
+inicio_rerun = time.perf_counter()
 
 # 1. CONFIGURAÇÕES E ESTILO REFORÇADO (MANUTENÇÃO INTEGRAL)
 st.set_page_config(page_title="IA Rockefeller", page_icon="💰", layout="wide")
@@ -51,7 +81,7 @@ st.markdown("""
 
 st.title("💰 IA Rockefeller")
 
-# CRIAÇÃO DAS ABAS
+# CRIAÇÃO DAS ABAS (carregamento sob demanda: só a aba aberta é executada a cada rerun)
 tab_painel, tab_radar_modelo, tab_huli, tab_modelo, tab_dna, tab_backtest, tab_manual, tab_historico, tab_renda_mensal = st.tabs([
     "📊 Painel de Controle", 
     "🔍 Radar Carteira Modelo",
@@ -62,820 +92,1012 @@ tab_painel, tab_radar_modelo, tab_huli, tab_modelo, tab_dna, tab_backtest, tab_m
     "📖 Manual de Instruções",
     "📜 Histórico de Aportes",
     "📆 Renda Mensal & Dividendos"
-])
-
-# --- PROCESSAMENTO DE DADOS (DICIONÁRIOS COM ATIVOS ABAIXO DE R$ 10) ---
-
-# Ativos da Carteira Modelo (Aba 2)
-modelo_huli_tickers = {
-    "TAESA": "TAEE11.SA", "ENGIE": "EGIE3.SA", "ALUPAR": "ALUP11.SA",
-    "SANEPAR": "SAPR11.SA", "SABESP": "SBSP3.SA", "BANCO DO BRASIL": "BBAS3.SA",
-    "ITAÚ": "ITUB4.SA", "BB SEGURIDADE": "BBSE3.SA", "HGLG11": "HGLG11.SA",
-    "XPML11": "XPML11.SA", "IVVB11": "IVVB11.SA", "APPLE": "AAPL",
-    "RENNER": "LREN3.SA", "GRENDENE": "GRND3.SA", "MATEUS": "GMAT3.SA", 
-    "VISC11": "VISC11.SA", "MAGALU": "MGLU3.SA", "XPLG11": "XPLG11.SA",
-    "MXRF11": "MXRF11.SA", "CPTS11": "CPTS11.SA", "VGHF11": "VGHF11.SA",
-    # --- ATIVOS COM COTAS MENORES QUE R$ 10,00 ---
-    "VIVA11": "VIVA11.SA",    # Fundo de Shoppings/Varejo (Cota ~R$ 1,00)
-    "KLBN4": "KLBN4.SA",      # Klabin (Papel/Celulose) - Cota ~R$ 4,50
-    "SAPR4": "SAPR4.SA",      # Sanepar (Saneamento) - Cota ~R$ 5,50
-    "TRPL4": "TRPL4.SA",      # Transmissão Paulista (Energia) - Cota ~R$ 26 (Ação inteira, ignore esta)
-    "GARE11": "GARE11.SA",    # Galpões Logísticos/Renda Urbana - Cota ~R$ 9,00
-    "MGLU3": "MGLU3.SA"       # Magalu - Cota ~R$ 1,50 a 2,50
-}
-
-# Ativos Estratégicos Originais
-ativos_estrategicos = {
-    "PETR4.SA": "PETR4.SA", "VALE3.SA": "VALE3.SA", "BTC-USD": "BTC-USD", 
-    "Nvidia": "NVDA", "Jóias (Ouro)": "GC=F", "Nióbio": "NGLOY", 
-    "Grafeno": "FGPHF", "Câmbio USD/BRL": "USDBRL=X"
-}
-
-# UNIFICAÇÃO: Faz a Aba 1 mostrar TUDO (Originais + Modelo)
-tickers_map = {**ativos_estrategicos, **modelo_huli_tickers}
-
-try:
-    cambio_hoje = yf.Ticker("USDBRL=X").history(period="1d")['Close'].iloc[-1]
-except:
-    cambio_hoje = 5.40
-
-def calcular_dados(lista):
-    nomes_empresas = {
-        "PETR4.SA": "Petrobras", "VALE3.SA": "Vale", "MXRF11.SA": "FII MXRF11",
-        "BTC-USD": "Bitcoin", "NVDA": "Nvidia", "GC=F": "Ouro",
-        "NGLOY": "Nióbio", "FGPHF": "First Graphene", "USDBRL=X": "Dólar", 
-        "TAEE11.SA": "Taesa", "EGIE3.SA": "Engie", "ALUP11.SA": "Alupar",
-        "SAPR11.SA": "Sanepar", "SBSP3.SA": "Sabesp", "BBAS3.SA": "Banco do Brasil",
-        "ITUB4.SA": "Itaú", "BBSE3.SA": "BB Seguridade", "HGLG11.SA": "FII HGLG11",
-        "XPML11.SA": "FII XP Malls", "IVVB11.SA": "ETF S&P 500", "AAPL": "Apple",
-        "LREN3.SA": "Lojas Renner", "GRND3.SA": "Grendene", "GMAT3.SA": "Grupo Mateus",
-        "VISC11.SA": "FII Vinci Shopping", "MGLU3.SA": "Magalu", "VIVA11.SA": "FII VIVA11",
-        "KLBN4.SA": "Klabin", "SAPR4.SA": "Sanepar (P)", "GARE11.SA": "FII GARE11"
-    }
-    res = []
-    for nome_ex, t in lista.items():
-        try:
-            ativo = yf.Ticker(t)
-            hist = ativo.history(period="30d")
-            info = ativo.info
-            if not hist.empty:
-                p_atual = hist['Close'].iloc[-1]
-                emp_nome = nomes_empresas.get(t, nome_ex)
-                dy = info.get('dividendYield', 0)
-                dy_formata = f"{(dy*100):.1f}%".replace('.', ',') if dy else "0,0%"
-
-                if t in ["NVDA", "GC=F", "NGLOY", "FGPHF", "AAPL", "BTC-USD"]:
-                    p_atual = (p_atual / 31.1035) * cambio_hoje if t == "GC=F" else p_atual * cambio_hoje
-                
-                m_30 = hist['Close'].mean()
-                if t in ["NVDA", "NGLOY", "FGPHF", "AAPL", "BTC-USD"]: m_30 *= cambio_hoje
-                if t == "GC=F": m_30 = (m_30 / 31.1035) * cambio_hoje
-                
-                lpa, vpa = info.get('trailingEps', 0), info.get('bookValue', 0)
-                p_justo = np.sqrt(22.5 * lpa * vpa) if lpa > 0 and vpa > 0 else m_30
-                if t in ["NVDA", "AAPL"]: p_justo *= cambio_hoje
-                
-                status_m = "✅ DESCONTADO" if p_atual < p_justo else "❌ SOBREPREÇO"
-                variacoes = hist['Close'].pct_change() * 100
-                acao = "✅ COMPRAR" if p_atual < m_30 and status_m == "✅ DESCONTADO" else ("🛑 VENDER" if p_atual > (p_justo * 1.20) else "⚠️ ESPERAR")
-
-                res.append({
-                    "Ativo": nome_ex, "Empresa": emp_nome, "Ticker_Raw": t, "Preço": f"{p_atual:.2f}", 
-                    "Justo": f"{p_justo:.2f}", "DY": dy_formata, "Status M": status_m, "Ação": acao, 
-                    "V_Cru": p_atual, "Var_Min": variacoes.min(), "Var_Max": variacoes.max(), 
-                    "Dias_A": (variacoes > 0).sum(), "Dias_B": (variacoes < 0).sum(),
-                    "Var_H": variacoes.iloc[-1], "LPA": lpa, "VPA": vpa
-                })
-        except: continue
-    return pd.DataFrame(res)
+], on_change="rerun", key="aba_ativa")
+
+# --- UNIVERSO DE ATIVOS (universo.csv: nome, classe, moeda, segmento e grupos de cada ticker) ---
+universo_ativos = universo.carregar_universo()
+
+# Ativos Estratégicos Originais e Carteira Modelo (Aba 2)
+ativos_estrategicos = universo.mapa(universo.do_grupo(universo_ativos, "estrategico"))
+modelo_huli_tickers = universo.mapa(universo.do_grupo(universo_ativos, "modelo"))
+
+# UNIFICAÇÃO: Faz a Aba 1 mostrar TUDO (todo o universo, menos os ativos só de sinais)
+tickers_map = universo.mapa(universo.do_radar(universo_ativos))
+
+# Critérios do divisor de aportes em cotas inteiras (módulo alocacao)
+objetivos_aporte = {"⚖️ Pesos iguais com a menor sobra": "equilibrio", "💰 Maximizar a renda mensal": "renda"}
+
+# Ativos da aba de Sinais Integrados
+ativos_sinal = list(dict.fromkeys(universo.do_grupo(universo_ativos, "sinal")["ticker"]))
+
+# ATUALIZAÇÃO FORÇADA: descarta o cache de um único ativo antes de montar o snapshot
+with st.sidebar:
+    ticker_refresh = st.selectbox("🔄 Forçar atualização de:", list(dict.fromkeys([*tickers_map.values(), *ativos_sinal])))
+    st.button("Atualizar ativo", on_click=mercado.invalidar, args=(ticker_refresh,))
+
+# SNAPSHOT DE MERCADO: preços (12 meses), fundamentos e câmbio baixados uma única vez por atualização.
+# Nada é buscado aqui: a página abre com o último snapshot salvo e a renovação roda em segundo plano.
+snapshot = mercado.snapshot_atual()
+
+@st.fragment(run_every=2)
+def aguardar_atualizacao(versao_exibida):
+    # Troca as tabelas assim que a atualização em segundo plano publica um snapshot novo
+    if mercado.snapshot_atual().versao != versao_exibida:
+        st.rerun()
+
+with st.sidebar:
+    if snapshot.precos.empty:
+        st.caption("🕒 Nenhuma cotação salva ainda")
+    else:
+        minutos = int(snapshot.idade().total_seconds() // 60)
+        st.caption(f"🕒 Cotações de {snapshot.criado_em:%d/%m %H:%M} (há {minutos} min)")
+    if mercado.atualizando():
+        prontos, total = mercado.progresso()
+        st.caption(f"🔄 Atualizando cotações em segundo plano... {prontos}/{total}" if total else "🔄 Atualizando cotações em segundo plano...")
+    if mercado.atualizando() or mercado.snapshot_atual().versao != snapshot.versao:
+        aguardar_atualizacao(snapshot.versao)
+
+if snapshot.precos.empty and mercado.atualizando():
+    st.info("⏳ Buscando as cotações pela primeira vez. As tabelas aparecem assim que os dados chegarem.")
+
+# Moeda e unidade de cotação de cada ticker (universo.csv): toda conversão para R$ parte daqui
+cotacao_tickers = universo_ativos.drop_duplicates("ticker").set_index("ticker")[["moeda", "unidade"]]
+
+def em_reais(precos, anos=None):
+    # Matriz inteira convertida data a data pelo câmbio de cada dia (um par de câmbio por moeda)
+    series = snapshot.series_cambio(cotacao_tickers["moeda"].reindex(precos.columns).dropna(), anos)
+    return conversao.converter(precos, cotacao_tickers["moeda"], cotacao_tickers["unidade"], series)
+
+@diagnostico.cronometrado("calcular_dados")
+def calcular_dados(lista, snapshot, progresso=None):
+    snapshot.garantir(lista.values())
+    empresas = universo_ativos.drop_duplicates("ticker").set_index("ticker")["empresa"]
+    tickers = list(dict.fromkeys(lista.values()))
+    # Câmbio buscado uma vez para todas as moedas do universo
+    series = snapshot.series_cambio(cotacao_tickers["moeda"].reindex(tickers).dropna())
+
+    def radar_do_bloco(bloco):
+        info = {t: snapshot.info(t) for t in bloco}
+        # Janela de 30 dias da matriz (datas x tickers) do snapshot, só das colunas do bloco, já em R$
+        precos = conversao.converter(snapshot.fechamentos(bloco, dias=30), cotacao_tickers["moeda"], cotacao_tickers["unidade"], series)
+        # LPA e VPA vêm na moeda de cotação: convertidos pelo câmbio atual
+        hoje = conversao.fator_atual(bloco, cotacao_tickers["moeda"], series)
+        campo = lambda nome: pd.to_numeric(pd.Series({t: info[t].get(nome) for t in bloco}, dtype=object), errors="coerce") * hoje
+        radar = motor_radar.calcular_radar(precos, lpa=campo('trailingEps'), vpa=campo('bookValue'))
+        for t in bloco:
+            if t not in radar.index and t not in snapshot.falhas:
+                snapshot.registrar_falha(t, "vazio", "sem cotações nos últimos 30 dias")
+        radar["DY"] = pd.to_numeric(pd.Series({t: info[t].get('dividendYield') for t in bloco}, dtype=object), errors="coerce").reindex(radar.index).fillna(0.0)
+        return radar
+
+    # Universo grande: processado em blocos de tickers, com o progresso exibido por quem chamou
+    radar = universo.processar_em_blocos(tickers, radar_do_bloco, progresso=progresso)
+    # Quadro tipado indexado pelo nome do ativo: números ficam números (DY em fração), texto só nas tabelas
+    df = pd.DataFrame({"Ticker_Raw": list(lista.values())}, index=pd.Index(list(lista.keys()), name="Ativo"))
+    df = df[df["Ticker_Raw"].isin(radar.index)]
+    df["Empresa"] = df["Ticker_Raw"].map(empresas).fillna(df.index.to_series())
+    df = df.join(radar.rename(columns={"V_Cru": "Preço", "P_Justo": "Justo"}), on="Ticker_Raw")
+    return df[[
+        "Empresa", "Ticker_Raw", "Preço", "Justo", "DY", "Status M", "Ação",
+        "Var_Min", "Var_Max", "Dias_A", "Dias_B", "Var_H", "LPA", "VPA"
+    ]]
     
-df_radar = calcular_dados(tickers_map)
-df_radar_modelo = calcular_dados(modelo_huli_tickers)
+def carregar_radar():
+    # Calculado na primeira aba que precisar dele e reaproveitado pelas demais até o próximo snapshot
+    def calcular():
+        barra = st.progress(0.0, text="Calculando o radar...")
+        df_radar = calcular_dados(
+            tickers_map, snapshot,
+            progresso=lambda feitos, total: barra.progress(feitos / total, text=f"Calculando o radar: {feitos}/{total} ativos")
+        )
+        barra.empty()
+        # A carteira modelo já está contida no radar geral: basta filtrar, sem nova busca
+        df_radar_modelo = df_radar[df_radar.index.isin(list(modelo_huli_tickers))]
+        return df_radar, df_radar_modelo
+    return snapshot.memo("radar", calcular)
+
+# ==================== TABELAS ROCKEFELLER ====================
+# Cada formatador monta as células coluna a coluna; o HTML fica em cache pelo conteúdo do DataFrame
+
+def cel_radar(df):
+    textos = motor_radar.formatar_radar(df)
+    return pd.DataFrame({
+        "Empresa": df["Empresa"], "Ativo": df.index.to_series(), "Preço": textos["Preço"], "Justo": textos["Justo"],
+        "DY": textos["DY"], "Status": df["Status M"], "Ação": df["Ação"],
+    })
+
+def cel_radar_modelo(df):
+    textos = motor_radar.formatar_radar(df)
+    return pd.DataFrame({
+        "Ativo": df.index.to_series(), "Preço (R$)": textos["Preço"], "Preço Justo": textos["Justo"],
+        "Dividendos (DY)": textos["DY"], "Status Mercado": df["Status M"], "Ação": df["Ação"],
+    })
+
+def cel_volatilidade(df):
+    recorde = (df["Var_H"] <= df["Var_Min"] * 0.98) & (df["Var_H"] < 0)
+    return pd.DataFrame({
+        "Ativo": df.index.to_series(),
+        "Dias A/B": "🟢" + df["Dias_A"].astype(str) + "/🔴" + df["Dias_B"].astype(str),
+        "Pico": "+" + df["Var_Max"].map("{:.2f}%".format).astype(str),
+        "Fundo": df["Var_Min"].map("{:.2f}%".format),
+        "Alerta": recorde.map({True: "🚨 RECORDE", False: "Normal"}),
+    })
+
+def cel_posicoes(df):
+    return pd.DataFrame({
+        "Ativo": df["Ativo"], "Qtd": df["Qtd"], "PM": "R$ " + df["PM"],
+        "Valor Atual": "R$ " + df["Total"], "Lucro/Prej": df["Lucro"],
+    })
+
+def cel_huli(df):
+    textos = motor_radar.formatar_radar(df)
+    return pd.DataFrame({
+        "Ativo": "<b>" + df.index.to_series() + "</b>",
+        "Preço (R$)": "R$ " + textos["Preço"],
+        "Status": "<b style='color:#00ff00'>" + df["Ação"].astype(str) + "</b>",
+        "Cotas": "<b style='color:#00d4ff'>" + df["Cotas"].astype(str) + " UN</b>",
+        "Dividendos (DY)": textos["DY"],
+        "Renda Mensal Est.": "<span style='color:#f1c40f'>R$ " + df["Renda"].map("{:.2f}".format) + "</span>",
+    })
+
+def cel_dna(df):
+    preco = df["Preço"]
+    return pd.DataFrame({
+        "Ativo": df.index.to_series(),
+        "LPA (Lucro)": df["LPA"].map("{:.2f}".format),
+        "VPA (Patrimônio)": df["VPA"].map("{:.2f}".format),
+        "P/L": (preco / df["LPA"]).where(df["LPA"] > 0, 0.0).map("{:.2f}".format),
+        "P/VP": (preco / df["VPA"]).where(df["VPA"] > 0, 0.0).map("{:.2f}".format),
+    })
+
+def tabela_rockefeller(df, formatar, chave, por_pagina=tabelas.LINHAS_POR_PAGINA):
+    # Universos grandes vão ao navegador uma página por vez
+    pagina = 0
+    if len(df) > por_pagina:
+        paginas = -(-len(df) // por_pagina)
+        pagina = st.number_input(f"Página (de {paginas}):", min_value=1, max_value=paginas, value=1, key=f"pagina_{chave}") - 1
+        st.caption(f"Linhas {pagina * por_pagina + 1}–{min((pagina + 1) * por_pagina, len(df))} de {len(df)}")
+    st.markdown(tabelas.renderizar(df, formatar, pagina, por_pagina), unsafe_allow_html=True)
+
 if 'carteira' not in st.session_state: st.session_state.carteira = {}
 if 'carteira_modelo' not in st.session_state: st.session_state.carteira_modelo = {}
 
+# CARTEIRA DO USUÁRIO: lida uma vez por sessão (e após cada gravação); as versões lidas
+# são as que o botão de salvar confere para não sobrescrever outra sessão
+with st.sidebar:
+    usuario = st.text_input("👤 Usuário:", value=st.query_params.get("usuario", carteiras.USUARIO_PADRAO)).strip() or carteiras.USUARIO_PADRAO
+if st.query_params.get("usuario") != usuario:
+    st.query_params["usuario"] = usuario
+if st.session_state.get("carteira_usuario", (None,))[0] != usuario:
+    st.session_state.carteira_usuario = (usuario, *carteiras_usuarios.carregar(usuario))
+_, dados_salvos, versoes_salvas = st.session_state.carteira_usuario
+
 # ==================== ABA 1: PAINEL DE CONTROLE ====================
-with tab_painel:
-    st.subheader("🛰️ Radar de Ativos Estratégicos")
-    html_radar = f"""<div class="mobile-table-container"><table class="rockefeller-table">
-        <thead><tr><th>Empresa</th><th>Ativo</th><th>Preço</th><th>Justo</th><th>DY</th><th>Status</th><th>Ação</th></tr></thead>
-        <tbody>{"".join([f"<tr><td>{r['Empresa']}</td><td>{r['Ativo']}</td><td>{r['Preço']}</td><td>{r['Justo']}</td><td>{r['DY']}</td><td>{r['Status M']}</td><td>{r['Ação']}</td></tr>" for _, r in df_radar.iterrows()])}</tbody>
-    </table></div>"""
-    st.markdown(html_radar, unsafe_allow_html=True)
-    
-    st.subheader("📊 Raio-X de Volatilidade")
-    html_vol = f"""<div class="mobile-table-container"><table class="rockefeller-table">
-        <thead><tr><th>Ativo</th><th>Dias A/B</th><th>Pico</th><th>Fundo</th><th>Alerta</th></tr></thead>
-        <tbody>{"".join([f"<tr><td>{r['Ativo']}</td><td>🟢{r['Dias_A']}/🔴{r['Dias_B']}</td><td>+{r['Var_Max']:.2f}%</td><td>{r['Var_Min']:.2f}%</td><td>{'🚨 RECORDE' if r['Var_H'] <= (r['Var_Min']*0.98) and r['Var_H'] < 0 else 'Normal'}</td></tr>" for _, r in df_radar.iterrows()])}</tbody>
-    </table></div>"""
-    st.markdown(html_vol, unsafe_allow_html=True)
-
-    st.subheader("🌡️ Sentimento de Mercado")
-    caros = len(df_radar[df_radar['Status M'] == "❌ SOBREPREÇO"])
-    score = (caros / len(df_radar)) * 100 if len(df_radar) > 0 else 0
-    st.progress(score / 100)
-    st.write(f"Índice de Ativos Caros: **{int(score)}%**")
-
-    st.markdown("---")
-    st.subheader("🧮 Gestor de Carteira Dinâmica")
-    capital_xp = st.number_input("💰 Capital Total na Corretora XP (R$):", min_value=0.0, value=dados_salvos.get("capital_xp", 0.0), step=100.0)
-    ativos_sel = st.multiselect("Habilite seus ativos:", df_radar["Ativo"].unique(), default=["PETR4.SA"])
+if tab_painel.open:
+    with tab_painel:
+        df_radar, df_radar_modelo = carregar_radar()
+        st.subheader("🛰️ Radar de Ativos Estratégicos")
+        tabela_rockefeller(df_radar, cel_radar, "radar")
     
-    total_investido_acumulado, v_ativos_atualizado = 0, 0
-    lista_c, df_grafico = [], pd.DataFrame()
-    if ativos_sel:
-        cols = st.columns(2)
-        for i, nome in enumerate(ativos_sel):
-            with cols[i % 2]:
-                st.markdown(f"**{nome}**")
-                
-                # BUSCA VALORES SALVOS (Adicionado aqui)
-                val_qtd_salvo = dados_salvos.get(f"q_{nome}", 0)
-                val_inv_salvo = dados_salvos.get(f"i_{nome}", 0.0)
-
-                qtd = st.number_input(f"Qtd Cotas ({nome}):", min_value=0, value=val_qtd_salvo, key=f"q_{nome}")
-                investido = st.number_input(f"Total Investido R$ ({nome}):", min_value=0.0, value=val_inv_salvo, key=f"i_{nome}")
-                info = df_radar[df_radar["Ativo"] == nome].iloc[0]
-                p_atual = info["V_Cru"]
-                pm_calc = investido / qtd if qtd > 0 else 0.0
-                v_agora = qtd * p_atual
-
-                # --- NOVO: ALERTA DE PREÇO MÉDIO PARA GMAT3 E OUTROS ---
-                if qtd > 0:
-                    if p_atual < pm_calc:
-                        desconto = ((pm_calc - p_atual) / pm_calc) * 100
-                        st.warning(f"📉 **OPORTUNIDADE EM {nome}:** Está {desconto:.1f}% abaixo do seu PM (R$ {pm_calc:.2f}). Hora de comprar mais cotas!")
-                    else:
-                        st.info(f"✅ **{nome}:** Acima do seu Preço Médio.")
-                # ------------------------------------------------------
-                total_investido_acumulado += investido
-                v_ativos_atualizado += v_agora
-                st.session_state.carteira[nome] = {"atual": v_agora}
-                lista_c.append({"Ativo": nome, "Qtd": qtd, "PM": f"{pm_calc:.2f}", "Total": f"{v_agora:.2f}", "Lucro": f"{(v_agora - investido):.2f}"})
-                df_grafico[nome] = yf.Ticker(info["Ticker_Raw"]).history(period="30d")['Close']
-        
-        troco_real = capital_xp - total_investido_acumulado
-        st.markdown(f"""<div class="mobile-table-container"><table class="rockefeller-table">
-            <thead><tr><th>Ativo</th><th>Qtd</th><th>PM</th><th>Valor Atual</th><th>Lucro/Prej</th></tr></thead>
-            <tbody>{"".join([f"<tr><td>{r['Ativo']}</td><td>{r['Qtd']}</td><td>R$ {r['PM']}</td><td>R$ {r['Total']}</td><td>{r['Lucro']}</td></tr>" for r in lista_c])}</tbody>
-        </table></div>""", unsafe_allow_html=True)
+        st.subheader("📊 Raio-X de Volatilidade")
+        tabela_rockefeller(df_radar, cel_volatilidade, "vol")
+
+        st.subheader("🌡️ Sentimento de Mercado")
+        caros = int((df_radar['Status M'] == motor_radar.SOBREPRECO).sum())
+        score = (caros / len(df_radar)) * 100 if len(df_radar) > 0 else 0
+        st.progress(score / 100)
+        st.write(f"Índice de Ativos Caros: **{int(score)}%**")
 
-        st.subheader("💰 Patrimônio Global")
+        # Outros bens ficam na barra lateral, fora dos fragmentos (que só desenham no próprio corpo)
         with st.sidebar:
             st.header("⚙️ Outros Bens")
             # Agora eles buscam o que você salvou antes
             g_joias = st.number_input("Ouro Físico (gramas):", min_value=0.0, value=dados_salvos.get("g_joias", 0.0))
             v_bens = st.number_input("Outros Bens/Imóveis (R$):", min_value=0.0, value=dados_salvos.get("v_bens", 0.0))
 
-        p_ouro = float(df_radar[df_radar['Ativo'] == "Jóias (Ouro)"]['V_Cru'].values[0])
-        valor_ouro_total = g_joias * p_ouro
-        patri_global = v_ativos_atualizado + troco_real + valor_ouro_total + v_bens
-
-        m1, m2, m3 = st.columns(3)
-        m1.metric("Bolsa/Criptos", f"R$ {v_ativos_atualizado:,.2f}")
-        m2.metric("Troco (XP) + Bens", f"R$ {(troco_real + valor_ouro_total + v_bens):,.2f}")
-        m3.metric("PATRIMÔNIO TOTAL", f"R$ {patri_global:,.2f}")
-        st.line_chart(df_grafico)
-
-# --- CALCULADORA DE APORTE (PARA COMPRAR GMAT3 E OUTROS) ---
-        st.markdown("---")
-        st.subheader("🛍️ Planejador de Compras (Cotas)")
-        valor_disponivel = st.number_input("Quanto pretende investir hoje? (R$):", min_value=0.0, value=500.0, step=100.0, key="calc_aporte")
-        
-        if not df_radar.empty:
-            df_calc = df_radar[['Ativo', 'V_Cru', 'Ação']].copy()
-            df_calc['Cotas'] = (valor_disponivel // df_calc['V_Cru']).astype(int)
-            df_calc['Troco'] = (valor_disponivel % df_calc['V_Cru']).map("R$ {:.2f}".format)
-            
-            st.write(f"Com **R$ {valor_disponivel:.2f}**, você consegue comprar:")
-            st.dataframe(df_calc[['Ativo', 'Cotas', 'Ação', 'Troco']], use_container_width=True, hide_index=True)
-            
-            # Destaque Mateus
-            mateus_row = df_calc[df_calc['Ativo'] == "MATEUS"]
-            if not mateus_row.empty:
-                qtd_mateus = mateus_row['Cotas'].values[0]
-                st.info(f"💡 **Foco GMAT3:** Seu aporte permite comprar **{qtd_mateus} cotas** do Grupo Mateus.")
-
-# --- BOTÃO PARA SALVAR (Cole aqui antes da calculadora de aporte) ---
-        st.markdown("---")
-        if st.button("💾 Salvar Minha Carteira"):
-            dados_para_salvar = {}
-            # Salva o capital da XP
-            dados_para_salvar["capital_xp"] = capital_xp
-            # Salva qtd e valor de cada ativo selecionado
-            for nome in ativos_sel:
-                dados_para_salvar[f"q_{nome}"] = st.session_state[f"q_{nome}"]
-                dados_para_salvar[f"i_{nome}"] = st.session_state[f"i_{nome}"]
-            
-            salvar_dados_usuario(dados_para_salvar)
-            st.success("✅ Tudo salvo! Na próxima vez que abrir, seus dados estarão aqui.")
+        # FRAGMENTOS: editar um campo reexecuta só a conta do próprio bloco, sobre o radar já calculado
+        @st.fragment
+        @diagnostico.cronometrado("fragmento.gestor")
+        def gestor_carteira(df_radar, g_joias, v_bens):
+            # Lido a cada execução: depois de salvar, as versões novas valem sem esperar um rerun completo
+            _, dados_salvos, versoes_salvas = st.session_state.carteira_usuario
+            st.markdown("---")
+            st.subheader("🧮 Gestor de Carteira Dinâmica")
+            capital_xp = st.number_input("💰 Capital Total na Corretora XP (R$):", min_value=0.0, value=dados_salvos.get("capital_xp", 0.0), step=100.0)
+            ativos_sel = st.multiselect("Habilite seus ativos:", df_radar.index, default=["PETR4.SA"] if "PETR4.SA" in df_radar.index else [])
+
+            total_investido_acumulado, v_ativos_atualizado = 0, 0
+            lista_c, df_grafico = [], pd.DataFrame()
+            if not ativos_sel:
+                return
+            cols = st.columns(2)
+            for i, nome in enumerate(ativos_sel):
+                with cols[i % 2]:
+                    st.markdown(f"**{nome}**")
+
+                    # BUSCA VALORES SALVOS (Adicionado aqui)
+                    val_qtd_salvo = dados_salvos.get(f"q_{nome}", 0)
+                    val_inv_salvo = dados_salvos.get(f"i_{nome}", 0.0)
+
+                    qtd = st.number_input(f"Qtd Cotas ({nome}):", min_value=0, value=val_qtd_salvo, key=f"q_{nome}")
+                    investido = st.number_input(f"Total Investido R$ ({nome}):", min_value=0.0, value=val_inv_salvo, key=f"i_{nome}")
+                    info = df_radar.loc[nome]
+                    p_atual = info["Preço"]
+                    pm_calc = investido / qtd if qtd > 0 else 0.0
+                    v_agora = qtd * p_atual
+
+                    # --- NOVO: ALERTA DE PREÇO MÉDIO PARA GMAT3 E OUTROS ---
+                    if qtd > 0:
+                        if p_atual < pm_calc:
+                            desconto = ((pm_calc - p_atual) / pm_calc) * 100
+                            st.warning(f"📉 **OPORTUNIDADE EM {nome}:** Está {desconto:.1f}% abaixo do seu PM (R$ {pm_calc:.2f}). Hora de comprar mais cotas!")
+                        else:
+                            st.info(f"✅ **{nome}:** Acima do seu Preço Médio.")
+                    # ------------------------------------------------------
+                    total_investido_acumulado += investido
+                    v_ativos_atualizado += v_agora
+                    st.session_state.carteira[nome] = {"atual": v_agora}
+                    lista_c.append({"Ativo": nome, "Qtd": qtd, "PM": f"{pm_calc:.2f}", "Total": f"{v_agora:.2f}", "Lucro": f"{(v_agora - investido):.2f}"})
+                    with diagnostico.medir("gestor.historico"):
+                        df_grafico[nome] = snapshot.historico(info["Ticker_Raw"], dias=30)
+
+            troco_real = capital_xp - total_investido_acumulado
+            tabela_rockefeller(pd.DataFrame(lista_c), cel_posicoes, "posicoes")
+
+            st.subheader("💰 Patrimônio Global")
+            p_ouro = float(df_radar["Preço"].get("Jóias (Ouro)", 0.0))
+            valor_ouro_total = g_joias * p_ouro
+            patri_global = v_ativos_atualizado + troco_real + valor_ouro_total + v_bens
+
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Bolsa/Criptos", f"R$ {v_ativos_atualizado:,.2f}")
+            m2.metric("Troco (XP) + Bens", f"R$ {(troco_real + valor_ouro_total + v_bens):,.2f}")
+            m3.metric("PATRIMÔNIO TOTAL", f"R$ {patri_global:,.2f}")
+            st.line_chart(df_grafico)
+
+            # --- BOTÃO PARA SALVAR ---
+            st.markdown("---")
+            if st.button("💾 Salvar Minha Carteira"):
+                dados_para_salvar = {}
+                # Salva o capital da XP e os outros bens
+                dados_para_salvar["capital_xp"] = capital_xp
+                dados_para_salvar["g_joias"] = g_joias
+                dados_para_salvar["v_bens"] = v_bens
+                # Salva qtd e valor de cada ativo selecionado
+                for nome in ativos_sel:
+                    dados_para_salvar[f"q_{nome}"] = st.session_state[f"q_{nome}"]
+                    dados_para_salvar[f"i_{nome}"] = st.session_state[f"i_{nome}"]
+
+                # Só os campos que mudaram desde a leitura são gravados
+                alterados = {k: v for k, v in dados_para_salvar.items() if dados_salvos.get(k) != v}
+                try:
+                    carteiras_usuarios.salvar(usuario, alterados, versoes_salvas)
+                    st.success("✅ Tudo salvo! Na próxima vez que abrir, seus dados estarão aqui.")
+                except carteiras.ConflitoVersao as e:
+                    st.error(f"⚠️ Outra sessão alterou {', '.join(e.campos)} depois que você abriu a carteira. Salve de novo para manter os valores desta tela.")
+                st.session_state.carteira_usuario = (usuario, *carteiras_usuarios.carregar(usuario))
+
+        # --- CALCULADORA DE APORTE (PARA COMPRAR GMAT3 E OUTROS) ---
+        @st.fragment
+        @diagnostico.cronometrado("fragmento.planejador")
+        def planejador_compras(df_radar):
+            st.markdown("---")
+            st.subheader("🛍️ Planejador de Compras (Cotas)")
+            valor_disponivel = st.number_input("Quanto pretende investir hoje? (R$):", min_value=0.0, value=500.0, step=100.0, key="calc_aporte")
+
+            if not df_radar.empty:
+                df_calc = df_radar[['Preço', 'Ação']].copy()
+                df_calc['Cotas'] = (valor_disponivel // df_calc['Preço']).astype(int)
+                df_calc['Troco'] = (valor_disponivel % df_calc['Preço']).map("R$ {:.2f}".format)
+
+                st.write(f"Com **R$ {valor_disponivel:.2f}**, você consegue comprar:")
+                st.dataframe(df_calc[['Cotas', 'Ação', 'Troco']].reset_index(), use_container_width=True, hide_index=True)
+
+                # Destaque Mateus
+                if "MATEUS" in df_calc.index:
+                    qtd_mateus = df_calc.at["MATEUS", 'Cotas']
+                    st.info(f"💡 **Foco GMAT3:** Seu aporte permite comprar **{qtd_mateus} cotas** do Grupo Mateus.")
+
+        gestor_carteira(df_radar, g_joias, v_bens)
+        planejador_compras(df_radar)
 
 # ==================== ABA 2: RADAR CARTEIRA MODELO ====================
-with tab_radar_modelo:
-    st.subheader("🛰️ Radar de Ativos: Carteira Modelo Tio Huli")
-    html_radar_m = f"""<div class="mobile-table-container"><table class="rockefeller-table">
-        <thead><tr><th>Ativo</th><th>Preço (R$)</th><th>Preço Justo</th><th>Dividendos (DY)</th><th>Status Mercado</th><th>Ação</th></tr></thead>
-        <tbody>{"".join([f"<tr><td>{r['Ativo']}</td><td>{r['Preço']}</td><td>{r['Justo']}</td><td>{r['DY']}</td><td>{r['Status M']}</td><td>{r['Ação']}</td></tr>" for _, r in df_radar_modelo.iterrows()])}</tbody>
-    </table></div>"""
-    st.markdown(html_radar_m, unsafe_allow_html=True)
-
-    st.subheader("📊 Raio-X de Volatilidade (Ativos Modelo)")
-    html_vol_m = f"""<div class="mobile-table-container"><table class="rockefeller-table">
-        <thead><tr><th>Ativo</th><th>Dias A/B</th><th>Pico</th><th>Fundo</th><th>Alerta</th></tr></thead>
-        <tbody>{"".join([f"<tr><td>{r['Ativo']}</td><td>🟢{r['Dias_A']}/🔴{r['Dias_B']}</td><td>+{r['Var_Max']:.2f}%</td><td>{r['Var_Min']:.2f}%</td><td>{'🚨 RECORDE' if r['Var_H'] <= (r['Var_Min']*0.98) and r['Var_H'] < 0 else 'Normal'}</td></tr>" for _, r in df_radar_modelo.iterrows()])}</tbody>
-    </table></div>"""
-    st.markdown(html_vol_m, unsafe_allow_html=True)
-
-    st.subheader("🌡️ Sentimento de Mercado (Modelo)")
-    caros_m = len(df_radar_modelo[df_radar_modelo['Status M'] == "❌ SOBREPREÇO"])
-    score_m = (caros_m / len(df_radar_modelo)) * 100 if len(df_radar_modelo) > 0 else 0
-    st.progress(score_m / 100)
-    st.write(f"Índice de Sobrepreço Modelo: **{int(score_m)}%**")
-
-    st.markdown("---")
-    st.subheader("🧮 Gestor de Carteira: Ativos Modelo")
-    capital_xp_m = st.number_input("💰 Capital na Corretora para Ativos Modelo (R$):", min_value=0.0, value=0.0, step=100.0, key="cap_huli")
-    ativos_sel_m = st.multiselect("Habilite ativos da Carteira Modelo:", df_radar_modelo["Ativo"].unique(), key="sel_huli")
-    
-    total_investido_acum_m, v_ativos_atual_m = 0, 0
-    lista_c_m, df_grafico_m = [], pd.DataFrame()
-    if ativos_sel_m:
-        cols_m = st.columns(2)
-        for i, nome in enumerate(ativos_sel_m):
-            with cols_m[i % 2]:
-                st.markdown(f"**{nome}**")
-                qtd_m = st.number_input(f"Qtd Cotas ({nome}):", min_value=0, key=f"q_m_{nome}")
-                investido_m = st.number_input(f"Total Investido R$ ({nome}):", min_value=0.0, key=f"i_m_{nome}")
-                info_m = df_radar_modelo[df_radar_modelo["Ativo"] == nome].iloc[0]
-                p_atual_m = info_m["V_Cru"]
-                pm_calc_m = investido_m / qtd_m if qtd_m > 0 else 0.0
-                v_agora_m = qtd_m * p_atual_m
-                total_investido_acum_m += investido_m
-                v_ativos_atual_m += v_agora_m
-                st.session_state.carteira_modelo[nome] = {"atual": v_agora_m}
-                lista_c_m.append({"Ativo": nome, "Qtd": qtd_m, "PM": f"{pm_calc_m:.2f}", "Total": f"{v_agora_m:.2f}", "Lucro": f"{(v_agora_m - investido_m):.2f}"})
-                df_grafico_m[nome] = yf.Ticker(info_m["Ticker_Raw"]).history(period="30d")['Close']
-        
-        troco_real_m = capital_xp_m - total_investido_acum_m
-        st.markdown(f"""<div class="mobile-table-container"><table class="rockefeller-table">
-            <thead><tr><th>Ativo</th><th>Qtd</th><th>PM</th><th>Valor Atual</th><th>Lucro/Prej</th></tr></thead>
-            <tbody>{"".join([f"<tr><td>{r['Ativo']}</td><td>{r['Qtd']}</td><td>R$ {r['PM']}</td><td>R$ {r['Total']}</td><td>{r['Lucro']}</td></tr>" for r in lista_c_m])}</tbody>
-        </table></div>""", unsafe_allow_html=True)
-
-        st.subheader("💰 Patrimônio Global (Estratégia Modelo)")
-        patri_global_m = v_ativos_atual_m + troco_real_m
-        m1_m, m2_m = st.columns(2)
-        m1_m.metric("Total em Ativos Modelo", f"R$ {v_ativos_atual_m:,.2f}")
-        m2_m.metric("PATRIMÔNIO MODELO TOTAL", f"R$ {patri_global_m:,.2f}")
-        
-        # --- CORREÇÃO INTEGRADA: PROTEÇÃO DO GRÁFICO ---
-        if not df_grafico_m.empty and v_ativos_atual_m > 0:
-            try:
-                st.bar_chart(df_grafico_m.iloc[-1].fillna(0))
-            except Exception:
-                pass
+if tab_radar_modelo.open:
+    with tab_radar_modelo:
+        df_radar, df_radar_modelo = carregar_radar()
+        st.subheader("🛰️ Radar de Ativos: Carteira Modelo Tio Huli")
+        tabela_rockefeller(df_radar_modelo, cel_radar_modelo, "radar_m")
+
+        st.subheader("📊 Raio-X de Volatilidade (Ativos Modelo)")
+        tabela_rockefeller(df_radar_modelo, cel_volatilidade, "vol_m")
+
+        st.subheader("🌡️ Sentimento de Mercado (Modelo)")
+        caros_m = int((df_radar_modelo['Status M'] == motor_radar.SOBREPRECO).sum())
+        score_m = (caros_m / len(df_radar_modelo)) * 100 if len(df_radar_modelo) > 0 else 0
+        st.progress(score_m / 100)
+        st.write(f"Índice de Sobrepreço Modelo: **{int(score_m)}%**")
+
+        # Fragmento: as cotas e valores de cada ativo só refazem as contas deste gestor
+        @st.fragment
+        @diagnostico.cronometrado("fragmento.gestor_modelo")
+        def gestor_modelo(df_radar_modelo):
+            st.markdown("---")
+            st.subheader("🧮 Gestor de Carteira: Ativos Modelo")
+            capital_xp_m = st.number_input("💰 Capital na Corretora para Ativos Modelo (R$):", min_value=0.0, value=0.0, step=100.0, key="cap_huli")
+            ativos_sel_m = st.multiselect("Habilite ativos da Carteira Modelo:", df_radar_modelo.index, key="sel_huli")
+
+            total_investido_acum_m, v_ativos_atual_m = 0, 0
+            lista_c_m, df_grafico_m = [], pd.DataFrame()
+            if not ativos_sel_m:
+                return
+            cols_m = st.columns(2)
+            for i, nome in enumerate(ativos_sel_m):
+                with cols_m[i % 2]:
+                    st.markdown(f"**{nome}**")
+                    qtd_m = st.number_input(f"Qtd Cotas ({nome}):", min_value=0, key=f"q_m_{nome}")
+                    investido_m = st.number_input(f"Total Investido R$ ({nome}):", min_value=0.0, key=f"i_m_{nome}")
+                    info_m = df_radar_modelo.loc[nome]
+                    p_atual_m = info_m["Preço"]
+                    pm_calc_m = investido_m / qtd_m if qtd_m > 0 else 0.0
+                    v_agora_m = qtd_m * p_atual_m
+                    total_investido_acum_m += investido_m
+                    v_ativos_atual_m += v_agora_m
+                    st.session_state.carteira_modelo[nome] = {"atual": v_agora_m}
+                    lista_c_m.append({"Ativo": nome, "Qtd": qtd_m, "PM": f"{pm_calc_m:.2f}", "Total": f"{v_agora_m:.2f}", "Lucro": f"{(v_agora_m - investido_m):.2f}"})
+                    with diagnostico.medir("gestor.historico"):
+                        df_grafico_m[nome] = snapshot.historico(info_m["Ticker_Raw"], dias=30)
+
+            troco_real_m = capital_xp_m - total_investido_acum_m
+            tabela_rockefeller(pd.DataFrame(lista_c_m), cel_posicoes, "posicoes_m")
+
+            st.subheader("💰 Patrimônio Global (Estratégia Modelo)")
+            patri_global_m = v_ativos_atual_m + troco_real_m
+            m1_m, m2_m = st.columns(2)
+            m1_m.metric("Total em Ativos Modelo", f"R$ {v_ativos_atual_m:,.2f}")
+            m2_m.metric("PATRIMÔNIO MODELO TOTAL", f"R$ {patri_global_m:,.2f}")
+
+            # --- CORREÇÃO INTEGRADA: PROTEÇÃO DO GRÁFICO ---
+            if not df_grafico_m.empty and v_ativos_atual_m > 0:
+                try:
+                    st.bar_chart(df_grafico_m.iloc[-1].fillna(0))
+                except Exception:
+                    pass
+
+        gestor_modelo(df_radar_modelo)
 
 # ==================== ABA 3: ESTRATÉGIA HULI ====================
-with tab_huli:
-    st.header("🎯 Estratégia Tio Huli: Próximos Passos")
+if tab_huli.open:
+    with tab_huli:
+        df_radar, df_radar_modelo = carregar_radar()
+        st.header("🎯 Estratégia Tio Huli: Próximos Passos")
     
-    v_aporte = st.number_input("Quanto você pretende investir este mês? (R$):", min_value=0.0, step=100.0, key="aporte_huli_renda")
+        # Fragmento: valor e critério do aporte refazem só a divisão em cotas
+        @st.fragment
+        @diagnostico.cronometrado("fragmento.aporte_huli")
+        def aporte_huli(df_radar_modelo):
+            v_aporte = st.number_input("Quanto você pretende investir este mês? (R$):", min_value=0.0, step=100.0, key="aporte_huli_renda")
+            objetivo_aporte = st.radio("Como dividir o aporte:", list(objetivos_aporte), horizontal=True, key="objetivo_huli")
     
-    # Filtra apenas o que é prioridade (✅ COMPRAR)
-    df_prioridade = df_radar_modelo[df_radar_modelo['Ação'] == "✅ COMPRAR"].copy()
+            # Filtra apenas o que é prioridade (✅ COMPRAR)
+            df_prioridade = df_radar_modelo[df_radar_modelo['Ação'] == motor_radar.COMPRAR].copy()
+            total_renda_mensal = 0
+            capital_investido = 0
     
-    if df_prioridade.empty:
-        st.warning("⚠️ No momento, nenhum ativo atingiu os critérios de COMPRA. Aguarde uma oportunidade melhor.")
-    else:
-        st.write(f"### 🛒 Plano de Execução e Renda Estimada")
-        
-        html_huli = f"""<div class="mobile-table-container"><table class="rockefeller-table">
-            <thead>
-                <tr>
-                    <th>Ativo</th>
-                    <th>Preço (R$)</th>
-                    <th>Status</th>
-                    <th>Cotas</th>
-                    <th>Dividendos (DY)</th>
-                    <th>Renda Mensal Est.</th>
-                </tr>
-            </thead>
-            <tbody>"""
-        
-        qtd_ativos = len(df_prioridade)
-        valor_cada = v_aporte / qtd_ativos if qtd_ativos > 0 else 0
-        total_renda_mensal = 0
+            if df_prioridade.empty:
+                st.warning("⚠️ No momento, nenhum ativo atingiu os critérios de COMPRA. Aguarde uma oportunidade melhor.")
+            else:
+                st.write(f"### 🛒 Plano de Execução e Renda Estimada")
         
-        for _, r in df_prioridade.iterrows():
-            preco_v = float(r['V_Cru'])
-            cotas = int(valor_cada // preco_v) if preco_v > 0 else 0
-            
-            # Cálculo da Renda Mensal Estimada
-            # Pegamos o DY anual, dividimos por 12 meses e aplicamos sobre o valor investido em cotas
-            dy_decimal = float(r['DY'].replace('%', '').replace(',', '.')) / 100
-            renda_est_mes = (cotas * preco_v * (dy_decimal / 12))
-            total_renda_mensal += renda_est_mes
-            
-        html_huli += f"""
-        <tr>
-            <td><b>{r['Ativo']}</b></td>
-            <td>R$ {r['Preço']}</td>
-            <td style='color:#00ff00'><b>{r['Ação']}</b></td>
-            <td style='color:#00d4ff'><b>{cotas} UN</b></td>
-            <td>{r['DY']}</td>
-            <td style='color:#f1c40f'>R$ {renda_est_mes:.2f}</td>
-        </tr>"""
-
-    html_huli += "</tbody></table></div>"
-    st.markdown(html_huli, unsafe_allow_html=True)
+                # Cotas inteiras escolhidas de uma vez para todos os ativos (mínima sobra e desvio do alvo)
+                cotas_huli = alocacao.alocar(df_prioridade["Preço"], v_aporte, dy=df_prioridade["DY"], objetivo=objetivos_aporte[objetivo_aporte])
+                resumo_huli = alocacao.resumo(df_prioridade["Preço"], cotas_huli, v_aporte, df_prioridade["DY"])
+                total_renda_mensal, capital_investido = resumo_huli["renda"], resumo_huli["investido"]
+
+                # Renda Mensal Estimada: DY anual / 12 sobre o valor investido em cotas
+                df_prioridade["Cotas"] = cotas_huli
+                df_prioridade["Renda"] = df_prioridade["Cotas"] * df_prioridade["Preço"] * df_prioridade["DY"] / 12
+                tabela_rockefeller(df_prioridade, cel_huli, "huli")
             
-    # ==================== COMPLEMENTO DA ESTRATÉGIA HULI (SEM ALTERAR LÓGICA) ====================
+            # ==================== COMPLEMENTO DA ESTRATÉGIA HULI (SEM ALTERAR LÓGICA) ====================
 
-    # Cálculo do capital realmente investido
-    capital_investido = 0
+            capital_nao_alocado = v_aporte - capital_investido
 
-    for _, r in df_prioridade.iterrows():
-        preco_v = float(r['V_Cru'])
-        valor_cada = v_aporte / len(df_prioridade) if len(df_prioridade) > 0 else 0
-        cotas = int(valor_cada // preco_v) if preco_v > 0 else 0
-        capital_investido += cotas * preco_v
+            # Yield mensal efetivo sobre o aporte
+            yield_mensal_efetivo = (total_renda_mensal / v_aporte * 100) if v_aporte > 0 else 0
 
-    capital_nao_alocado = v_aporte - capital_investido
+            st.markdown("---")
+            st.subheader("📊 Diagnóstico do Aporte (Estratégia Huli)")
 
-    # Yield mensal efetivo sobre o aporte
-    yield_mensal_efetivo = (total_renda_mensal / v_aporte * 100) if v_aporte > 0 else 0
+            c3, c4, c5 = st.columns(3)
 
-    st.markdown("---")
-    st.subheader("📊 Diagnóstico do Aporte (Estratégia Huli)")
-
-    c3, c4, c5 = st.columns(3)
-
-    with c3:
-        st.metric(
-            "Capital Investido",
-            f"R$ {capital_investido:,.2f}"
-        )
+            with c3:
+                st.metric(
+                    "Capital Investido",
+                    f"R$ {capital_investido:,.2f}"
+                )
 
-    with c4:
-        st.metric(
-            "Capital Não Alocado",
-            f"R$ {capital_nao_alocado:,.2f}",
-            help="Valor que não foi investido por falta de cotas inteiras."
-        )
+            with c4:
+                st.metric(
+                    "Capital Não Alocado",
+                    f"R$ {capital_nao_alocado:,.2f}",
+                    help="Valor que não foi investido por falta de cotas inteiras."
+                )
 
-    with c5:
-        st.metric(
-            "Yield Mensal Efetivo",
-            f"{yield_mensal_efetivo:.2f}%",
-            help="Renda mensal estimada dividida pelo valor total do aporte."
-        )
+            with c5:
+                st.metric(
+                    "Yield Mensal Efetivo",
+                    f"{yield_mensal_efetivo:.2f}%",
+                    help="Renda mensal estimada dividida pelo valor total do aporte."
+                )
 
-    # --- RESUMO DA RENDA PASSIVA ---
-    st.markdown("---")
-    c1, c2 = st.columns(2)
-    with c1:
-        st.metric("Total a Investir", f"R$ {(v_aporte):,.2f}")
-    with c2:
-        st.metric("Aumento na Renda Mensal (Est.)", f"R$ {total_renda_mensal:.2f}", help="Cálculo baseado no Dividend Yield anual dividido por 12.")
+            # --- RESUMO DA RENDA PASSIVA ---
+            st.markdown("---")
+            c1, c2 = st.columns(2)
+            with c1:
+                st.metric("Total a Investir", f"R$ {(v_aporte):,.2f}")
+            with c2:
+                st.metric("Aumento na Renda Mensal (Est.)", f"R$ {total_renda_mensal:.2f}", help="Cálculo baseado no Dividend Yield anual dividido por 12.")
         
-    st.success(f"💰 Com este aporte, você passará a receber aproximadamente **R$ {total_renda_mensal:.2f} a mais todos os meses** em dividendos!")
+            st.success(f"💰 Com este aporte, você passará a receber aproximadamente **R$ {total_renda_mensal:.2f} a mais todos os meses** em dividendos!")
+
+        aporte_huli(df_radar_modelo)
 
 # ==================== ABA 4: CARTEIRA MODELO HULI ====================
-with tab_modelo:
-    st.header("🏦 Ativos Diversificados (Onde o Tio Huli Investe)")
-    st.write("Esta é a base de ativos que compõe o método dele para proteção e renda.")
-    col1, col2 = st.columns(2)
-    with col1:
-        st.markdown('<div class="huli-category"><b>🐄 Vacas Leiteiras (Renda Passiva)</b><br><small>Foco em Dividendos e Estabilidade</small></div>', unsafe_allow_html=True)
-        st.write("**• Energia:** TAEE11 (Taesa), EGIE3 (Engie), ALUP11 (Alupar)")
-        st.write("**• Saneamento:** SAPR11 (Sanepar), SBSP3 (Sabesp)")
-        st.write("**• Bancos:** BBAS3 (Banco do Brasil), ITUB4 (Itaú), SANB11 (Santander)")
-        st.write("**• Seguradoras:** BBSE3 (BB Seguridade), CXSE3 (Caixa Seguridade)")
-        st.markdown('<div class="huli-category"><b>🏢 Fundos Imobiliários (Renda Mensal)</b><br><small>Aluguéis sem Imposto de Renda</small></div>', unsafe_allow_html=True)
-        st.write("**• Logística:** HGLG11, XPLG11, BTLG11 | **• Shoppings:** XPML11, VISC11, HGBS11")
-    with col2:
-        st.markdown('<div class="huli-category"><b>🐕 Cães de Guarda (Segurança)</b><br><small>Reserva de Oportunidade e Valor</small></div>', unsafe_allow_html=True)
-        st.write("**• Ouro:** OZ1D ou ETF GOLD11 | **• Dólar:** IVVB11 (S&P 500)")
-        st.write("**• Renda Fixa:** Tesouro Selic e CDBs de liquidez diária")
-        st.markdown('<div class="huli-category"><b>🐎 Cavalos de Corrida (Crescimento)</b><br><small>Aposta no futuro e multiplicação</small></div>', unsafe_allow_html=True)
-        st.write("**• Cripto:** Bitcoin (BTC) e Ethereum (ETH) | **• Tech:** Nvidia (NVDA), Apple (AAPL)")
+if tab_modelo.open:
+    with tab_modelo:
+        st.header("🏦 Ativos Diversificados (Onde o Tio Huli Investe)")
+        st.write("Esta é a base de ativos que compõe o método dele para proteção e renda.")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown('<div class="huli-category"><b>🐄 Vacas Leiteiras (Renda Passiva)</b><br><small>Foco em Dividendos e Estabilidade</small></div>', unsafe_allow_html=True)
+            st.write("**• Energia:** TAEE11 (Taesa), EGIE3 (Engie), ALUP11 (Alupar)")
+            st.write("**• Saneamento:** SAPR11 (Sanepar), SBSP3 (Sabesp)")
+            st.write("**• Bancos:** BBAS3 (Banco do Brasil), ITUB4 (Itaú), SANB11 (Santander)")
+            st.write("**• Seguradoras:** BBSE3 (BB Seguridade), CXSE3 (Caixa Seguridade)")
+            st.markdown('<div class="huli-category"><b>🏢 Fundos Imobiliários (Renda Mensal)</b><br><small>Aluguéis sem Imposto de Renda</small></div>', unsafe_allow_html=True)
+            st.write("**• Logística:** HGLG11, XPLG11, BTLG11 | **• Shoppings:** XPML11, VISC11, HGBS11")
+        with col2:
+            st.markdown('<div class="huli-category"><b>🐕 Cães de Guarda (Segurança)</b><br><small>Reserva de Oportunidade e Valor</small></div>', unsafe_allow_html=True)
+            st.write("**• Ouro:** OZ1D ou ETF GOLD11 | **• Dólar:** IVVB11 (S&P 500)")
+            st.write("**• Renda Fixa:** Tesouro Selic e CDBs de liquidez diária")
+            st.markdown('<div class="huli-category"><b>🐎 Cavalos de Corrida (Crescimento)</b><br><small>Aposta no futuro e multiplicação</small></div>', unsafe_allow_html=True)
+            st.write("**• Cripto:** Bitcoin (BTC) e Ethereum (ETH) | **• Tech:** Nvidia (NVDA), Apple (AAPL)")
 
 # ==================== ABA 5: DNA FINANCEIRO ====================
-with tab_dna:
-    st.header("🧬 DNA Financeiro (LPA / VPA)")
-    df_combined = pd.concat([df_radar, df_radar_modelo]).drop_duplicates(subset="Ativo")
-    html_dna = """<div class="mobile-table-container"><table class="rockefeller-table">
-        <thead><tr><th>Ativo</th><th>LPA (Lucro)</th><th>VPA (Patrimônio)</th><th>P/L</th><th>P/VP</th></tr></thead><tbody>"""
-    for _, r in df_combined.iterrows():
-        p_l = float(r['V_Cru']) / r['LPA'] if r['LPA'] > 0 else 0
-        p_vp = float(r['V_Cru']) / r['VPA'] if r['VPA'] > 0 else 0
-        html_dna += f"<tr><td>{r['Ativo']}</td><td>{r['LPA']:.2f}</td><td>{r['VPA']:.2f}</td><td>{p_l:.2f}</td><td>{p_vp:.2f}</td></tr>"
-    html_dna += "</tbody></table></div>"
-    st.markdown(html_dna, unsafe_allow_html=True)
+if tab_dna.open:
+    with tab_dna:
+        df_radar, df_radar_modelo = carregar_radar()
+        st.header("🧬 DNA Financeiro (LPA / VPA)")
+        # A carteira modelo já está contida no radar geral
+        tabela_rockefeller(df_radar, cel_dna, "dna")
 
 # ==================== ABA 6: BACKTESTING ====================
-with tab_backtest:
-    st.header("📈 Backtesting de Oportunidade")
-    if not df_radar.empty:
-        ativo_bt = st.selectbox("Selecione um ativo para simular o 'Efeito Pânico':", df_radar["Ativo"].unique())
-        d = df_radar[df_radar["Ativo"] == ativo_bt].iloc[0]
-        p_atual = float(d["V_Cru"])
-        queda_max = abs(float(d["Var_Min"]))
-        preco_fundo = p_atual / (1 + (queda_max/100))
-        st.markdown(f"### 🛡️ Simulação: Compra no Fundo vs Hoje")
-        c1, c2, c3 = st.columns(3)
-        c1.metric("Preço de Compra (Fundo)", f"R$ {preco_fundo:.2f}")
-        c2.metric("Preço de Venda (Hoje)", f"R$ {p_atual:.2f}")
-        c3.metric("Rendimento Realizado", f"{queda_max:.2f}%", delta=f"{queda_max:.2f}%")
-        st.success(f"📌 **Resultado:** Se você tivesse investido no momento de pânico deste mês em **{ativo_bt}**, teria lucrado **{queda_max:.2f}%** até o preço atual.")
+if tab_backtest.open:
+    with tab_backtest:
+        df_radar, df_radar_modelo = carregar_radar()
+        st.header("📈 Backtesting das Regras do Radar")
+        st.markdown("Reaplica as regras do app dia a dia sobre o histórico diário salvo localmente, com peso igual entre os ativos comprados.")
+        if not df_radar.empty:
+            c1, c2, c3 = st.columns(3)
+            regra_bt = c1.radio("Regra:", ["Radar (COMPRAR / VENDER)", "Sinal Final (MA50/MA200 + RSI + Graham)"])
+            anos_bt = c2.slider("Anos de histórico:", 1, 15, 5)
+            custo_bt = c3.number_input("Custo por operação (%):", min_value=0.0, max_value=2.0, value=0.1, step=0.05)
+            ativos_bt = st.multiselect("Ativos no teste:", df_radar.index, default=list(df_radar.index))
+
+            def rodar_backtest():
+                base = df_radar.loc[ativos_bt].drop_duplicates("Ticker_Raw").set_index("Ticker_Raw")
+                precos = snapshot.historico_longo(base.index, anos_bt)
+                if precos.empty or len(precos) < 2:
+                    return None
+                # Preços em R$ com o câmbio de cada data; LPA e VPA do radar já estão em R$
+                precos = em_reais(precos, anos_bt)
+                lpa, vpa = base["LPA"], base["VPA"]
+                if regra_bt.startswith("Radar"):
+                    sinais = motor_backtest.sinais_radar(precos, lpa, vpa)
+                else:
+                    sinais = motor_backtest.sinais_finais(precos, lpa, vpa)
+                resultado = motor_backtest.simular(precos, sinais, custo=custo_bt / 100)
+                resultado["por_ativo"].index = resultado["por_ativo"].index.map(base["Empresa"])
+                return resultado
+
+            # Reaproveitado entre reruns enquanto o snapshot e os parâmetros forem os mesmos
+            chave_bt = ("backtest", regra_bt, anos_bt, custo_bt, tuple(sorted(ativos_bt)))
+            resultado_bt = snapshot.memo(chave_bt, rodar_backtest) if ativos_bt else None
+
+            if resultado_bt is None:
+                st.warning("Sem histórico salvo suficiente para os ativos escolhidos.")
+            else:
+                m = resultado_bt["metricas"]
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric("CAGR", f"{m['CAGR']:.2%}", delta=f"{m['CAGR'] - m['CAGR referência']:.2%} vs comprar e segurar")
+                c2.metric("Drawdown Máximo", f"{m['Max DD']:.2%}", delta=f"{m['Max DD'] - m['Max DD referência']:.2%}")
+                c3.metric(
+                    "Taxa de Acerto", f"{m['Acerto']:.1%}" if m["Operações"] else "-",
+                    help=f"Operações encerradas com lucro / {m['Operações']} encerradas; {m['Em aberto']} ainda abertas no fim ficam de fora"
+                )
+                c4.metric("Giro Anual", f"{m['Giro anual']:.1f}x", help="Soma das mudanças de peso da carteira por ano")
+                st.line_chart(resultado_bt["curva"])
+                st.dataframe(
+                    resultado_bt["por_ativo"].style.format({"Retorno": "{:.1%}", "CAGR": "{:.1%}", "Max DD": "{:.1%}", "Exposição": "{:.0%}"}),
+                    use_container_width=True
+                )
+                st.caption("LPA e VPA são os atuais: o preço justo de Graham não é reconstruído data a data.")
+
+            with st.expander("🧪 Otimizar parâmetros (walk-forward)"):
+                st.markdown("Testa combinações da margem de sobrepreço, janela da média, médias móveis e cortes do RSI: escolhe no período de treino e mede no período seguinte.")
+                c1, c2, c3 = st.columns(3)
+                anos_treino = c1.number_input("Anos de treino:", min_value=1, max_value=10, value=3)
+                anos_teste = c2.number_input("Anos de teste:", min_value=1, max_value=5, value=1)
+                criterio_otm = c3.selectbox("Critério:", list(otimizador.CRITERIOS))
+                if st.button("Rodar otimização", disabled=not ativos_bt):
+                    base = df_radar.loc[ativos_bt].drop_duplicates("Ticker_Raw").set_index("Ticker_Raw")
+                    precos = em_reais(snapshot.historico_longo(base.index, anos_bt), anos_bt)
+                    with st.spinner("Avaliando a grade de parâmetros em todos os núcleos..."):
+                        st.session_state.otimizacao = otimizador.otimizar(
+                            precos, base["LPA"], base["VPA"],
+                            regra="radar" if regra_bt.startswith("Radar") else "sinal",
+                            anos_treino=anos_treino, anos_teste=anos_teste,
+                            criterio=criterio_otm, custo=custo_bt / 100,
+                        )
+                if "otimizacao" in st.session_state:
+                    ranking, escolhas = st.session_state.otimizacao
+                    if ranking.empty:
+                        st.warning("Histórico curto demais para as janelas de treino e teste escolhidas.")
+                    else:
+                        st.markdown("**Ranking fora da amostra**")
+                        st.dataframe(ranking, use_container_width=True, hide_index=True)
+                        st.markdown("**Conjunto escolhido no treino de cada janela**")
+                        st.dataframe(escolhas, use_container_width=True, hide_index=True)
 
 # ==================== ABA 7: MANUAL DE INSTRUÇÕES ====================
-with tab_manual:
-    st.header("📖 Manual de Instruções - IA Rockefeller")
-    with st.expander("🛰️ Radar de Ativos e Preço Justo", expanded=True):
-        st.markdown("""
-        * **Preço Justo (Graham):** Calculado pela fórmula $V = \sqrt{22.5 \cdot LPA \cdot VPA}$. Indica o valor intrínseco do ativo.
-        * **Status Descontado:** Ocorre quando o preço de mercado é inferior ao Preço Justo.
-        * **Ação COMPRAR:** Recomendada apenas quando o ativo está abaixo da média de 30 dias e abaixo do preço justo.
-        """)
-    with st.expander("📊 Raio-X de Volatilidade"):
-        st.markdown("""
-        * **Dias A/B:** Quantidade de dias de Alta (Verde) e Baixa (Vermelho) no último mês.
-        * **🚨 Alerta RECORDE:** Dispara quando o preço atual toca ou cai abaixo da mínima histórica dos últimos 30 dias.
-        """)
-    with st.expander("🧬 DNA Financeiro"):
-        st.markdown("""
-        * **LPA (Lucro por Ação):** Quanto de lucro a empresa gera para cada ação.
-        * **VPA (Valor Patrimonial):** O valor real dos bens da empresa dividido pelas ações.
-        * **P/L:** Indica em quantos anos você recuperaria seu investimento através dos lucros.
-        """)
-    with st.expander("📈 Backtesting"):
-        st.markdown("""
-        Esta aba localiza o ponto mais baixo que o ativo chegou no mês e calcula exatamente quanto você teria ganho se tivesse comprado naquele momento de queda máxima.
-        """)
+if tab_manual.open:
+    with tab_manual:
+        st.header("📖 Manual de Instruções - IA Rockefeller")
+        with st.expander("🛰️ Radar de Ativos e Preço Justo", expanded=True):
+            st.markdown("""
+            * **Preço Justo (Graham):** Calculado pela fórmula $V = \sqrt{22.5 \cdot LPA \cdot VPA}$. Indica o valor intrínseco do ativo.
+            * **Status Descontado:** Ocorre quando o preço de mercado é inferior ao Preço Justo.
+            * **Ação COMPRAR:** Recomendada apenas quando o ativo está abaixo da média de 30 dias e abaixo do preço justo.
+            """)
+        with st.expander("📊 Raio-X de Volatilidade"):
+            st.markdown("""
+            * **Dias A/B:** Quantidade de dias de Alta (Verde) e Baixa (Vermelho) no último mês.
+            * **🚨 Alerta RECORDE:** Dispara quando o preço atual toca ou cai abaixo da mínima histórica dos últimos 30 dias.
+            """)
+        with st.expander("🧬 DNA Financeiro"):
+            st.markdown("""
+            * **LPA (Lucro por Ação):** Quanto de lucro a empresa gera para cada ação.
+            * **VPA (Valor Patrimonial):** O valor real dos bens da empresa dividido pelas ações.
+            * **P/L:** Indica em quantos anos você recuperaria seu investimento através dos lucros.
+            """)
+        with st.expander("📈 Backtesting"):
+            st.markdown("""
+            Esta aba reaplica, pregão a pregão, a regra COMPRAR/VENDER do radar ou o Sinal Final (MA50/MA200 + RSI + Graham) sobre anos de histórico diário.
+            * **CAGR:** Crescimento anual composto da carteira simulada.
+            * **Drawdown Máximo:** Maior queda do pico ao fundo da curva de patrimônio.
+            * **Taxa de Acerto:** Percentual das operações encerradas com lucro. Posições ainda abertas no fim do período não entram.
+            * **Giro Anual:** Quanto da carteira é trocado, em média, por ano.
+            """)
 
 # ==================== NOVA ABA: HISTÓRICO DE APORTES ====================
-with tab_historico:
-    st.header("📜 Histórico de Aportes")
-
-    import datetime
-    import os
-    import pandas as pd
+if tab_historico.open:
+    with tab_historico:
+        df_radar, df_radar_modelo = carregar_radar()
+        st.header("📜 Histórico de Aportes")
 
-    ARQ_APORTES = "historico_aportes.csv"
+        import datetime
+        import pandas as pd
 
-    # -------------------- Funções Auxiliares --------------------
-    def carregar_aportes():
-        if os.path.exists(ARQ_APORTES):
-            return pd.read_csv(ARQ_APORTES)
-        return pd.DataFrame(columns=[
-            "Data", "Ativo", "Preço", "Cotas",
-            "Valor Investido", "DY", "Status no Aporte"
-        ])
+        # -------------------- EXECUÇÃO DO APORTE --------------------
+        st.subheader("🛒 Executar Novo Aporte")
 
-    def salvar_aportes(df):
-        df.to_csv(ARQ_APORTES, index=False)
+        df_prioridade = df_radar_modelo[df_radar_modelo['Ação'] == motor_radar.COMPRAR].copy()
 
-    df_aportes = carregar_aportes()
-
-    # -------------------- EXECUÇÃO DO APORTE --------------------
-    st.subheader("🛒 Executar Novo Aporte")
+        if df_prioridade.empty:
+            st.info("No momento não há ativos elegíveis para compra.")
+        else:
+            v_aporte_exec = st.number_input(
+                "Valor disponível para este aporte (R$):",
+                min_value=0.0,
+                step=100.0,
+                key="aporte_execucao"
+            )
 
-    df_prioridade = df_radar_modelo[df_radar_modelo['Ação'] == "✅ COMPRAR"].copy()
+            objetivo_exec = st.radio("Como dividir o aporte:", list(objetivos_aporte), horizontal=True, key="objetivo_execucao")
+
+            # O aporte é dividido só entre os ativos marcados (ou entre todos, enquanto nenhum estiver marcado)
+            marcados = [a for a in df_prioridade.index if st.session_state.get(f"check_{a}", False)]
+            base_exec = df_prioridade.loc[marcados] if marcados else df_prioridade
+            cotas_exec = alocacao.alocar(
+                base_exec["Preço"], v_aporte_exec, dy=base_exec["DY"],
+                objetivo=objetivos_aporte[objetivo_exec]
+            ).reindex(df_prioridade.index).fillna(0).astype(int)
+
+            selecoes = {}
+
+            st.markdown("### Ativos disponíveis")
+            for ativo, preco in df_prioridade["Preço"].items():
+                col1, col2, col3 = st.columns([1, 2, 2])
+                with col1:
+                    selecoes[ativo] = st.checkbox(ativo, key=f"check_{ativo}")
+                with col2:
+                    st.write(f"Preço: R$ {preco:.2f}")
+                with col3:
+                    st.write(f"Cotas sugeridas: {cotas_exec[ativo]}")
+
+            if st.button("📥 Confirmar Aporte"):
+                # Linhas marcadas, de uma vez; o DY vai ao livro no mesmo texto de sempre ("9,5%")
+                compra = df_prioridade[df_prioridade.index.isin([a for a, v in selecoes.items() if v])]
+                valores = cotas_exec[compra.index] * compra["Preço"]
+                novos_registros = [
+                    {
+                        "data": datetime.date.today(),
+                        "ativo": ativo,
+                        "preco": float(compra.at[ativo, "Preço"]),
+                        "cotas": int(cotas_exec[ativo]),
+                        "valor": float(valores[ativo]),
+                        "dy": dy_texto,
+                        "status": str(compra.at[ativo, "Ação"])
+                    }
+                    for ativo, dy_texto in motor_radar.formatar_dy(compra["DY"]).items()
+                ]
+
+                if novos_registros:
+                    # Só as linhas novas são gravadas, numa única transação
+                    livro.registrar(novos_registros)
+                    historico_div.anexar([
+                        {
+                            "data": str(r["data"]),
+                            "ativo": r["ativo"],
+                            "cotas": r["cotas"],
+                            "valor_investido": r["valor"],
+                            "renda_mensal": r["valor"] * compra.at[r["ativo"], "DY"] / 12
+                        }
+                        for r in novos_registros
+                    ])
+                    st.success("✅ Aporte registrado com sucesso!")
+                else:
+                    st.warning("Nenhum ativo foi selecionado.")
+
+        # -------------------- HISTÓRICO --------------------
+        st.markdown("---")
+        st.subheader("📊 Histórico de Aportes Realizados")
+        if livro.versao()[1] == 0:
+            st.info("Nenhum aporte registrado ainda.")
+        else:
+            hoje = datetime.date.today()
+            periodo = st.date_input("Período:", value=(hoje - datetime.timedelta(days=365), hoje), key="periodo_aportes")
+            if isinstance(periodo, (tuple, list)) and len(periodo) == 2:
+                st.dataframe(ler_aportes(livro.versao(), *periodo), use_container_width=True)
 
-    if df_prioridade.empty:
-        st.info("No momento não há ativos elegíveis para compra.")
-    else:
-        v_aporte_exec = st.number_input(
-            "Valor disponível para este aporte (R$):",
-            min_value=0.0,
-            step=100.0,
-            key="aporte_execucao"
-        )
+        # -------------------- CONSOLIDAÇÃO --------------------
+        st.markdown("---")
+        st.subheader("📦 Total de Cotas por Ativo")
 
-        qtd_ativos = len(df_prioridade)
-        valor_por_ativo = v_aporte_exec / qtd_ativos if qtd_ativos > 0 else 0
-
-        selecoes = {}
-
-        st.markdown("### Ativos disponíveis")
-        for i, r in df_prioridade.iterrows():
-            preco = float(r['V_Cru'])
-            cotas_sugeridas = int(valor_por_ativo // preco) if preco > 0 else 0
-
-            col1, col2, col3 = st.columns([1, 2, 2])
-            with col1:
-                selecoes[r['Ativo']] = st.checkbox(r['Ativo'], key=f"check_{r['Ativo']}")
-            with col2:
-                st.write(f"Preço: R$ {r['Preço']}")
-            with col3:
-                st.write(f"Cotas sugeridas: {cotas_sugeridas}")
-
-        if st.button("📥 Confirmar Aporte"):
-            novos_registros = []
-
-            for _, r in df_prioridade.iterrows():
-                if selecoes.get(r['Ativo'], False):
-                    preco = float(r['V_Cru'])
-                    cotas = int(valor_por_ativo // preco) if preco > 0 else 0
-                    valor_investido = cotas * preco
-
-                    novos_registros.append({
-                        "Data": datetime.date.today().strftime("%d/%m/%Y"),
-                        "Ativo": r['Ativo'],
-                        "Preço": preco,
-                        "Cotas": cotas,
-                        "Valor Investido": valor_investido,
-                        "DY": r['DY'],
-                        "Status no Aporte": r['Ação']
-                    })
+        # Posições mantidas pelo livro a cada aporte gravado: uma linha por ativo
+        df_consolidado = ler_posicoes(livro.versao())
+        if not df_consolidado.empty:
+            st.dataframe(df_consolidado, use_container_width=True, hide_index=True)
 
-            if novos_registros:
-                df_novo = pd.DataFrame(novos_registros)
-                df_aportes = pd.concat([df_aportes, df_novo], ignore_index=True)
-                salvar_aportes(df_aportes)
-                st.success("✅ Aporte registrado com sucesso!")
-            else:
-                st.warning("Nenhum ativo foi selecionado.")
+        # -------------------- MÉTRICAS FINAIS --------------------
+        st.markdown("---")
+        st.subheader("📈 Resumo Geral")
 
-    # -------------------- HISTÓRICO --------------------
-    st.markdown("---")
-    st.subheader("📊 Histórico de Aportes Realizados")
-    if df_aportes.empty:
-        st.info("Nenhum aporte registrado ainda.")
-    else:
-        st.dataframe(df_aportes, use_container_width=True)
+        if not df_consolidado.empty:
+            total_investido = df_consolidado["Valor Investido"].sum()
 
-    # -------------------- CONSOLIDAÇÃO --------------------
-    st.markdown("---")
-    st.subheader("📦 Total de Cotas por Ativo")
+            # DY atual do radar (de uma vez, por ativo); sem cotação, vale o DY registrado na compra
+            dy_posicoes = df_consolidado["Ativo"].map(df_radar_modelo["DY"])
+            renda_mensal = (df_consolidado["Valor Investido"] * dy_posicoes / 12).fillna(df_consolidado["Renda (DY na compra)"]).sum()
 
-    if not df_aportes.empty:
-        df_consolidado = (
-            df_aportes.groupby("Ativo", as_index=False)
-            .agg({"Cotas": "sum", "Valor Investido": "sum"})
-        )
+            percentual = (renda_mensal / total_investido) * 100 if total_investido > 0 else 0
 
-        st.dataframe(df_consolidado, use_container_width=True)
+            c1, c2, c3 = st.columns(3)
+            c1.metric("💰 Valor Total Investido", f"R$ {total_investido:,.2f}")
+            c2.metric("📈 Dividendos Mensais", f"R$ {renda_mensal:.2f}")
+            c3.metric("📊 Retorno Mensal (%)", f"{percentual:.2f}%")
 
-    # -------------------- MÉTRICAS FINAIS --------------------
-    st.markdown("---")
-    st.subheader("📈 Resumo Geral")
+# ==================== ABA RENDA MENSAL & HISTÓRICO ====================
+if tab_renda_mensal.open:
+    with tab_renda_mensal:
+        st.header("📆 Renda Mensal & Histórico de Dividendos")
 
-    if not df_aportes.empty:
-        total_investido = df_aportes["Valor Investido"].sum()
+        renda_mensal, ultimos_registros = ler_historico_renda(historico_div.tamanho())
 
-        renda_mensal = 0
-        for _, r in df_consolidado.iterrows():
-            dy_atual = df_radar_modelo[df_radar_modelo['Ativo'] == r['Ativo']]['DY']
-            if not dy_atual.empty:
-                dy = float(dy_atual.values[0].replace('%', '').replace(',', '.')) / 100
-                renda_mensal += (r['Valor Investido'] * (dy / 12))
+        if renda_mensal.empty:
+            st.info("📭 Nenhum aporte registrado ainda.")
+        else:
+            # ==================== GRÁFICO DE CRESCIMENTO ====================
+            st.subheader("📈 Evolução da Renda Mensal")
+            st.line_chart(
+                renda_mensal.set_index("Mes")[["renda_mensal"]]
+            )
 
-        percentual = (renda_mensal / total_investido) * 100 if total_investido > 0 else 0
+            # ==================== TABELA DE APORTES ====================
+            st.subheader("📋 Histórico de Aportes")
+            st.caption(f"Últimos {len(ultimos_registros)} de {int(renda_mensal['registros'].sum())} registros")
+            st.dataframe(
+                ultimos_registros[[
+                    "data",
+                    "ativo",
+                    "cotas",
+                    "valor_investido",
+                    "renda_mensal"
+                ]].rename(columns={
+                    "data": "Data",
+                    "ativo": "Ativo",
+                    "cotas": "Cotas",
+                    "valor_investido": "Valor Investido (R$)",
+                    "renda_mensal": "Renda Mensal (R$)"
+                }),
+                use_container_width=True
+            )
 
-        c1, c2, c3 = st.columns(3)
-        c1.metric("💰 Valor Total Investido", f"R$ {total_investido:,.2f}")
-        c2.metric("📈 Dividendos Mensais", f"R$ {renda_mensal:.2f}")
-        c3.metric("📊 Retorno Mensal (%)", f"{percentual:.2f}%")
+            # ==================== ALERTA DE INDEPENDÊNCIA ====================
+            st.markdown("---")
+            st.subheader("🔔 Diagnóstico de Independência Financeira")
 
-# ==================== ABA RENDA MENSAL & HISTÓRICO ====================
-with tab_renda_mensal:
-    st.header("📆 Renda Mensal & Histórico de Dividendos")
+            custo_vida = st.number_input(
+                "💸 Seu custo de vida mensal (R$)",
+                min_value=0.0,
+                step=500.0,
+                key="custo_vida"
+            )
 
-    historico = carregar_historico()
+            renda_atual = renda_mensal["renda_mensal"].iloc[-1]
 
-    if not historico:
-        st.info("📭 Nenhum aporte registrado ainda.")
-    else:
-        df_hist = pd.DataFrame(historico)
+            c1, c2, c3 = st.columns(3)
 
-        # Garantia de tipos
-        df_hist["data"] = pd.to_datetime(df_hist["data"])
-        df_hist["renda_mensal"] = df_hist["renda_mensal"].astype(float)
+            with c1:
+                st.metric(
+                    "Renda Mensal Atual",
+                    f"R$ {renda_atual:,.2f}"
+                )
 
-        # Agrupamento por mês
-        df_hist["Mes"] = df_hist["data"].dt.to_period("M").astype(str)
+            with c2:
+                st.metric(
+                    "Custo de Vida",
+                    f"R$ {custo_vida:,.2f}"
+                )
 
-        renda_mensal = (
-            df_hist
-            .groupby("Mes", as_index=False)["renda_mensal"]
-            .sum()
-        )
+            with c3:
+                percentual = (renda_atual / custo_vida * 100) if custo_vida > 0 else 0
+                st.metric(
+                    "Cobertura do Custo",
+                    f"{percentual:.1f}%"
+                )
 
-        # ==================== GRÁFICO DE CRESCIMENTO ====================
-        st.subheader("📈 Evolução da Renda Mensal")
-        st.line_chart(
-            renda_mensal.set_index("Mes")
-        )
+            if custo_vida > 0:
+                if renda_atual >= custo_vida:
+                    st.success(
+                        "🎉 Parabéns! Sua renda passiva já cobre seu custo de vida."
+                    )
+                else:
+                    st.warning(
+                        f"⚠️ Faltam aproximadamente "
+                        f"R$ {(custo_vida - renda_atual):,.2f} "
+                        "por mês para atingir a independência financeira."
+                    )
+
+    # ===== BASE DE ATIVOS (manual e estratégica) =====
+        dados_renda = [
+            {"Ativo": "HGLG11", "Tipo": "FII Logística", "Frequência": "Mensal", "DY_Mensal": 0.007},
+            {"Ativo": "XPLG11", "Tipo": "FII Logística", "Frequência": "Mensal", "DY_Mensal": 0.007},
+            {"Ativo": "XPML11", "Tipo": "FII Shopping", "Frequência": "Mensal", "DY_Mensal": 0.008},
+            {"Ativo": "VISC11", "Tipo": "FII Shopping", "Frequência": "Mensal", "DY_Mensal": 0.008},
+            {"Ativo": "KNCR11", "Tipo": "FII Recebíveis", "Frequência": "Mensal", "DY_Mensal": 0.006},
+            {"Ativo": "CPTS11", "Tipo": "FII Recebíveis", "Frequência": "Mensal", "DY_Mensal": 0.007},
+
+            {"Ativo": "DIVD11", "Tipo": "ETF Dividendos", "Frequência": "Mensal", "DY_Mensal": 0.006},
+            {"Ativo": "BIVB39", "Tipo": "ETF Exterior", "Frequência": "Mensal", "DY_Mensal": 0.005},
+
+            {"Ativo": "TAEE11", "Tipo": "Ação Energia", "Frequência": "Trimestral", "DY_Mensal": 0.009},
+            {"Ativo": "BBAS3", "Tipo": "Ação Bancária", "Frequência": "Trimestral", "DY_Mensal": 0.008},
+            {"Ativo": "PETR4", "Tipo": "Ação Commodities", "Frequência": "Trimestral", "DY_Mensal": 0.010},
+        ]
+
+        df_renda = pd.DataFrame(dados_renda)
+
+        st.subheader("📋 Ativos com Tendência de Renda Mensal")
+        st.dataframe(df_renda, use_container_width=True)
 
-        # ==================== TABELA DE APORTES ====================
-        st.subheader("📋 Histórico de Aportes")
-        st.dataframe(
-            df_hist[[
-                "data",
-                "ativo",
-                "cotas",
-                "valor_investido",
-                "renda_mensal"
-            ]].rename(columns={
-                "data": "Data",
-                "ativo": "Ativo",
-                "cotas": "Cotas",
-                "valor_investido": "Valor Investido (R$)",
-                "renda_mensal": "Renda Mensal (R$)"
-            }),
-            use_container_width=True
-        )
-
-        # ==================== ALERTA DE INDEPENDÊNCIA ====================
         st.markdown("---")
-        st.subheader("🔔 Diagnóstico de Independência Financeira")
 
-        custo_vida = st.number_input(
-            "💸 Seu custo de vida mensal (R$)",
-            min_value=0.0,
-            step=500.0
-        )
+        # ===== SIMULADOR =====
+        # Fragmento: mudar uma premissa refaz só a simulação (e o cache dela), não a aba inteira
+        @st.fragment
+        @diagnostico.cronometrado("fragmento.simulador")
+        def simulador(renda_mensal, df_renda):
+            st.subheader("🧮 Simulador de Renda Mensal")
+
+            aporte_mensal = st.number_input(
+                "💵 Aporte mensal (R$)",
+                min_value=100,
+                value=1000,
+                step=100
+            )
 
-        renda_atual = renda_mensal["renda_mensal"].iloc[-1]
+            reinvestir = st.checkbox("🔁 Reinvestir dividendos", value=True)
 
-        c1, c2, c3 = st.columns(3)
+            dy_medio = df_renda["DY_Mensal"].mean()
 
-        with c1:
-            st.metric(
-                "Renda Mensal Atual",
-                f"R$ {renda_atual:,.2f}"
+            c1, c2, c3 = st.columns(3)
+            anos_sim = c1.slider("⏳ Horizonte (anos)", 1, 40, 20)
+            patrimonio_inicial = c2.number_input(
+                "🏦 Patrimônio inicial (R$)",
+                min_value=0.0,
+                value=float(renda_mensal["valor_investido"].sum()),
+                step=1000.0
             )
-
-        with c2:
-            st.metric(
-                "Custo de Vida",
-                f"R$ {custo_vida:,.2f}"
+            meta_renda = c3.number_input(
+                "🎯 Custo de vida a cobrir (R$/mês)",
+                min_value=0.0,
+                value=float(st.session_state.get("custo_vida") or 5000.0),
+                step=500.0
             )
 
-        with c3:
-            percentual = (renda_atual / custo_vida * 100) if custo_vida > 0 else 0
-            st.metric(
-                "Cobertura do Custo",
-                f"{percentual:.1f}%"
+            with st.expander("⚙️ Premissas da simulação"):
+                c1, c2, c3, c4 = st.columns(4)
+                valorizacao = c1.number_input("Valorização anual (%)", value=5.0, step=0.5) / 100
+                volatilidade = c2.number_input("Volatilidade anual (%)", min_value=0.0, value=20.0, step=1.0) / 100
+                incerteza_dy = c3.number_input("Incerteza do DY (%)", min_value=0.0, value=25.0, step=5.0) / 100
+                caminhos = c4.select_slider("Cenários", options=[1000, 2000, 5000, 10000], value=5000)
+
+            @st.cache_data(max_entries=64)
+            def projetar_renda(aporte, dy, anos, inicial, reinveste, meta, valorizacao, volatilidade, incerteza, caminhos):
+                # Milhares de cenários de uma vez; só as faixas de percentis ficam no cache
+                datas, renda, patrimonio = simulador_renda.simular_renda(
+                    aporte, dy, anos, inicial, reinveste,
+                    valorizacao_anual=valorizacao, volatilidade_anual=volatilidade,
+                    incerteza_dy=incerteza, caminhos=caminhos
+                )
+                cruza = simulador_renda.cruzamento(datas, renda, meta) if meta > 0 else None
+                return simulador_renda.faixas(datas, renda), simulador_renda.faixas(datas, patrimonio), cruza
+
+            faixas_renda, faixas_patrimonio, cruza = projetar_renda(
+                float(aporte_mensal), float(dy_medio), anos_sim, patrimonio_inicial, reinvestir, meta_renda,
+                valorizacao, volatilidade, incerteza_dy, caminhos
             )
 
-        if custo_vida > 0:
-            if renda_atual >= custo_vida:
+            c1, c2, c3 = st.columns(3)
+            c1.metric(
+                "💰 Renda Mensal no 1º Mês",
+                f"R$ {faixas_renda['P50'].iloc[0]:,.2f}",
+                help="Mediana dos cenários, baseada no DY médio mensal da carteira"
+            )
+            c2.metric(f"💰 Renda Mensal em {anos_sim} anos (mediana)", f"R$ {faixas_renda['P50'].iloc[-1]:,.2f}")
+            c3.metric(f"🏦 Patrimônio em {anos_sim} anos (mediana)", f"R$ {faixas_patrimonio['P50'].iloc[-1]:,.2f}")
+
+            st.markdown("**Renda mensal projetada (faixas de percentis)**")
+            st.line_chart(faixas_renda)
+
+            if cruza is not None:
+                if pd.isna(cruza["P50"]):
+                    st.warning(
+                        f"⚠️ Em {cruza['probabilidade']:.0%} dos cenários a renda cobre R$ {meta_renda:,.2f}/mês dentro de {anos_sim} anos."
+                    )
+                else:
+                    otimista = f"{cruza['P10']:%m/%Y}"
+                    pessimista = f"{cruza['P90']:%m/%Y}" if not pd.isna(cruza["P90"]) else f"depois de {anos_sim} anos"
+                    st.success(
+                        f"🎯 A renda cobre R$ {meta_renda:,.2f}/mês por volta de **{cruza['P50']:%m/%Y}** (mediana). "
+                        f"Cenário otimista: {otimista}; pessimista: {pessimista}. "
+                        f"Chance de chegar no horizonte: {cruza['probabilidade']:.0%}."
+                    )
+
+            if reinvestir:
                 st.success(
-                    "🎉 Parabéns! Sua renda passiva já cobre seu custo de vida."
+                    "🔁 Reinvestindo os dividendos, sua renda cresce de forma **exponencial** ao longo do tempo."
                 )
             else:
-                st.warning(
-                    f"⚠️ Faltam aproximadamente "
-                    f"R$ {(custo_vida - renda_atual):,.2f} "
-                    "por mês para atingir a independência financeira."
+                st.info(
+                    "💸 Usando os dividendos como renda, você mantém o capital estável."
                 )
 
-# ===== BASE DE ATIVOS (manual e estratégica) =====
-    dados_renda = [
-        {"Ativo": "HGLG11", "Tipo": "FII Logística", "Frequência": "Mensal", "DY_Mensal": 0.007},
-        {"Ativo": "XPLG11", "Tipo": "FII Logística", "Frequência": "Mensal", "DY_Mensal": 0.007},
-        {"Ativo": "XPML11", "Tipo": "FII Shopping", "Frequência": "Mensal", "DY_Mensal": 0.008},
-        {"Ativo": "VISC11", "Tipo": "FII Shopping", "Frequência": "Mensal", "DY_Mensal": 0.008},
-        {"Ativo": "KNCR11", "Tipo": "FII Recebíveis", "Frequência": "Mensal", "DY_Mensal": 0.006},
-        {"Ativo": "CPTS11", "Tipo": "FII Recebíveis", "Frequência": "Mensal", "DY_Mensal": 0.007},
-
-        {"Ativo": "DIVD11", "Tipo": "ETF Dividendos", "Frequência": "Mensal", "DY_Mensal": 0.006},
-        {"Ativo": "BIVB39", "Tipo": "ETF Exterior", "Frequência": "Mensal", "DY_Mensal": 0.005},
-
-        {"Ativo": "TAEE11", "Tipo": "Ação Energia", "Frequência": "Trimestral", "DY_Mensal": 0.009},
-        {"Ativo": "BBAS3", "Tipo": "Ação Bancária", "Frequência": "Trimestral", "DY_Mensal": 0.008},
-        {"Ativo": "PETR4", "Tipo": "Ação Commodities", "Frequência": "Trimestral", "DY_Mensal": 0.010},
-    ]
-
-    df_renda = pd.DataFrame(dados_renda)
-
-    st.subheader("📋 Ativos com Tendência de Renda Mensal")
-    st.dataframe(df_renda, use_container_width=True)
-
-    st.markdown("---")
-
-    # ===== SIMULADOR =====
-    st.subheader("🧮 Simulador de Renda Mensal")
-
-    aporte_mensal = st.number_input(
-        "💵 Aporte mensal (R$)",
-        min_value=100,
-        value=1000,
-        step=100
-    )
+        simulador(renda_mensal, df_renda)
 
-    reinvestir = st.checkbox("🔁 Reinvestir dividendos", value=True)
-
-    dy_medio = df_renda["DY_Mensal"].mean()
-
-    renda_mensal_estimada = aporte_mensal * dy_medio
-
-    st.metric(
-        "💰 Renda Mensal Estimada",
-        f"R$ {renda_mensal_estimada:,.2f}",
-        help="Baseado no DY médio mensal da carteira"
-    )
+# === ABA: SINAL DE MERCADO (TÉCNICO + FUNDAMENTAL) ===
+if tab_renda_mensal.open:
+    with tab_renda_mensal:  # ou outra aba que você criar para sinais
+        st.header("📈 Sinais Integrados de Mercado (Técnico + Fundamental)")
+        st.markdown("Esta aba combina análise técnica e fundamental para sugerir potenciais pontos de **compra, observação ou venda**.")
+
+        @st.cache_resource
+        def motor_indicadores():
+            # Estado compartilhado entre reruns: barras novas atualizam as médias sem recalcular a janela
+            return indicadores.MotorIndicadores(medias=(50, 200), periodo_rsi=14)
+
+        def sinal_tecnico(ind):
+            # Tendência de alta se MA50 > MA200
+            trend = "alta" if ind["MA50"] > ind["MA200"] else "baixa"
+            rsi = ind["RSI"]
+            if trend == "alta" and rsi < 70:
+                return "técnico_alta"
+            elif trend == "baixa" and rsi > 50:
+                return "técnico_baixa"
+            else:
+                return "técnico_lateral"
 
-    if reinvestir:
-        st.success(
-            "🔁 Reinvestindo os dividendos, sua renda cresce de forma **exponencial** ao longo do tempo."
-        )
-    else:
-        st.info(
-            "💸 Usando os dividendos como renda, você mantém o capital estável."
-        )
+        def status_fundamental(p_atual, valor_justo):
+            if p_atual < valor_justo:
+                return "fund_desc"
+            elif p_atual > (valor_justo * 1.2):
+                return "fund_sobre"
+            else:
+                return "fund_justo"
+
+        @diagnostico.cronometrado("sinais")
+        def calcular_sinais():
+            # Só os tickers que ainda não estão no snapshot são baixados
+            snapshot.garantir(ativos_sinal)
+            # MA50, MA200 e RSI de todos os ativos numa única passada sobre a matriz de fechamentos
+            with diagnostico.medir("sinais.indicadores"):
+                ultimos = motor_indicadores().sincronizar(snapshot.fechamentos(ativos_sinal))
+            sinais = []
+            for ticker in ativos_sinal:
+                try:
+                    ind = ultimos.loc[ticker]
+                    if pd.isna(ind["Close"]):
+                        if ticker not in snapshot.falhas:
+                            snapshot.registrar_falha(ticker, "vazio", "sem cotações nos últimos 12 meses")
+                        continue
+
+                    info = snapshot.info(ticker)
+                    p_atual = ind["Close"]
+
+                    # Técnicos
+                    sinal_tec = sinal_tecnico(ind)
+
+                    # Fundamentais
+                    lpa = info.get("trailingEps", 0) or 0
+                    vpa = info.get("bookValue", 0) or 0
+                    valor_justo = np.sqrt(22.5 * lpa * vpa) if lpa > 0 and vpa > 0 else p_atual
+                    fund_status = status_fundamental(p_atual, valor_justo)
+
+                    final = "⚠️ Neutro"
+                    if sinal_tec == "técnico_alta" and fund_status == "fund_desc":
+                        final = "✅ Forte Compra"
+                    elif sinal_tec == "técnico_alta" and fund_status == "fund_justo":
+                        final = "🔶 Compra Fraca"
+                    elif sinal_tec == "técnico_lateral" and fund_status == "fund_desc":
+                        final = "🔎 Observar"
+                    elif sinal_tec == "técnico_baixa" or fund_status == "fund_sobre":
+                        final = "❌ Evitar/Vender"
+
+                    sinais.append({
+                        "Ativo": ticker,
+                        "Preço Atual": f"{p_atual:.2f}",
+                        "Tendência Técnica": sinal_tec,
+                        "Fundamental": fund_status,
+                        "Sinal Final": final
+                    })
+                except Exception as e:
+                    snapshot.registrar_falha(ticker, "erro", e)
+                    continue
+            return pd.DataFrame(sinais)
 
-# === ABA: SINAL DE MERCADO (TÉCNICO + FUNDAMENTAL) ===
-with tab_renda_mensal:  # ou outra aba que você criar para sinais
-    st.header("📈 Sinais Integrados de Mercado (Técnico + Fundamental)")
-    st.markdown("Esta aba combina análise técnica e fundamental para sugerir potenciais pontos de **compra, observação ou venda**.")
-
-    ativos_sinal = [
-        "HGLG11.SA", "VISC11.SA", "XPML11.SA", "KNCR11.SA",
-        "CPTS11.SA", "DIVD11.SA", "BIVB39.SA", "TAEE11.SA",
-        "PETR4.SA", "ITUB4.SA", "BBAS3.SA", "AAPL",
-        "MSFT", "SCHD", "VIG", "QDIV11.SA"
-    ]
-
-    sinais = []
-
-    def calcular_indicadores(df):
-        # Médias móveis
-        df["MA50"] = df["Close"].rolling(50).mean()
-        df["MA200"] = df["Close"].rolling(200).mean()
-        # RSI simplificado
-        delta = df["Close"].diff()
-        ganho = delta.clip(lower=0).rolling(14).mean()
-        perda = (-delta.clip(upper=0)).rolling(14).mean()
-        rs = ganho / (perda.replace(0, np.nan))
-        df["RSI"] = 100 - (100 / (1 + rs))
-        return df
-
-    def sinal_tecnico(latest, df):
-        # Tendência de alta se MA50 > MA200
-        trend = "alta" if df["MA50"].iloc[-1] > df["MA200"].iloc[-1] else "baixa"
-        rsi = df["RSI"].iloc[-1]
-        if trend == "alta" and rsi < 70:
-            return "técnico_alta"
-        elif trend == "baixa" and rsi > 50:
-            return "técnico_baixa"
-        else:
-            return "técnico_lateral"
+        # Calculado só quando a aba é aberta e reaproveitado até o próximo snapshot
+        df_sinais = snapshot.memo("sinais", calcular_sinais)
 
-    def status_fundamental(p_atual, valor_justo):
-        if p_atual < valor_justo:
-            return "fund_desc"
-        elif p_atual > (valor_justo * 1.2):
-            return "fund_sobre"
+        if df_sinais.empty:
+            st.warning("Nenhum ativo com dados suficientes para análise.")
         else:
-            return "fund_justo"
-
-    for ticker in ativos_sinal:
-        try:
-            ativo = yf.Ticker(ticker)
-            hist = ativo.history(period="12mo")
-            if hist.empty:
-                continue
-
-            info = ativo.info
-            p_atual = hist["Close"].iloc[-1]
-
-            # Técnicos
-            df_ind = calcular_indicadores(hist.copy())
-            sinal_tec = sinal_tecnico(p_atual, df_ind)
-
-            # Fundamentais
-            lpa = info.get("trailingEps", 0) or 0
-            vpa = info.get("bookValue", 0) or 0
-            valor_justo = np.sqrt(22.5 * lpa * vpa) if lpa > 0 and vpa > 0 else p_atual
-            fund_status = status_fundamental(p_atual, valor_justo)
-
-            final = "⚠️ Neutro"
-            if sinal_tec == "técnico_alta" and fund_status == "fund_desc":
-                final = "✅ Forte Compra"
-            elif sinal_tec == "técnico_alta" and fund_status == "fund_justo":
-                final = "🔶 Compra Fraca"
-            elif sinal_tec == "técnico_lateral" and fund_status == "fund_desc":
-                final = "🔎 Observar"
-            elif sinal_tec == "técnico_baixa" or fund_status == "fund_sobre":
-                final = "❌ Evitar/Vender"
-
-            sinais.append({
-                "Ativo": ticker,
-                "Preço Atual": f"{p_atual:.2f}",
-                "Tendência Técnica": sinal_tec,
-                "Fundamental": fund_status,
-                "Sinal Final": final
-            })
-        except Exception:
-            continue
-
-    df_sinais = pd.DataFrame(sinais)
-
-    if df_sinais.empty:
-        st.warning("Nenhum ativo com dados suficientes para análise.")
-    else:
-        st.dataframe(df_sinais, use_container_width=True)
+            st.dataframe(df_sinais, use_container_width=True)
+
+# ==================== ATIVOS DESCARTADOS NESTA ATUALIZAÇÃO ====================
+df_descartados = snapshot.descartados()
+if not df_descartados.empty:
+    with st.sidebar.expander(f"⚠️ {len(df_descartados)} ativo(s) não carregado(s)"):
+        st.dataframe(df_descartados, use_container_width=True, hide_index=True)
+
+# ==================== DIAGNÓSTICO (OCULTO: ?diagnostico=1) ====================
+diagnostico.registrar("rerun", time.perf_counter() - inicio_rerun)
+if st.query_params.get("diagnostico"):
+    with st.sidebar.expander("🩺 Diagnóstico de desempenho"):
+        st.caption("Tempos por etapa, somados desde o início do processo ou do último zerar.")
+        st.dataframe(diagnostico.etapas(), use_container_width=True, hide_index=True)
+        st.dataframe(diagnostico.caches(), use_container_width=True, hide_index=True)
+        st.json(diagnostico.relatorio()["contadores"])
+        st.download_button("⬇️ Exportar JSON", diagnostico.exportar_json(), file_name="diagnostico_radar.json", mime="application/json")
+        if st.button("Zerar medições", key="zerar_diagnostico"):
+            diagnostico.zerar()
@@ -0,0 +1,425 @@
+import os
+import time
+import json
+import pickle
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+import pandas as pd
+from cache_mercado import CacheMercado, vazio
+from armazem_precos import ArmazemPrecos
+import conversao
+import diagnostico
+import provedores
+import universo
+
+# ==================== COLETA DE DADOS DE MERCADO ====================
+
+# Quantidade de tickers enviados em cada requisição em lote ao Yahoo
+TAMANHO_LOTE = 40
+
+# Pool de coleta: requisições simultâneas, timeout por requisição, retentativas com espera crescente
+MAX_TRABALHADORES = 8
+TIMEOUT_REQUISICAO = 10
+TENTATIVAS = 3
+ESPERA_BASE = 0.5
+# Tempo máximo que se espera por cada busca, contado a partir de quando ela começa a rodar (a espera
+# na fila do pool ou pelo provedor não conta); o que não chegar é descartado e listado
+ORCAMENTO_LATENCIA = 20
+
+# Campos do .info guardados por ticker: o dicionário completo do Yahoo tem centenas de chaves
+CAMPOS_FUNDAMENTOS = ("trailingEps", "bookValue", "dividendYield", "currency", "quoteType", "longName", "shortName")
+
+# Último snapshot completo, usado para desenhar a página na hora enquanto os dados são renovados
+ARQ_SNAPSHOT = "snapshot_mercado.pkl"
+# Intervalo mínimo entre tentativas de atualização em segundo plano (evita martelar a rede offline)
+INTERVALO_TENTATIVA = timedelta(minutes=1)
+
+# Cache compartilhado por todas as sessões do processo (persistido em disco)
+cache = CacheMercado()
+
+# Histórico diário completo por ticker, atualizado só com as barras novas
+armazem = ArmazemPrecos()
+
+_pool = ThreadPoolExecutor(max_workers=MAX_TRABALHADORES, thread_name_prefix="coleta")
+
+# Fonte dos dados de mercado (Yahoo com uma sessão HTTP compartilhada, por padrão; ver provedores.py)
+provedor = provedores.criar()
+
+
+@dataclass
+class ResultadoColeta:
+    ticker: str
+    status: str  # "ok", "timeout", "vazio" ou "erro"
+    dados: object = None
+    erro: str = ""
+    tentativas: int = 0
+    duracao: float = 0.0
+
+
+def _com_retentativas(funcao, chave, tentativas):
+    inicio = time.monotonic()
+    erro = ""
+    for tentativa in range(1, tentativas + 1):
+        try:
+            dados = funcao(chave)
+            status = "vazio" if vazio(dados) else "ok"
+            return ResultadoColeta(chave, status, dados, tentativas=tentativa, duracao=time.monotonic() - inicio)
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+            if tentativa < tentativas:
+                time.sleep(ESPERA_BASE * 2 ** (tentativa - 1))
+    return ResultadoColeta(chave, "erro", erro=erro, tentativas=tentativas, duracao=time.monotonic() - inicio)
+
+
+def coletar(chaves, funcao, orcamento=ORCAMENTO_LATENCIA, tentativas=TENTATIVAS, exclusivo=None):
+    # Executa funcao(chave) no pool para cada chave e devolve {chave: ResultadoColeta}.
+    # Cada busca tem `orcamento` segundos a partir de quando começa a rodar (com `exclusivo`, a partir de
+    # quando obtém o provedor); a que estoura volta como "timeout". Com provedor exclusivo, as buscas
+    # ainda na fila dele são puladas: esperariam atrás da que travou. Buscas que nem começaram só
+    # desistem depois de um orçamento inteiro sem nenhuma outra terminar ou começar.
+    inicios = {}
+    desistir = threading.Event()
+
+    def tarefa(chave):
+        with exclusivo() if exclusivo else nullcontext():
+            if desistir.is_set():
+                return ResultadoColeta(chave, "timeout", erro="pulado: provedor sem resposta")
+            inicios[chave] = time.monotonic()
+            return _com_retentativas(funcao, chave, tentativas)
+
+    futuros = {_pool.submit(tarefa, chave): chave for chave in chaves}
+    resultados, pendentes = {}, set(futuros)
+    progresso = time.monotonic()
+    while pendentes:
+        progresso = max([progresso, *inicios.values()])
+        prazo = min(inicios.get(futuros[f], progresso) for f in pendentes) + orcamento
+        feitos, pendentes = wait(pendentes, timeout=max(prazo - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        for f in feitos:
+            resultados[futuros[f]] = f.result()
+        agora = time.monotonic()
+        progresso = max([agora if feitos else progresso, *inicios.values()])
+        vencidos = {f for f in pendentes if agora - inicios.get(futuros[f], progresso) >= orcamento}
+        if vencidos:
+            diagnostico.contar("coleta.timeout", len(vencidos))
+            if exclusivo:
+                desistir.set()
+        for f in vencidos:
+            f.cancel()
+            erro = f"sem resposta em {orcamento}s" if futuros[f] in inicios else f"fila parada por {orcamento}s"
+            resultados[futuros[f]] = ResultadoColeta(futuros[f], "timeout", erro=erro, duracao=orcamento)
+        pendentes -= vencidos
+    return resultados
+
+
+def baixar_ohlcv(tickers, inicio=None, period="max", tamanho_lote=TAMANHO_LOTE, orcamento=ORCAMENTO_LATENCIA):
+    # {ticker: ResultadoColeta com DataFrame OHLCV}; com `inicio`, só as barras a partir dessa data
+    tickers = list(dict.fromkeys(tickers))
+    lotes = [tuple(tickers[i:i + tamanho_lote]) for i in range(0, len(tickers), tamanho_lote)]
+
+    def buscar(lote):
+        with diagnostico.medir("rede.historico (lote)"):
+            barras = provedor.historico_lote(lote, inicio, period, timeout=TIMEOUT_REQUISICAO)
+        if not barras:
+            raise RuntimeError("lote sem dados")
+        # Tamanho do que chegou (já decodificado), por tipo de busca
+        diagnostico.contar("bytes.historico", int(sum(b.memory_usage(deep=True).sum() for b in barras.values())))
+        return barras
+
+    resultados = {}
+    for lote, coleta in coletar(lotes, buscar, orcamento, exclusivo=provedor.exclusivo).items():
+        for t in lote:
+            if coleta.status != "ok":
+                resultados[t] = replace(coleta, ticker=t)
+                continue
+            barras = coleta.dados.get(t)
+            status = "ok" if barras is not None and not barras.empty else "vazio"
+            resultados[t] = replace(coleta, ticker=t, status=status, dados=barras)
+    return resultados
+
+
+def baixar_fundamentos(tickers, orcamento=ORCAMENTO_LATENCIA):
+    # {ticker: ResultadoColeta com o dicionário .info}, um ticker por tarefa do pool
+    def buscar(t):
+        with diagnostico.medir("rede.info (ticker)"):
+            info = provedor.fundamentos(t)
+        diagnostico.contar("bytes.info", len(json.dumps(info, default=str)) if info else 0)
+        return info
+    return coletar(list(dict.fromkeys(tickers)), buscar, orcamento)
+
+
+def _janela(dados, dias):
+    # Recorta os últimos `dias` corridos, como o period="30d" do yfinance
+    if dias is None or dados.empty:
+        return dados
+    return dados[dados.index > dados.index.max() - pd.Timedelta(days=dias)]
+
+
+class MarketSnapshot:
+    # Retrato único do mercado por ciclo de atualização: cada ticker é baixado no máximo uma vez
+    # e todas as abas (radar, gestor, DNA, backtesting, Huli, sinais) leem daqui.
+
+    def __init__(self, dias=365, par_cambio="USDBRL=X", cambio_padrao=5.40, cache=cache, armazem=armazem, bloqueante=True):
+        self.dias = dias
+        # Não bloqueante: tickers ausentes são pedidos à atualização em segundo plano em vez de baixados na hora
+        self.bloqueante = bloqueante
+        self.versao = 0
+        self.cache = cache
+        self.armazem = armazem
+        self.par_cambio = par_cambio
+        self.cambio_padrao = cambio_padrao
+        self.criado_em = datetime.now()
+        self.precos = pd.DataFrame(dtype=float)
+        self.fundamentos = {}
+        # Resultados derivados (radar, sinais...) calculados sob demanda, uma vez por snapshot
+        self.derivados = {}
+        self._trava = threading.RLock()
+        # Tickers descartados neste ciclo: {ticker: ResultadoColeta}
+        self.falhas = {}
+        # Tickers pedidos mas ainda não entregues pela atualização em segundo plano
+        self.pendentes = set()
+
+    def salvar(self, caminho=ARQ_SNAPSHOT):
+        estado = {
+            "dias": self.dias, "par_cambio": self.par_cambio, "cambio_padrao": self.cambio_padrao,
+            "criado_em": self.criado_em, "precos": self.precos, "fundamentos": self.fundamentos, "falhas": self.falhas,
+        }
+        temporario = caminho + ".tmp"
+        with open(temporario, "wb") as f:
+            pickle.dump(estado, f)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho=ARQ_SNAPSHOT, **kwargs):
+        try:
+            with open(caminho, "rb") as f:
+                estado = pickle.load(f)
+        except Exception:
+            return None
+        snapshot = cls(dias=estado["dias"], par_cambio=estado["par_cambio"], cambio_padrao=estado["cambio_padrao"], **kwargs)
+        snapshot.criado_em = estado["criado_em"]
+        snapshot.precos = estado["precos"]
+        snapshot.fundamentos = estado["fundamentos"]
+        snapshot.falhas = estado["falhas"]
+        return snapshot
+
+    def idade(self):
+        return datetime.now() - self.criado_em
+
+    def mesclar(self, antigo):
+        # Tickers que falharam nesta atualização continuam com os dados anteriores (e seguem listados em falhas)
+        perdidos = [t for t in antigo.precos.columns if t not in self.precos.columns or self.precos[t].isna().all()]
+        if len(perdidos) == len(antigo.precos.columns) and len(perdidos) > 0:
+            self.criado_em = antigo.criado_em
+        if perdidos:
+            self.precos = pd.concat([self.precos.drop(columns=perdidos, errors="ignore"), antigo.precos[perdidos]], axis=1).sort_index()
+        for t, info in antigo.fundamentos.items():
+            if not self.fundamentos.get(t):
+                self.fundamentos[t] = info
+
+    def mesmo_conteudo(self, outro):
+        # Mesmos preços, fundamentos e descartes: publicar um igual só apagaria os derivados à toa
+        return (self.precos.equals(outro.precos) and self.fundamentos == outro.fundamentos
+                and self.falhas.keys() == outro.falhas.keys())
+
+    def registrar_falha(self, ticker, status, erro=""):
+        self.falhas[ticker] = ResultadoColeta(ticker, status, erro=str(erro))
+
+    def _registrar(self, coletas):
+        for t, coleta in coletas.items():
+            if coleta.status == "ok":
+                self.falhas.pop(t, None)
+            else:
+                self.falhas[t] = coleta
+
+    def _sincronizar(self, lote):
+        def baixar(tickers, inicio):
+            coletas = baixar_ohlcv(tickers, inicio)
+            self._registrar(coletas)
+            return {t: c.dados for t, c in coletas.items()}
+        return self.armazem.atualizar(lote, baixar)
+
+    def _tem_precos(self, ticker):
+        return ticker in self.precos.columns and self.precos[ticker].notna().any()
+
+    def _baixar_info(self, lote):
+        coletas = baixar_fundamentos(lote)
+        # Falta de fundamentos (câmbio, .info vazio) não descarta quem tem cotações; nem um .info
+        # bem-sucedido apaga a falha de preços registrada para o ticker
+        for t, coleta in coletas.items():
+            if coleta.status != "ok" and not self._tem_precos(t):
+                self.falhas.setdefault(t, coleta)
+        return {t: c.dados for t, c in coletas.items() if c.status == "ok"}
+
+    def garantir(self, tickers, fundamentos=True):
+        with self._trava, diagnostico.medir("snapshot.garantir"):
+            return self._garantir(list(dict.fromkeys(tickers)), fundamentos)
+
+    def _garantir(self, tickers, fundamentos):
+        faltando = [t for t in tickers if t not in self.precos.columns]
+        if not self.bloqueante:
+            pedidos = faltando + ([t for t in tickers if t not in self.fundamentos] if fundamentos else [])
+            if pedidos:
+                self.pendentes.update(pedidos)
+                atualizar_em_segundo_plano(pedidos)
+            return self
+        if faltando:
+            # Sincroniza o armazém (só o delta desde a última barra), no máximo uma vez por janela intradiária
+            self.cache.obter_varios(
+                "intradiario", faltando, self._sincronizar, "sincronizado"
+            )
+            inicio = pd.Timestamp.today().normalize() - pd.Timedelta(days=self.dias)
+            novos = self.armazem.fechamentos(faltando, inicio=inicio)
+            self.precos = pd.concat([self.precos, novos], axis=1).sort_index()
+        if fundamentos:
+            pendentes = [t for t in tickers if t not in self.fundamentos]
+            if pendentes:
+                novos = self.cache.obter_varios("fundamentos", pendentes, self._baixar_info)
+                for t in pendentes:
+                    self.fundamentos[t] = {k: v for k, v in (novos.get(t) or {}).items() if k in CAMPOS_FUNDAMENTOS}
+        return self
+
+    def memo(self, nome, funcao):
+        with self._trava:
+            diagnostico.cache("derivados do snapshot", acertos=int(nome in self.derivados), faltas=int(nome not in self.derivados))
+            if nome not in self.derivados:
+                self.derivados[nome] = funcao()
+            return self.derivados[nome]
+
+    def descartar(self, ticker):
+        # Esquece um ticker para que a próxima leitura o busque de novo
+        with self._trava:
+            self.precos = self.precos.drop(columns=[ticker], errors="ignore")
+            self.fundamentos.pop(ticker, None)
+            self.derivados.clear()
+
+    def fechamentos(self, tickers, dias=None):
+        return _janela(self.precos.reindex(columns=list(tickers)), dias)
+
+    def historico(self, ticker, dias=None):
+        if ticker not in self.precos.columns:
+            return pd.Series(dtype=float, name=ticker)
+        return _janela(self.precos[ticker].dropna(), dias)
+
+    def historico_longo(self, tickers, anos):
+        # Vários anos de fechamentos direto do armazém local (o snapshot guarda só a janela recente)
+        inicio = pd.Timestamp.today().normalize() - pd.DateOffset(years=anos)
+        return self.armazem.fechamentos([t for t in tickers if t in self.precos.columns], inicio=inicio)
+
+    def descartados(self):
+        falhas = [c for c in self.falhas.values() if c.ticker not in self.pendentes]
+        return pd.DataFrame(
+            [{"Ticker": c.ticker, "Status": c.status, "Tentativas": c.tentativas, "Erro": c.erro} for c in falhas],
+            columns=["Ticker", "Status", "Tentativas", "Erro"]
+        )
+
+    def info(self, ticker):
+        return self.fundamentos.get(ticker, {})
+
+    def series_cambio(self, moedas, anos=None):
+        # {moeda: Series diária em reais}, um par de câmbio por moeda (não por ativo).
+        # Sem cotação salva do par principal, vale o câmbio padrão.
+        pares = {m: conversao.par(m) for m in dict.fromkeys(moedas) if m != conversao.MOEDA_BASE}
+        self.garantir(pares.values(), fundamentos=False)
+        longo = self.historico_longo(pares.values(), anos) if anos else pd.DataFrame()
+        series = {}
+        for m, p in pares.items():
+            serie = longo[p].dropna() if p in longo.columns else self.historico(p)
+            series[m] = serie if not serie.empty or p != self.par_cambio else self.cambio_padrao
+        return series
+
+
+# ==================== SNAPSHOT COMPARTILHADO ====================
+
+# Um snapshot por processo, reaproveitado entre reruns e sessões. A página é desenhada na hora com o
+# último snapshot (mesmo vencido) e uma thread renova preços e câmbio; ao terminar, o novo snapshot
+# substitui o antigo e é persistido para o próximo início.
+_snapshot = None
+_trava_snapshot = threading.Lock()
+_pedidos = set()
+_atualizacao = None
+_ultima_tentativa = datetime.min
+# (tickers prontos, total) da atualização em andamento
+_progresso = (0, 0)
+
+
+def snapshot_atual():
+    global _snapshot
+    with _trava_snapshot:
+        if _snapshot is None:
+            _snapshot = MarketSnapshot.carregar(bloqueante=False) or MarketSnapshot(bloqueante=False)
+            if _snapshot.precos.empty:
+                _snapshot.criado_em = datetime.min
+        vencido = _snapshot.idade() >= cache.validades["intradiario"]
+    if vencido:
+        atualizar_em_segundo_plano()
+    return _snapshot
+
+
+def atualizando():
+    return _atualizacao is not None
+
+
+def progresso():
+    return _progresso
+
+
+def atualizar_em_segundo_plano(tickers=()):
+    global _atualizacao, _ultima_tentativa
+    with _trava_snapshot:
+        novos = set(tickers) - _pedidos
+        _pedidos.update(tickers)
+        if _atualizacao is not None:
+            return
+        if not novos and datetime.now() - _ultima_tentativa < INTERVALO_TENTATIVA:
+            return
+        _ultima_tentativa = datetime.now()
+        _atualizacao = threading.Thread(target=_atualizar, name="atualizacao-mercado", daemon=True)
+        _atualizacao.start()
+
+
+def _atualizar():
+    global _snapshot, _atualizacao, _progresso
+    try:
+        while True:
+            with _trava_snapshot:
+                antigo = _snapshot
+                tickers = list(dict.fromkeys([*antigo.precos.columns, *antigo.fundamentos, *_pedidos]))
+                _pedidos.clear()
+            novo = MarketSnapshot(dias=antigo.dias, par_cambio=antigo.par_cambio, cambio_padrao=antigo.cambio_padrao)
+            # Mesmos blocos do radar (universo.TAMANHO_BLOCO): progresso visível e memória limitada por etapa
+            feitos = 0
+            for bloco in universo.blocos(tickers):
+                novo.garantir(bloco)
+                feitos += len(bloco)
+                _progresso = (feitos, len(tickers))
+            novo.mesclar(antigo)
+            novo.bloqueante = False
+            if novo.mesmo_conteudo(antigo):
+                # Nada mudou (o armazém ainda estava dentro da validade): só renova a idade do snapshot
+                # em uso, sem nova versão, sem rerun das sessões e sem perder os derivados já calculados
+                with _trava_snapshot:
+                    antigo.criado_em = novo.criado_em
+                novo = antigo
+            novo.salvar()
+            with _trava_snapshot:
+                if novo is not antigo:
+                    novo.versao = antigo.versao + 1
+                    _snapshot = novo
+                _pedidos.difference_update(tickers)
+                if not _pedidos:
+                    break
+    finally:
+        with _trava_snapshot:
+            _atualizacao = None
+            _progresso = (0, 0)
+
+
+def invalidar(ticker):
+    # Atualização forçada de um único ticker: limpa o cache e o snapshot em uso
+    cache.invalidar(ticker)
+    with _trava_snapshot:
+        if _snapshot is not None:
+            _snapshot.descartar(ticker)
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import indicadores
+import motor_radar
+
+# ==================== MOTOR DE BACKTESTING (VETORIZADO) ====================
+
+# Regras do app reaplicadas dia a dia sobre o histórico diário, todas as colunas de uma vez.
+# Sinal 1 = entra/mantém comprado, 0 = zera, NaN = mantém a posição anterior.
+
+DIAS_ANO = 252
+JANELA_MEDIA = "30D"
+FORTE_COMPRA, COMPRA_FRACA, OBSERVAR, EVITAR, NEUTRO = "✅ Forte Compra", "🔶 Compra Fraca", "🔎 Observar", "❌ Evitar/Vender", "⚠️ Neutro"
+
+
+def _matriz(valor, precos, padrao):
+    return np.broadcast_to(motor_radar._por_ticker(valor, precos.columns, padrao), precos.shape)
+
+
+def sinais_radar(precos, lpa, vpa, margem_venda=motor_radar.MARGEM_VENDA, janela=JANELA_MEDIA):
+    # Regra do radar (calcular_dados) em cada pregão: COMPRAR abaixo da média de 30 dias e do preço justo,
+    # VENDER acima do justo com margem, ESPERAR mantém
+    p = precos.to_numpy(dtype=float)
+    m_30 = precos.rolling(janela).mean().to_numpy()
+    lpa_v, vpa_v = _matriz(lpa, precos, 0.0), _matriz(vpa, precos, 0.0)
+    graham_ok = (lpa_v > 0) & (vpa_v > 0)
+    graham = np.sqrt(np.where(graham_ok, 22.5 * lpa_v * vpa_v, 0.0))
+    p_justo = np.where(graham_ok, graham, m_30)
+
+    sinal = np.select([(p < m_30) & (p < p_justo), p > p_justo * margem_venda], [1.0, 0.0], default=np.nan)
+    sinal[np.isnan(p)] = np.nan
+    return pd.DataFrame(sinal, index=precos.index, columns=precos.columns)
+
+
+def sinais_finais(precos, lpa, vpa, medias=(50, 200), periodo_rsi=14, rsi_sobrecompra=70, rsi_fraqueza=50, margem_venda=motor_radar.MARGEM_VENDA, series=None):
+    # Regra do "Sinal Final" da aba de sinais: tendência MA curta x longa + RSI, combinada com o status de Graham.
+    # Forte Compra / Compra Fraca compram, Evitar/Vender zera, Observar e Neutro mantêm.
+    curta, longa = medias
+    # `series` permite reaproveitar indicadores já calculados para as mesmas janelas
+    series = series or indicadores.MotorIndicadores(medias=medias, periodo_rsi=periodo_rsi).calcular(precos)
+    ma_c, ma_l, rsi = series[f"MA{curta}"].to_numpy(), series[f"MA{longa}"].to_numpy(), series["RSI"].to_numpy()
+    alta = ma_c > ma_l
+    tec_alta = alta & (rsi < rsi_sobrecompra)
+    tec_baixa = ~alta & (rsi > rsi_fraqueza)
+
+    p = precos.to_numpy(dtype=float)
+    lpa_v, vpa_v = _matriz(lpa, precos, 0.0), _matriz(vpa, precos, 0.0)
+    graham_ok = (lpa_v > 0) & (vpa_v > 0)
+    justo = np.where(graham_ok, np.sqrt(np.where(graham_ok, 22.5 * lpa_v * vpa_v, 0.0)), p)
+    desc, sobre = p < justo, p > justo * margem_venda
+    fund_justo = ~desc & ~sobre
+
+    sinal = np.select(
+        [tec_alta & desc, tec_alta & fund_justo, ~tec_alta & ~tec_baixa & desc, tec_baixa | sobre],
+        [1.0, 1.0, np.nan, 0.0], default=np.nan
+    )
+    sinal[np.isnan(p)] = np.nan
+    return pd.DataFrame(sinal, index=precos.index, columns=precos.columns)
+
+
+def _negociacoes(posicao, log_ret):
+    # Retorno de cada operação (entrada -> saída) de todas as colunas, sem laço por ticker, e se ela
+    # ainda estava aberta no último pregão (a "saída" é só a marcação pelo último preço)
+    linhas, colunas = posicao.shape
+    pos = np.vstack([np.zeros((1, colunas)), posicao, np.zeros((1, colunas))]).T
+    mudanca = np.diff(pos, axis=1)
+    _, entradas = np.nonzero(mudanca > 0)
+    _, saidas = np.nonzero(mudanca < 0)
+    acumulado = np.hstack([np.zeros((colunas, 1)), np.cumsum(log_ret.T, axis=1)]).ravel()
+    base = np.repeat(np.arange(colunas) * (linhas + 1), (mudanca > 0).sum(axis=1))
+    return np.expm1(acumulado[base + saidas] - acumulado[base + entradas]), saidas == linhas
+
+
+def _cagr(curva, anos):
+    if anos <= 0 or curva.empty or curva.iloc[-1] <= 0:
+        return np.nan
+    return curva.iloc[-1] ** (1 / anos) - 1
+
+
+def _drawdown(curva):
+    return float((curva / curva.cummax() - 1).min()) if not curva.empty else np.nan
+
+
+def simular(precos, sinais, custo=0.0):
+    # Posição decidida no fechamento de t vale para o retorno de t+1; carteira com peso igual entre os ativos comprados
+    retornos = (precos / precos.ffill().shift(1) - 1).fillna(0.0)
+    posicao = sinais.ffill().fillna(0.0).shift(1).fillna(0.0)
+    n = posicao.sum(axis=1)
+    pesos = posicao.div(n.where(n > 0), axis=0).fillna(0.0)
+    giro_diario = pesos.diff().abs().sum(axis=1).fillna(pesos.iloc[0].abs().sum() if len(pesos) else 0.0) / 2
+    ret_carteira = (pesos * retornos).sum(axis=1) - giro_diario * custo
+
+    # Referência: comprar e segurar todos os ativos com peso igual
+    listados = precos.notna() & precos.ffill().shift(1).notna()
+    ret_referencia = retornos.where(listados).mean(axis=1).fillna(0.0)
+
+    curva = (1 + ret_carteira).cumprod()
+    referencia = (1 + ret_referencia).cumprod()
+    anos = (precos.index[-1] - precos.index[0]).days / 365.25 if len(precos) > 1 else 0.0
+
+    log_ret = np.log1p(retornos.to_numpy()) * posicao.to_numpy()
+    operacoes, abertas = _negociacoes(posicao.to_numpy(), log_ret)
+    encerradas = operacoes[~abertas]
+    aberta_no_fim = posicao.iloc[-1].to_numpy() > 0 if len(posicao) else np.zeros(len(precos.columns), dtype=bool)
+
+    # Resultado por ativo: a regra aplicada isoladamente em cada ticker
+    curva_ativo = np.exp(np.cumsum(log_ret, axis=0))
+    por_ativo = pd.DataFrame({
+        "Retorno": curva_ativo[-1] - 1 if len(precos) else np.nan,
+        "CAGR": curva_ativo[-1] ** (1 / anos) - 1 if anos > 0 else np.nan,
+        "Max DD": (curva_ativo / np.maximum.accumulate(curva_ativo, axis=0) - 1).min(axis=0) if len(precos) else np.nan,
+        "Exposição": posicao.mean().to_numpy(),
+        "Operações": (posicao.diff().fillna(posicao) > 0).sum().to_numpy() - aberta_no_fim,
+        "Em aberto": aberta_no_fim.astype(int),
+    }, index=precos.columns)
+
+    metricas = {
+        "CAGR": _cagr(curva, anos),
+        "Max DD": _drawdown(curva),
+        # Acerto e Operações só contam operações encerradas; as abertas no fim vão à parte
+        "Acerto": float((encerradas > 0).mean()) if len(encerradas) else np.nan,
+        "Operações": int(len(encerradas)),
+        "Em aberto": int(abertas.sum()),
+        "Giro anual": float(giro_diario.sum() / anos) if anos > 0 else np.nan,
+        "CAGR referência": _cagr(referencia, anos),
+        "Max DD referência": _drawdown(referencia),
+    }
+    return {"curva": pd.DataFrame({"Estratégia": curva, "Comprar e segurar": referencia}), "metricas": metricas, "por_ativo": por_ativo}
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# ==================== MOTOR DO RADAR (VETORIZADO) ====================
+
+# Rótulos usados pelas tabelas e pelas regras das outras abas
+DESCONTADO, SOBREPRECO = "✅ DESCONTADO", "❌ SOBREPREÇO"
+COMPRAR, VENDER, ESPERAR = "✅ COMPRAR", "🛑 VENDER", "⚠️ ESPERAR"
+# Categorias fixas: colunas de rótulo ocupam um byte por linha e comparam como inteiros
+STATUS = [DESCONTADO, SOBREPRECO]
+ACOES = [COMPRAR, ESPERAR, VENDER]
+
+# Acima de quanto do preço justo o ativo passa a ser "VENDER"
+MARGEM_VENDA = 1.20
+
+
+def _por_ticker(valor, tickers, padrao=0.0):
+    # Aceita escalar, dict ou Series e devolve um vetor alinhado às colunas da matriz
+    if np.isscalar(valor):
+        return np.full(len(tickers), float(valor))
+    serie = pd.to_numeric(pd.Series(valor, dtype=object).reindex(tickers), errors="coerce")
+    return serie.fillna(padrao).to_numpy(dtype=float)
+
+
+def calcular_radar(precos, lpa, vpa, margem_venda=MARGEM_VENDA):
+    # precos: matriz (datas x tickers) de fechamentos já em reais (conversao.converter).
+    # lpa e vpa: escalares ou valores por ticker, na mesma moeda dos preços.
+    # Devolve um DataFrame numérico indexado por ticker; tickers sem nenhuma cotação ficam de fora.
+    precos = precos.loc[:, precos.notna().any()].astype(float)
+    tickers = precos.columns
+
+    # Variação diária sobre o último fechamento válido de cada coluna (ignora buracos de calendário)
+    variacoes = (precos / precos.ffill().shift(1) - 1) * 100
+
+    lpa_v, vpa_v = _por_ticker(lpa, tickers), _por_ticker(vpa, tickers)
+    p_atual = precos.ffill().iloc[-1].to_numpy() if len(precos) else np.full(len(tickers), np.nan)
+    m_30 = precos.mean().to_numpy()
+
+    # Preço justo de Graham; sem LPA/VPA positivos, vale a média do período
+    graham_ok = (lpa_v > 0) & (vpa_v > 0)
+    graham = np.sqrt(np.where(graham_ok, 22.5 * lpa_v * vpa_v, 0.0))
+    p_justo = np.where(graham_ok, graham, m_30)
+
+    descontado = p_atual < p_justo
+    acao = np.select(
+        [(p_atual < m_30) & descontado, p_atual > p_justo * margem_venda],
+        [COMPRAR, VENDER], default=ESPERAR
+    )
+
+    return pd.DataFrame({
+        "V_Cru": p_atual,
+        "P_Justo": p_justo,
+        "Status M": pd.Categorical(np.where(descontado, DESCONTADO, SOBREPRECO), categories=STATUS),
+        "Ação": pd.Categorical(acao, categories=ACOES),
+        "Var_Min": variacoes.min().to_numpy(),
+        "Var_Max": variacoes.max().to_numpy(),
+        "Dias_A": (variacoes > 0).sum().to_numpy(),
+        "Dias_B": (variacoes < 0).sum().to_numpy(),
+        "Var_H": variacoes.ffill().iloc[-1].to_numpy() if len(precos) else np.full(len(tickers), np.nan),
+        "LPA": lpa_v,
+        "VPA": vpa_v,
+    }, index=tickers)
+
+
+def formatar_dy(dy):
+    # Fração -> texto "9,5%" (Series)
+    dy = pd.to_numeric(dy, errors="coerce").fillna(0.0)
+    return (dy * 100).map("{:.1f}%".format).astype(str).str.replace(".", ",", regex=False)
+
+
+def formatar_radar(radar):
+    # Só para exibição: textos de Preço, Justo e DY a partir das colunas numéricas, de uma vez por coluna
+    return pd.DataFrame({
+        "Preço": radar["Preço"].map("{:.2f}".format).astype(str),
+        "Justo": radar["Justo"].map("{:.2f}".format).astype(str),
+        "DY": formatar_dy(radar["DY"]),
+    }, index=radar.index)
@@ -0,0 +1,172 @@
+import os
+import sys
+import pickle
+import itertools
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import motor_backtest
+
+# ==================== OTIMIZADOR DE PARÂMETROS (WALK-FORWARD) ====================
+
+# Grades padrão dos limiares que hoje estão fixos no app
+GRADE_RADAR = {
+    "margem_venda": [1.10, 1.20, 1.30, 1.50],
+    "janela": ["20D", "30D", "60D"],
+}
+GRADE_SINAL = {
+    "margem_venda": [1.10, 1.20, 1.30],
+    "medias": [(20, 100), (50, 200)],
+    "rsi_sobrecompra": [65, 70, 80],
+    "rsi_fraqueza": [40, 50, 60],
+}
+CRITERIOS = {
+    "CAGR": lambda m: m["CAGR"],
+    "Calmar": lambda m: m["CAGR"] / abs(m["Max DD"]) if m["Max DD"] else np.nan,
+}
+
+# Estado de cada processo trabalhador, montado uma vez pelo inicializador
+_trabalho = {}
+
+
+def combinacoes(grade):
+    nomes = list(grade)
+    return [dict(zip(nomes, valores)) for valores in itertools.product(*grade.values())]
+
+
+def dobras(indice, anos_treino=3, anos_teste=1):
+    # Janelas (início do treino, fim do treino, fim do teste) que avançam de teste em teste
+    resultado = []
+    inicio = indice[0]
+    while True:
+        fim_treino = inicio + pd.DateOffset(years=anos_treino)
+        fim_teste = fim_treino + pd.DateOffset(years=anos_teste)
+        if fim_teste > indice[-1] + pd.Timedelta(days=1):
+            break
+        resultado.append((inicio, fim_treino, fim_teste))
+        inicio += pd.DateOffset(years=anos_teste)
+    return resultado
+
+
+def _anexar(caminho, forma, indice, colunas, regra, lpa, vpa, janelas, criterio, custo):
+    # A matriz de preços fica num arquivo mapeado em memória: todos os processos leem as mesmas páginas
+    matriz = np.memmap(caminho, dtype=np.float64, mode="r", shape=forma)
+    _trabalho.update(
+        precos=pd.DataFrame(matriz, index=indice, columns=colunas, copy=False),
+        regra=regra, lpa=lpa, vpa=vpa, janelas=janelas, criterio=criterio, custo=custo,
+    )
+
+
+def _sinais(params):
+    t = _trabalho
+    if t["regra"] == "radar":
+        return motor_backtest.sinais_radar(t["precos"], t["lpa"], t["vpa"], **params)
+    # As médias e o RSI só dependem das janelas: cada processo calcula uma vez por par de médias
+    medias = params.get("medias", (50, 200))
+    if medias not in t.setdefault("indicadores", {}):
+        t["indicadores"][medias] = motor_backtest.indicadores.MotorIndicadores(medias=medias).calcular(t["precos"])
+    return motor_backtest.sinais_finais(t["precos"], t["lpa"], t["vpa"], series=t["indicadores"][medias], **params)
+
+
+def _avaliar(params):
+    # Sinais calculados uma vez no histórico inteiro (só olham para trás) e simulados em cada janela
+    t = _trabalho
+    sinais = _sinais(params).ffill()
+    pontuar = CRITERIOS[t["criterio"]]
+    linhas = []
+    for inicio, fim_treino, fim_teste in t["janelas"]:
+        treino = slice(inicio, fim_treino - pd.Timedelta(days=1))
+        teste = slice(fim_treino, fim_teste - pd.Timedelta(days=1))
+        m_treino = motor_backtest.simular(t["precos"].loc[treino], sinais.loc[treino], t["custo"])["metricas"]
+        m_teste = motor_backtest.simular(t["precos"].loc[teste], sinais.loc[teste], t["custo"])["metricas"]
+        linhas.append({
+            "Treino": pontuar(m_treino), "Teste": pontuar(m_teste),
+            "CAGR teste": m_teste["CAGR"], "Max DD teste": m_teste["Max DD"],
+            "Acerto teste": m_teste["Acerto"], "Giro teste": m_teste["Giro anual"],
+        })
+    return params, linhas
+
+
+def varrer(caminho, forma, indice, colunas, regra, lpa, vpa, janelas, criterio, custo, grade, trabalhadores):
+    # Roda dentro do processo de varredura.py, nunca no processo do Streamlit
+    with ProcessPoolExecutor(
+        max_workers=trabalhadores or os.cpu_count(),
+        initializer=_anexar,
+        initargs=(caminho, forma, indice, colunas, regra, lpa, vpa, janelas, criterio, custo),
+    ) as pool:
+        return list(pool.map(_avaliar, combinacoes(grade)))
+
+
+def _varrer_em_subprocesso(argumentos):
+    # O Streamlit tem várias threads (fork não é seguro) e registra o main.py como __main__ (spawn reexecutaria
+    # o app): a varredura roda num interpretador novo a partir de varredura.py, que cria o pool de lá
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    descritor, entrada = tempfile.mkstemp(suffix=".pkl")
+    os.close(descritor)
+    saida = entrada + ".saida"
+    try:
+        with open(entrada, "wb") as f:
+            pickle.dump(argumentos, f)
+        processo = subprocess.run(
+            [sys.executable, "-m", "varredura", entrada, saida], cwd=pasta, capture_output=True, text=True
+        )
+        if processo.returncode != 0:
+            raise RuntimeError(f"Falha na varredura do otimizador:\n{processo.stderr[-2000:]}")
+        with open(saida, "rb") as f:
+            return pickle.load(f)
+    finally:
+        for arquivo in (entrada, saida):
+            if os.path.exists(arquivo):
+                os.remove(arquivo)
+
+
+def otimizar(precos, lpa, vpa, regra="radar", grade=None, anos_treino=3, anos_teste=1,
+             criterio="CAGR", custo=0.0, trabalhadores=None):
+    # Avalia cada combinação da grade em todas as janelas walk-forward, em paralelo.
+    # Devolve (ranking por desempenho fora da amostra, parâmetros escolhidos no treino de cada janela).
+    grade = grade or (GRADE_RADAR if regra == "radar" else GRADE_SINAL)
+    janelas = dobras(precos.index, anos_treino, anos_teste)
+    if not janelas:
+        return pd.DataFrame(), pd.DataFrame()
+
+    descritor, caminho = tempfile.mkstemp(suffix=".bin")
+    os.close(descritor)
+    try:
+        matriz = np.memmap(caminho, dtype=np.float64, mode="w+", shape=precos.shape)
+        matriz[:] = precos.to_numpy(dtype=np.float64)
+        matriz.flush()
+        del matriz
+        resultados = _varrer_em_subprocesso(dict(
+            caminho=caminho, forma=precos.shape, indice=precos.index, colunas=list(precos.columns), regra=regra,
+            lpa=lpa, vpa=vpa, janelas=janelas, criterio=criterio, custo=custo,
+            grade=grade, trabalhadores=trabalhadores,
+        ))
+    finally:
+        os.remove(caminho)
+
+    linhas = []
+    for params, por_janela in resultados:
+        for i, valores in enumerate(por_janela):
+            linhas.append({"Conjunto": repr(params), "Janela": i, **params, **valores})
+    tabela = pd.DataFrame(linhas)
+
+    # Walk-forward: em cada janela vence o melhor no treino; conta quantas vezes cada conjunto venceu
+    validas = tabela.dropna(subset=["Treino"])
+    vencedores = tabela.loc[validas.groupby("Janela")["Treino"].idxmax()]
+    escolhas = vencedores.assign(
+        Período=[f"{fim:%m/%Y} a {(fim_t - pd.Timedelta(days=1)):%m/%Y}" for _, fim, fim_t in (janelas[j] for j in vencedores["Janela"])]
+    )[["Período", *grade, "Treino", "Teste"]].reset_index(drop=True)
+
+    colunas = list(grade)
+    ranking = tabela.groupby("Conjunto").agg(
+        **{c: (c, "first") for c in colunas},
+        **{f"Treino ({criterio})": ("Treino", "mean"), f"Teste ({criterio})": ("Teste", "mean")},
+        **{c: (c, "mean") for c in ["CAGR teste", "Max DD teste", "Acerto teste", "Giro teste"] if c != f"{criterio} teste"},
+        **{"Janelas positivas": ("CAGR teste", lambda s: (s > 0).mean())},
+    )
+    ranking["Vitórias no treino"] = vencedores["Conjunto"].value_counts().reindex(ranking.index).fillna(0).astype(int)
+    ranking = ranking.sort_values(f"Teste ({criterio})", ascending=False).reset_index(drop=True)
+    ranking.insert(0, "Posição", np.arange(1, len(ranking) + 1))
+    return ranking, escolhas
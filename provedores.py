@@ -0,0 +1,180 @@
+import os
+import json
+import threading
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+import pandas as pd
+import conversao
+
+# ==================== PROVEDORES DE DADOS DE MERCADO ====================
+
+# Toda busca de mercado do app passa por um provedor: histórico (um ticker ou um lote), fundamentos e câmbio.
+# RADAR_PROVEDOR escolhe o backend: "yahoo" (padrão), "arquivos[:pasta]" (dados gravados, sem rede) ou "memoria".
+PROVEDOR = os.environ.get("RADAR_PROVEDOR", "yahoo")
+
+CAMPOS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Formato em disco do provedor de arquivos (o mesmo gravado por benchmarks/gravar_fixtures.py)
+PASTA_ARQUIVOS = "dados_mercado"
+ARQ_HISTORICO = "historico.csv.gz"
+ARQ_FUNDAMENTOS = "fundamentos.json"
+ARQ_META = "meta.json"
+
+# Dias corridos de cada `period` do yfinance; None = tudo
+PERIODOS = {"1d": 1, "5d": 5, "30d": 30, "1mo": 30, "3mo": 91, "6mo": 182, "12mo": 365, "1y": 365,
+            "2y": 730, "5y": 1826, "10y": 3652, "max": None}
+
+
+def recortar(barras, inicio=None, periodo="max"):
+    # Mesmo recorte do yfinance: a partir de `inicio` ou os últimos `periodo` dias corridos
+    if barras is None or barras.empty:
+        return barras
+    if inicio is not None:
+        return barras[barras.index >= pd.Timestamp(inicio)]
+    if PERIODOS.get(periodo):
+        return barras[barras.index > barras.index.max() - pd.Timedelta(days=PERIODOS[periodo])]
+    return barras
+
+
+class ProvedorMercado(ABC):
+    # Interface: os backends implementam historico_lote e fundamentos; histórico avulso e câmbio derivam deles.
+    # Um backend incompleto falha ao ser criado, não no meio de uma atualização.
+
+    @abstractmethod
+    def historico_lote(self, tickers, inicio=None, periodo="max", timeout=None):
+        # {ticker: DataFrame OHLCV diário}; ticker sem dados fica de fora
+        ...
+
+    @abstractmethod
+    def fundamentos(self, ticker):
+        # Dicionário no formato do .info do Yahoo ({} se não houver)
+        ...
+
+    def exclusivo(self):
+        # Acesso exclusivo ao histórico em lote: quem coleta só começa a contar o tempo depois de obtê-lo
+        return nullcontext()
+
+    def historico(self, ticker, inicio=None, periodo="max"):
+        return self.historico_lote([ticker], inicio, periodo).get(ticker)
+
+    def cambio(self, moeda, inicio=None, periodo="max"):
+        # Fechamentos diários de 1 unidade da moeda em reais
+        barras = self.historico(conversao.par(moeda), inicio, periodo)
+        return barras["Close"] if barras is not None else pd.Series(dtype=float)
+
+
+def _extrair_ohlcv(bruto, ticker, lote):
+    # yf.download devolve colunas (Campo, Ticker); com um só ticker pode vir sem o nível do ticker
+    if bruto is None or bruto.empty:
+        return None
+    if isinstance(bruto.columns, pd.MultiIndex):
+        if ticker not in bruto.columns.get_level_values(1):
+            return None
+        return bruto.xs(ticker, axis=1, level=1).dropna(how="all")
+    return bruto.dropna(how="all") if len(lote) == 1 else None
+
+
+def _sessao_http():
+    # O yfinance atual exige sessão curl_cffi; sem ela, ele cria a própria
+    try:
+        from curl_cffi import requests as http
+        return http.Session(impersonate="chrome")
+    except ImportError:
+        return None
+
+
+class ProvedorYahoo(ProvedorMercado):
+    # Uma única sessão HTTP por provedor: as conexões são reaproveitadas por todos os lotes e threads do pool
+
+    def __init__(self, sessao=None):
+        import yfinance
+        self.yf = yfinance
+        self.sessao = sessao if sessao is not None else _sessao_http()
+        # yf.download guarda resultados em estado global do módulo: só um lote pode rodar por vez
+        self._trava = threading.RLock()
+
+    def historico_lote(self, tickers, inicio=None, periodo="max", timeout=None):
+        tickers = list(tickers)
+        janela = {"start": pd.Timestamp(inicio).strftime("%Y-%m-%d")} if inicio is not None else {"period": periodo}
+        # auto_adjust: fechamentos ajustados, rebaseados a cada provento; o armazém detecta e baixa tudo de novo
+        with self._trava:
+            bruto = self.yf.download(
+                tickers, interval="1d", group_by="column", auto_adjust=True, progress=False,
+                threads=True, timeout=timeout, session=self.sessao, **janela
+            )
+        barras = {t: _extrair_ohlcv(bruto, t, tickers) for t in tickers}
+        return {t: b for t, b in barras.items() if b is not None and not b.empty}
+
+    def exclusivo(self):
+        return self._trava
+
+    def fundamentos(self, ticker):
+        return self.yf.Ticker(ticker, session=self.sessao).info or {}
+
+
+class ProvedorMemoria(ProvedorMercado):
+    # Dados fixos em memória (testes de carga, execuções determinísticas): nada sai do processo
+
+    def __init__(self, historicos=None, fundamentos=None):
+        self.historicos = {t: df.sort_index() for t, df in (historicos or {}).items()}
+        self.infos = dict(fundamentos or {})
+
+    def historico_lote(self, tickers, inicio=None, periodo="max", timeout=None):
+        barras = {t: recortar(self.historicos[t], inicio, periodo) for t in tickers if t in self.historicos}
+        return {t: b for t, b in barras.items() if not b.empty}
+
+    def fundamentos(self, ticker):
+        return dict(self.infos.get(ticker, {}))
+
+
+class ProvedorArquivos(ProvedorMemoria):
+    # Dados gravados em disco, para rodar sem rede. reancorar: desloca as datas em pregões para que a
+    # última barra gravada caia no último pregão, e as janelas "últimos N dias" do app encontrem dados.
+
+    def __init__(self, pasta=PASTA_ARQUIVOS, reancorar=True):
+        caminho = os.path.join(pasta, ARQ_HISTORICO)
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"{pasta}: sem {ARQ_HISTORICO} (veja benchmarks/gravar_fixtures.py)")
+        longo = pd.read_csv(caminho, parse_dates=["Date"])
+        if reancorar and not longo.empty:
+            ultimo_pregao = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=1)[0]
+            deslocamento = len(pd.bdate_range(longo["Date"].max(), ultimo_pregao)) - 1
+            if deslocamento > 0:
+                longo["Date"] = longo["Date"] + pd.offsets.BDay(deslocamento)
+        historicos = {t: df.set_index("Date")[CAMPOS] for t, df in longo.groupby("Ticker")}
+        fundamentos, self.meta = {}, {}
+        if os.path.exists(os.path.join(pasta, ARQ_FUNDAMENTOS)):
+            with open(os.path.join(pasta, ARQ_FUNDAMENTOS), "r", encoding="utf-8") as f:
+                fundamentos = json.load(f)
+        if os.path.exists(os.path.join(pasta, ARQ_META)):
+            with open(os.path.join(pasta, ARQ_META), "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        super().__init__(historicos, fundamentos)
+
+    @staticmethod
+    def gravar(pasta, historicos, fundamentos, meta=None):
+        # Formato longo (Date, Ticker, OHLCV) compactado + fundamentos e metadados em JSON
+        os.makedirs(pasta, exist_ok=True)
+        longo = pd.concat(
+            [df[CAMPOS].rename_axis("Date").reset_index().assign(Ticker=t) for t, df in historicos.items()],
+            ignore_index=True,
+        )
+        longo[["Date", "Ticker", *CAMPOS]].to_csv(
+            os.path.join(pasta, ARQ_HISTORICO), index=False, float_format="%.6g", date_format="%Y-%m-%d"
+        )
+        with open(os.path.join(pasta, ARQ_FUNDAMENTOS), "w", encoding="utf-8") as f:
+            json.dump(fundamentos, f, ensure_ascii=False, indent=1, sort_keys=True, default=str)
+        with open(os.path.join(pasta, ARQ_META), "w", encoding="utf-8") as f:
+            json.dump({**(meta or {}), "tickers": len(historicos), "barras": len(longo)}, f, ensure_ascii=False, indent=1)
+
+
+def criar(especificacao=PROVEDOR):
+    # "yahoo", "arquivos", "arquivos:/caminho/da/pasta" ou "memoria"
+    nome, _, argumento = especificacao.partition(":")
+    if nome == "yahoo":
+        return ProvedorYahoo()
+    if nome == "arquivos":
+        return ProvedorArquivos(argumento or PASTA_ARQUIVOS)
+    if nome == "memoria":
+        return ProvedorMemoria()
+    raise ValueError(f"RADAR_PROVEDOR desconhecido: {especificacao!r} (use yahoo, arquivos[:pasta] ou memoria)")
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# ==================== SIMULADOR DE RENDA (MONTE CARLO) ====================
+
+PERCENTIS = [10, 25, 50, 75, 90]
+
+
+def simular_renda(aporte_mensal, dy_mensal, anos=20, patrimonio_inicial=0.0, reinvestir=True,
+                  valorizacao_anual=0.05, volatilidade_anual=0.20, incerteza_dy=0.25, persistencia_dy=0.9,
+                  caminhos=5000, semente=42):
+    # Todos os caminhos e meses de uma vez (matrizes meses x caminhos, como as de datas x tickers).
+    # Preço: retorno mensal lognormal. DY: choque lognormal persistente (AR(1) no log) sobre o DY médio.
+    meses = int(anos * 12)
+    rng = np.random.default_rng(semente)
+
+    mu = np.log1p(valorizacao_anual) / 12
+    sigma = volatilidade_anual / np.sqrt(12)
+    crescimento = np.exp(mu - sigma ** 2 / 2 + sigma * rng.standard_normal((meses, caminhos)))
+
+    # AR(1) do choque de DY: laço nos meses, vetorizado em todos os caminhos
+    ruido = rng.standard_normal((meses, caminhos)) * incerteza_dy * np.sqrt(1 - persistencia_dy ** 2)
+    choque = np.empty_like(ruido)
+    choque[0] = rng.standard_normal(caminhos) * incerteza_dy
+    for t in range(1, meses):
+        choque[t] = persistencia_dy * choque[t - 1] + ruido[t]
+    dy = dy_mensal * np.exp(choque - incerteza_dy ** 2 / 2)
+
+    # Patrimônio: W_{t+1} = (W_t + aporte) * g_t * (1 + dy_t se reinveste), recorrência linear resolvida com produtos acumulados
+    fator = crescimento * (1 + dy) if reinvestir else crescimento
+    acumulado = np.cumprod(fator, axis=0)
+    entradas = aporte_mensal * fator / acumulado
+    patrimonio = acumulado * (patrimonio_inicial + np.cumsum(entradas, axis=0))
+    # Dividendos pagos no mês sobre o patrimônio já valorizado (antes do reinvestimento)
+    base = patrimonio / (1 + dy) if reinvestir else patrimonio
+    renda = base * dy
+
+    datas = pd.date_range(pd.Timestamp.today().normalize() + pd.offsets.MonthBegin(1), periods=meses, freq="MS")
+    return datas, renda, patrimonio
+
+
+def faixas(datas, valores, percentis=PERCENTIS):
+    # Percentis por mês, prontos para gráfico
+    return pd.DataFrame(np.percentile(valores, percentis, axis=1).T, index=datas, columns=[f"P{p}" for p in percentis])
+
+
+def cruzamento(datas, renda, meta, percentis=(10, 50, 90)):
+    # Mês em que cada caminho passa a cobrir a meta; caminhos que não chegam ficam fora do horizonte
+    atingiu = renda >= meta
+    chegou = atingiu.any(axis=0)
+    primeiro = np.where(chegou, atingiu.argmax(axis=0), len(datas))
+    datas_ext = datas.append(pd.DatetimeIndex([pd.NaT]))
+    return {
+        "probabilidade": float(chegou.mean()),
+        **{f"P{p}": datas_ext[int(np.percentile(primeiro, p, method="higher"))] for p in percentis},
+    }
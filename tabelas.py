@@ -0,0 +1,55 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+import diagnostico
+
+# ==================== TABELAS HTML (ROCKEFELLER) ====================
+
+LINHAS_POR_PAGINA = 100
+MAX_CACHE = 64
+
+_cache = OrderedDict()
+_trava = threading.Lock()
+
+
+def assinatura(df):
+    # Hash do conteúdo (valores, índice e nomes das colunas): igual enquanto os dados não mudam
+    h = hashlib.sha1(repr((list(df.columns), df.shape)).encode())
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    except TypeError:
+        h.update(df.to_csv().encode())
+    return h.hexdigest()
+
+
+def montar(celulas):
+    # celulas: DataFrame de textos já formatados, uma coluna por cabeçalho. Linhas montadas coluna a coluna.
+    cabecalho = "".join(f"<th>{c}</th>" for c in celulas.columns)
+    linhas = pd.Series("<tr>", index=celulas.index)
+    for c in celulas.columns:
+        linhas = linhas + "<td>" + celulas[c].astype(str) + "</td>"
+    corpo = "".join(linhas + "</tr>")
+    return f"""<div class="mobile-table-container"><table class="rockefeller-table">
+            <thead><tr>{cabecalho}</tr></thead>
+            <tbody>{corpo}</tbody>
+        </table></div>"""
+
+
+def renderizar(df, formatar, pagina=0, por_pagina=None):
+    # formatar(df) -> DataFrame de células. HTML guardado por (formatador, conteúdo, página): rerun sem mudança não remonta nada.
+    chave = (formatar.__module__, formatar.__qualname__, assinatura(df), pagina, por_pagina)
+    with _trava:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            diagnostico.cache("tabelas", acertos=1)
+            return _cache[chave]
+    diagnostico.cache("tabelas", faltas=1)
+    visiveis = df.iloc[pagina * por_pagina:(pagina + 1) * por_pagina] if por_pagina else df
+    with diagnostico.medir(f"tabelas.montar ({formatar.__name__})"):
+        html = montar(formatar(visiveis))
+    with _trava:
+        _cache[chave] = html
+        while len(_cache) > MAX_CACHE:
+            _cache.popitem(last=False)
+    return html
@@ -0,0 +1,71 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+import alocacao
+
+
+def _custo(q, p, alvo, penalidade=0.5):
+    return penalidade * np.abs(q * p - alvo).sum() - (q * p).sum()
+
+
+def _forca_bruta(p, orcamento, alvo):
+    # Todas as combinações de cotas que cabem no orçamento; devolve o menor custo
+    faixas = [range(int(orcamento // x + 1e-9) + 1) for x in p]
+    melhor = np.inf
+    for q in itertools.product(*faixas):
+        q = np.array(q, dtype=float)
+        if (q * p).sum() <= orcamento + 1e-9:
+            melhor = min(melhor, _custo(q, p, alvo))
+    return melhor
+
+
+def test_orcamento_multiplo_exato_do_preco():
+    assert alocacao.alocar(pd.Series([10.0]), 100).tolist() == [10]
+    cotas = alocacao.alocar(pd.Series([10.0, 2.5]), 100)
+    assert alocacao.resumo([10.0, 2.5], cotas, 100)["sobra"] == pytest.approx(0.0)
+
+
+@pytest.mark.parametrize("precos, orcamento", [
+    ([10.0], 100), ([10.0, 2.5], 100), ([3.0, 7.0], 50), ([12.34, 5.67], 98.7),
+    ([4.5, 9.0, 13.5], 81), ([0.99, 25.0, 7.77], 123.45), ([33.0, 17.0, 8.0], 200), ([2.0, 3.0, 5.0], 30),
+])
+def test_igual_forca_bruta(precos, orcamento):
+    p = np.array(precos)
+    cotas = alocacao.alocar(pd.Series(p), orcamento).to_numpy(dtype=float)
+    alvo = np.full(len(p), orcamento / len(p))
+    assert (cotas * p).sum() <= orcamento + 1e-9
+    assert _custo(cotas, p, alvo) == pytest.approx(_forca_bruta(p, orcamento, alvo), abs=1e-9)
+
+
+def test_forca_bruta_aleatorio():
+    rng = np.random.default_rng(7)
+    for _ in range(30):
+        p = np.round(rng.uniform(1, 40, rng.integers(1, 4)), 2)
+        orcamento = float(np.round(rng.uniform(5, 150), 2))
+        if rng.random() < 0.3:
+            orcamento = float(p[0] * rng.integers(1, 6))
+        cotas = alocacao.alocar(pd.Series(p), orcamento).to_numpy(dtype=float)
+        alvo = np.full(len(p), orcamento / len(p))
+        assert (cotas * p).sum() <= orcamento + 1e-9
+        assert _custo(cotas, p, alvo) <= _forca_bruta(p, orcamento, alvo) + 1e-9
+
+
+@pytest.mark.parametrize("orcamento", [1_000, 10_000, 100_000, 500_000])
+def test_trabalho_limitado_com_ativos_baratos(monkeypatch, orcamento):
+    # 35 ativos de R$ 0,85 a R$ 650: as janelas dos baratos teriam centenas de cotas
+    rng = np.random.default_rng(3)
+    p = np.round(np.concatenate([rng.uniform(2, 60, 19), rng.uniform(8, 12, 5), rng.uniform(80, 400, 8), [0.85, 1.60, 650.0]]), 2)
+    celulas = []
+    programar = alocacao._programar
+
+    def medido(p_, alvo, baixo, opcoes, orc, penalidade, max_estados):
+        celulas.append(sum(len(o) for o in opcoes) * max_estados)
+        return programar(p_, alvo, baixo, opcoes, orc, penalidade, max_estados)
+
+    monkeypatch.setattr(alocacao, "_programar", medido)
+    cotas = alocacao.alocar(pd.Series(p), orcamento)
+    assert len(celulas) <= alocacao.MAX_PASSADAS
+    assert max(celulas) <= alocacao.MAX_CELULAS
+    sobra = orcamento - (cotas.to_numpy() * p).sum()
+    assert -1e-9 <= sobra < 5.0
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from armazem_precos import ArmazemPrecos
+
+
+def _barras(fechamentos, inicio="2024-01-01"):
+    datas = pd.bdate_range(inicio, periods=len(fechamentos))
+    c = np.asarray(fechamentos, dtype=float)
+    return pd.DataFrame({"Open": c, "High": c, "Low": c, "Close": c, "Volume": np.ones(len(c))}, index=datas)
+
+
+def _baixar_de(completo, chamadas):
+    def baixar(lote, inicio):
+        chamadas.append(inicio)
+        return {t: completo if inicio is None else completo[completo.index >= inicio] for t in lote}
+    return baixar
+
+
+def test_delta_sem_ajuste_so_anexa(tmp_path):
+    armazem = ArmazemPrecos(str(tmp_path))
+    armazem.anexar("AAA", _barras([10, 11, 12, 13]))
+    completo = _barras([10, 11, 12, 13.5, 14, 15])
+    chamadas = []
+    armazem.atualizar(["AAA"], _baixar_de(completo, chamadas))
+    assert chamadas == [completo.index[2]]
+    fechamentos = armazem.ler("AAA")["Close"]
+    assert list(fechamentos.index) == list(completo.index)
+    np.testing.assert_allclose(fechamentos, completo["Close"])
+
+
+def test_desdobramento_regrava_historico(tmp_path):
+    armazem = ArmazemPrecos(str(tmp_path))
+    armazem.anexar("AAA", _barras([10, 11, 12, 13]))
+    # Desdobramento 2:1: o Yahoo devolve todo o passado pela metade
+    completo = _barras([5, 5.5, 6, 6.5, 7, 7.5])
+    chamadas = []
+    armazem.atualizar(["AAA"], _baixar_de(completo, chamadas))
+    assert chamadas == [completo.index[2], None]
+    fechamentos = armazem.ler("AAA")["Close"]
+    assert list(fechamentos.index) == list(completo.index)
+    np.testing.assert_allclose(fechamentos, completo["Close"])
+    assert fechamentos.pct_change().min() > -0.1
@@ -0,0 +1,25 @@
+import json
+from historico_renda import HistoricoRenda
+
+
+def test_datas_legadas_caem_no_mes_certo(tmp_path):
+    legado = tmp_path / "legado.json"
+    legado.write_text(json.dumps([
+        {"data": "15/03/2024", "ativo": "AAA", "cotas": 1, "valor_investido": 100.0, "renda_mensal": 1.0},
+        {"data": "02/04/2024", "ativo": "AAA", "cotas": 1, "valor_investido": 100.0, "renda_mensal": 2.0},
+    ]))
+    historico = HistoricoRenda(str(tmp_path / "log.jsonl"), str(tmp_path / "meses.json"), str(legado))
+    historico.anexar([{"data": "2024-03-05", "ativo": "BBB", "cotas": 2, "valor_investido": 50.0, "renda_mensal": 0.5}])
+    mensal = historico.mensal().set_index("Mes")
+    assert list(mensal.index) == ["2024-03", "2024-04"]
+    assert mensal.loc["2024-03", "renda_mensal"] == 1.5
+    assert mensal.loc["2024-03", "registros"] == 2
+    assert mensal.loc["2024-04", "valor_investido"] == 100.0
+
+
+def test_baldes_de_versao_antiga_sao_refeitos(tmp_path):
+    log, meses = tmp_path / "log.jsonl", tmp_path / "meses.json"
+    log.write_text(json.dumps({"data": "15/03/2024", "renda_mensal": 1.0}) + "\n")
+    meses.write_text(json.dumps({"ate_byte": log.stat().st_size, "meses": {"15/03/2": {"renda_mensal": 1.0, "valor_investido": 0.0, "registros": 1}}}))
+    historico = HistoricoRenda(str(log), str(meses), None)
+    assert list(historico.meses()["meses"]) == ["2024-03"]
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import indicadores
+
+
+def _precos(n=260, tickers=("A", "B"), semente=1):
+    rng = np.random.default_rng(semente)
+    datas = pd.bdate_range("2024-01-01", periods=n)
+    valores = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, (n, len(tickers))), axis=0))
+    return pd.DataFrame(valores, index=datas, columns=list(tickers))
+
+
+def _iguais(a, b):
+    pd.testing.assert_frame_equal(a, b, check_exact=False, rtol=1e-9)
+
+
+def test_coluna_vazia_que_ganha_historico_recalcula():
+    completo = _precos()
+    vazio = completo.copy()
+    vazio["B"] = np.nan
+    motor = indicadores.MotorIndicadores()
+    motor.sincronizar(vazio)
+    _iguais(motor.sincronizar(completo), indicadores.MotorIndicadores().sincronizar(completo))
+    assert not motor.ultimos().loc["B", ["MA50", "MA200", "RSI"]].isna().any()
+
+
+def test_passado_revisado_recalcula():
+    precos = _precos()
+    motor = indicadores.MotorIndicadores()
+    motor.sincronizar(precos)
+    revisado = precos.copy()
+    revisado.iloc[:-1] *= 0.5
+    _iguais(motor.sincronizar(revisado), indicadores.MotorIndicadores().sincronizar(revisado))
+
+
+def test_barras_novas_incrementais_igual_ao_calculo_completo():
+    precos = _precos()
+    motor = indicadores.MotorIndicadores()
+    motor.sincronizar(precos.iloc[:-5])
+    for fim in range(len(precos) - 4, len(precos) + 1):
+        resultado = motor.sincronizar(precos.iloc[:fim])
+    _iguais(resultado, indicadores.MotorIndicadores().sincronizar(precos))
+
+
+def test_janela_movel_nao_recalcula(monkeypatch):
+    # O app lê uma janela de dias fixa: cada pregão novo entra no fim e o mais antigo sai do início
+    precos = _precos(n=270)
+    motor = indicadores.MotorIndicadores()
+    motor.sincronizar(precos.iloc[:260])
+    completos = []
+    monkeypatch.setattr(motor, "calcular", lambda m: completos.append(m))
+    for inicio in range(1, 11):
+        resultado = motor.sincronizar(precos.iloc[inicio:260 + inicio])
+    assert completos == []
+    _iguais(resultado, indicadores.MotorIndicadores().sincronizar(precos.iloc[10:]))
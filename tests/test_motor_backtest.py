@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+import motor_backtest
+
+
+def test_posicao_aberta_no_fim_fica_fora_do_acerto():
+    datas = pd.bdate_range("2024-01-01", periods=8)
+    # A: compra e vende com prejuízo; B: compra e segue comprado no fim, com lucro na marcação
+    precos = pd.DataFrame({"A": [10, 10, 9, 8, 8, 8, 8, 8], "B": [10, 10, 10, 10, 11, 12, 13, 14]}, index=datas, dtype=float)
+    sinais = pd.DataFrame(np.nan, index=datas, columns=["A", "B"])
+    sinais.loc[datas[1], "A"], sinais.loc[datas[3], "A"] = 1.0, 0.0
+    sinais.loc[datas[3], "B"] = 1.0
+    resultado = motor_backtest.simular(precos, sinais)
+    m = resultado["metricas"]
+    assert m["Operações"] == 1
+    assert m["Em aberto"] == 1
+    assert m["Acerto"] == 0.0
+    assert resultado["por_ativo"]["Operações"].tolist() == [1, 0]
+    assert resultado["por_ativo"]["Em aberto"].tolist() == [0, 1]
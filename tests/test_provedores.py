@@ -0,0 +1,21 @@
+import pandas as pd
+import pytest
+import provedores
+
+
+def test_provedor_incompleto_falha_ao_criar():
+    class SoHistorico(provedores.ProvedorMercado):
+        def historico_lote(self, tickers, inicio=None, periodo="max", timeout=None):
+            return {}
+
+    with pytest.raises(TypeError):
+        SoHistorico()
+
+
+def test_provedor_memoria_recorta_pelo_inicio():
+    datas = pd.bdate_range("2024-01-01", periods=10)
+    barras = pd.DataFrame({c: range(10) for c in provedores.CAMPOS}, index=datas, dtype=float)
+    provedor = provedores.ProvedorMemoria({"AAA": barras}, {"AAA": {"trailingEps": 1.0}})
+    assert len(provedor.historico("AAA", inicio=datas[7])) == 3
+    assert provedor.historico_lote(["AAA", "BBB"]).keys() == {"AAA"}
+    assert provedor.fundamentos("BBB") == {}
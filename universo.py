@@ -0,0 +1,60 @@
+import os
+import pandas as pd
+
+# ==================== UNIVERSO DE ATIVOS ====================
+
+# Arquivo com um ativo por linha; RADAR_UNIVERSO aponta para outro (ex.: a lista completa da B3)
+ARQ_UNIVERSO = os.environ.get("RADAR_UNIVERSO", "universo.csv")
+COLUNAS = ["ativo", "ticker", "empresa", "classe", "moeda", "unidade", "segmento", "grupos"]
+
+# Tickers processados por vez no radar e na atualização: limita a memória de cada passo
+TAMANHO_BLOCO = 200
+
+
+def carregar_universo(caminho=ARQ_UNIVERSO):
+    # ativo: nome exibido (único); ticker: símbolo do Yahoo; grupos: "estrategico", "modelo", "sinal" separados por ";"
+    df = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    # unidade: vazia quando o preço já é por cota; "onca_troy" para ouro cotado em onça (ver conversao.UNIDADES)
+    if "unidade" not in df.columns:
+        df["unidade"] = ""
+    faltando = [c for c in COLUNAS if c not in df.columns]
+    if faltando:
+        raise ValueError(f"{caminho}: colunas ausentes {faltando}")
+    df = df[COLUNAS].apply(lambda c: c.str.strip())
+    df = df[(df["ativo"] != "") & (df["ticker"] != "")].drop_duplicates("ativo").reset_index(drop=True)
+    df["empresa"] = df["empresa"].where(df["empresa"] != "", df["ativo"])
+    df["moeda"] = df["moeda"].where(df["moeda"] != "", "BRL").str.upper()
+    for c in ("classe", "moeda", "unidade", "segmento"):
+        df[c] = df[c].astype("category")
+    return df
+
+
+def do_grupo(universo, grupo):
+    return universo[universo["grupos"].str.split(";").map(lambda g: grupo in g)]
+
+
+def do_radar(universo):
+    # Tudo entra no radar, menos o que está só na lista de sinais
+    return universo[universo["grupos"] != "sinal"]
+
+
+def mapa(universo):
+    # {ativo: ticker}, na ordem do arquivo
+    return dict(zip(universo["ativo"], universo["ticker"]))
+
+
+def blocos(itens, tamanho=TAMANHO_BLOCO):
+    itens = list(itens)
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+
+
+def processar_em_blocos(itens, funcao, tamanho=TAMANHO_BLOCO, progresso=None):
+    # funcao(bloco) -> DataFrame; os pedaços são concatenados no fim. progresso(feitos, total) após cada bloco.
+    itens = list(itens)
+    partes = []
+    for i, bloco in enumerate(blocos(itens, tamanho)):
+        partes.append(funcao(bloco))
+        if progresso:
+            progresso(min(len(itens), (i + 1) * tamanho), len(itens))
+    return pd.concat(partes) if partes else pd.DataFrame()
@@ -0,0 +1,16 @@
+import sys
+import pickle
+import otimizador
+
+# ==================== PROCESSO DA VARREDURA DO OTIMIZADOR ====================
+
+# Uso (chamado por otimizador.otimizar): python -m varredura <entrada.pkl> <saida.pkl>
+# Este módulo é o __main__ do processo: os trabalhadores do pool o reimportam sem efeito colateral.
+
+if __name__ == "__main__":
+    entrada, saida = sys.argv[1:3]
+    with open(entrada, "rb") as f:
+        argumentos = pickle.load(f)
+    resultados = otimizador.varrer(**argumentos)
+    with open(saida, "wb") as f:
+        pickle.dump(resultados, f)